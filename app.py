@@ -1,4 +1,4 @@
-from flask import Flask, render_template, request, jsonify, send_file
+from flask import Flask, render_template, request, jsonify, send_file, has_request_context
 from flask_login import LoginManager, UserMixin, login_user, login_required, logout_user, current_user
 import sqlite3
 import os
@@ -6,7 +6,11 @@ import json
 import hashlib
 from datetime import datetime, timedelta
 import traceback
-from threading import Lock
+from threading import Lock, local, Event, Thread
+from concurrent.futures import ThreadPoolExecutor
+import queue
+import time
+import calendar
 from flask_cors import CORS
 import csv
 import io
@@ -18,7 +22,9 @@ from reportlab.lib.units import inch
 import tempfile
 import secrets
 from urllib.parse import quote
+from werkzeug.exceptions import RequestEntityTooLarge
 import re
+import base64
 
 app = Flask(__name__)
 app.secret_key = os.environ.get('SECRET_KEY', 'paybook-secret-key-cambiar-en-produccion')
@@ -48,18 +54,21 @@ class User(UserMixin):
 
 @login_manager.user_loader
 def load_user(user_id):
+    user = user_cache.get(user_id)
+    if user is not None:
+        return user
     try:
-        with db_lock:
-            conn = sqlite3.connect(DB_PATH)
+        with db_pool.connect() as conn:
             cursor = conn.cursor()
             cursor.execute('''
                 SELECT id, email, nombre, plan, rol, avatar FROM usuarios
                 WHERE id = ? AND activo = 1
             ''', (user_id,))
             row = cursor.fetchone()
-            conn.close()
         if row:
-            return User(row[0], row[1], row[2] or '', row[3] or 'free', row[4] or 'user', row[5])
+            user = User(row[0], row[1], row[2] or '', row[3] or 'free', row[4] or 'user', row[5])
+            user_cache.set(user)
+            return user
     except Exception:
         pass
     return None
@@ -81,20 +90,279 @@ def validate_password_security(password):
         return 'La contraseña debe incluir al menos un símbolo especial'
     return None
 
-# Ruta de la base de datos
+# Ruta de la base de datos (PAYBOOK_DATA_DIR permite ubicarla fuera del código,
+# p. ej. en un volumen o en un directorio temporal para los tests)
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
-DB_PATH = os.path.join(BASE_DIR, 'database.db')
-BACKUP_DIR = os.path.join(BASE_DIR, 'backups')
-CACHE_DIR = os.path.join(BASE_DIR, 'cache')
+DATA_DIR = os.environ.get('PAYBOOK_DATA_DIR', BASE_DIR)
+DB_PATH = os.path.join(DATA_DIR, 'database.db')
+BACKUP_DIR = os.path.join(DATA_DIR, 'backups')
+CACHE_DIR = os.path.join(DATA_DIR, 'cache')
+# Estado de trabajos en curso (PDF, importaciones): fuera de CACHE_DIR para que
+# limpiar la cache no borre un trabajo que todavía corre
+JOBS_DIR = os.path.join(DATA_DIR, 'jobs')
 BACKUP_METADATA_PATH = os.path.join(BACKUP_DIR, 'backup_metadata.json')
 
-# Lock para operaciones de base de datos
-db_lock = Lock()
+# La base trabaja en modo WAL: las lecturas no toman lock y corren en paralelo.
+# Solo las rutas que escriben se serializan dentro del proceso; entre los
+# workers de gunicorn el busy_timeout espera a que el otro escritor termine.
+db_write_lock = Lock()
+DB_BUSY_TIMEOUT_MS = int(os.environ.get('DB_BUSY_TIMEOUT_MS', 5000))
+
+# ========== POOL DE CONEXIONES ==========
+DB_POOL_SIZE = int(os.environ.get('DB_POOL_SIZE', 8))
+DB_POOL_TIMEOUT = float(os.environ.get('DB_POOL_TIMEOUT', 30))
+DB_STATEMENT_CACHE = int(os.environ.get('DB_STATEMENT_CACHE', 256))
+
+class PooledConnection:
+    """Conexión prestada por el pool. close() la devuelve en lugar de cerrarla."""
+
+    def __init__(self, pool, connection):
+        self._pool = pool
+        self.connection = connection
+
+    def __getattr__(self, name):
+        return getattr(self.connection, name)
+
+    def close(self):
+        if self.connection is not None:
+            self._pool.release(self)
+
+    # `with db_pool.connect() as conn:` devuelve la conexión al salir, aunque
+    # haya excepción (a diferencia de sqlite3, que solo hace commit/rollback)
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+        return False
+
+class ConnectionPool:
+    """Pool acotado de conexiones SQLite reutilizables entre requests.
+
+    Mantiene las conexiones abiertas (con su cache de sentencias preparadas y
+    páginas ya cargadas) y las presta a los hilos de gunicorn. Si todas están
+    en uso, el hilo espera hasta `timeout` segundos a que se libere una.
+    """
+
+    def __init__(self, path, size=4, timeout=30.0, cached_statements=256, busy_timeout_ms=5000):
+        self.path = path
+        self.size = max(1, size)
+        self.timeout = timeout
+        self.cached_statements = cached_statements
+        self.busy_timeout_ms = busy_timeout_ms
+        self._idle = queue.LifoQueue()
+        self._lock = Lock()
+        self._local = local()
+        self._created = 0
+        self._stats = {'hits': 0, 'misses': 0, 'waits': 0, 'wait_time': 0.0, 'timeouts': 0}
+
+    def _new_connection(self):
+        connection = sqlite3.connect(
+            self.path,
+            timeout=self.busy_timeout_ms / 1000,
+            check_same_thread=False,
+            cached_statements=self.cached_statements
+        )
+        connection.execute(f'PRAGMA busy_timeout = {int(self.busy_timeout_ms)}')
+        # En WAL, NORMAL sigue siendo seguro ante caídas del proceso
+        connection.execute('PRAGMA synchronous = NORMAL')
+        return connection
+
+    def _borrowed(self):
+        if not hasattr(self._local, 'borrowed'):
+            self._local.borrowed = []
+        return self._local.borrowed
+
+    def _count(self, key, amount=1):
+        with self._lock:
+            self._stats[key] += amount
+
+    def connect(self):
+        try:
+            connection = self._idle.get_nowait()
+            self._count('hits')
+        except queue.Empty:
+            with self._lock:
+                puede_crear = self._created < self.size
+                if puede_crear:
+                    self._created += 1
+            if puede_crear:
+                try:
+                    connection = self._new_connection()
+                except Exception:
+                    with self._lock:
+                        self._created -= 1
+                    raise
+                self._count('misses')
+            else:
+                inicio = time.monotonic()
+                try:
+                    connection = self._idle.get(timeout=self.timeout)
+                except queue.Empty:
+                    self._count('timeouts')
+                    raise sqlite3.OperationalError('No hay conexiones disponibles en el pool')
+                with self._lock:
+                    self._stats['waits'] += 1
+                    self._stats['wait_time'] += time.monotonic() - inicio
+
+        pooled = PooledConnection(self, connection)
+        self._borrowed().append(pooled)
+        return pooled
+
+    def release(self, pooled):
+        connection, pooled.connection = pooled.connection, None
+        if connection is None:
+            return
+        try:
+            self._borrowed().remove(pooled)
+        except ValueError:
+            pass
+        try:
+            # Nunca devolver al pool una transacción a medias
+            if connection.in_transaction:
+                connection.rollback()
+        except sqlite3.Error:
+            connection.close()
+            with self._lock:
+                self._created -= 1
+            return
+        self._idle.put(connection)
+
+    def release_thread(self):
+        """Devuelve las conexiones que el hilo actual no cerró (p. ej. por una excepción)."""
+        for pooled in list(self._borrowed()):
+            pooled.close()
+
+    def stats(self):
+        with self._lock:
+            data = dict(self._stats)
+            data['size'] = self.size
+            data['created'] = self._created
+        data['idle'] = self._idle.qsize()
+        data['in_use'] = data['created'] - data['idle']
+        data['wait_time'] = round(data['wait_time'], 4)
+        return data
+
+db_pool = ConnectionPool(DB_PATH, DB_POOL_SIZE, DB_POOL_TIMEOUT, DB_STATEMENT_CACHE, DB_BUSY_TIMEOUT_MS)
+
+# ========== CACHE DE USUARIOS ==========
+USER_CACHE_TTL = float(os.environ.get('USER_CACHE_TTL', 60))
+USER_CACHE_MARKER = os.path.join(CACHE_DIR, 'usuarios.invalidacion')
+
+class UserCache:
+    """Cache de objetos User para load_user, con TTL e invalidación explícita.
+
+    Invalidar toca un archivo marcador en CACHE_DIR; cada worker compara su
+    mtime en cada lectura (un stat, sin ir a la base) y vacía su cache si
+    cambió, así una desactivación se aplica de inmediato en todos los workers.
+    """
+
+    def __init__(self, ttl, marker_path):
+        self.ttl = ttl
+        self.marker_path = marker_path
+        self._lock = Lock()
+        self._users = {}
+        self._marker = self._marker_mtime()
+
+    def _marker_mtime(self):
+        try:
+            return os.stat(self.marker_path).st_mtime_ns
+        except OSError:
+            return None
+
+    def _sync(self):
+        marker = self._marker_mtime()
+        if marker != self._marker:
+            with self._lock:
+                self._users.clear()
+                self._marker = marker
+
+    def get(self, user_id):
+        self._sync()
+        with self._lock:
+            entry = self._users.get(str(user_id))
+        if entry and entry[1] > time.monotonic():
+            return entry[0]
+        return None
+
+    def set(self, user):
+        with self._lock:
+            self._users[str(user.id)] = (user, time.monotonic() + self.ttl)
+
+    def invalidate(self, user_id=None):
+        with self._lock:
+            if user_id is None:
+                self._users.clear()
+            else:
+                self._users.pop(str(user_id), None)
+        try:
+            os.makedirs(os.path.dirname(self.marker_path), exist_ok=True)
+            with open(self.marker_path, 'a', encoding='utf-8'):
+                pass
+            os.utime(self.marker_path)
+        except OSError:
+            pass
+        self._marker = self._marker_mtime()
+
+user_cache = UserCache(USER_CACHE_TTL, USER_CACHE_MARKER)
+
+# ========== CACHE DE CONFIGURACIÓN ==========
+CONFIG_CACHE_CHECK_INTERVAL = float(os.environ.get('CONFIG_CACHE_CHECK_INTERVAL', 2))
+
+class ConfigCache:
+    """Copia en memoria de la tabla configuraciones, cargada en una consulta.
+
+    Los triggers de configuraciones suben versiones_sistema['configuraciones'];
+    cada worker lee ese número como mucho una vez cada `check_interval`
+    segundos y recarga todo si cambió, así los dos workers convergen rápido.
+    """
+
+    def __init__(self, check_interval):
+        self.check_interval = check_interval
+        self._lock = Lock()
+        self._valores = None
+        self._version = None
+        self._proximo_chequeo = 0
+
+    def _leer_version(self, cursor):
+        try:
+            cursor.execute("SELECT version FROM versiones_sistema WHERE clave = 'configuraciones'")
+        except sqlite3.OperationalError:
+            return None
+        row = cursor.fetchone()
+        return row[0] if row else 0
+
+    def _cargar(self, cursor):
+        ahora = time.monotonic()
+        with self._lock:
+            if self._valores is not None and ahora < self._proximo_chequeo:
+                return self._valores
+            version = self._leer_version(cursor)
+            if self._valores is None or version is None or version != self._version:
+                cursor.execute('SELECT clave, valor FROM configuraciones')
+                self._valores = dict(cursor.fetchall())
+                self._version = version
+            self._proximo_chequeo = ahora + self.check_interval
+            return self._valores
+
+    def snapshot(self, cursor=None):
+        if cursor is not None:
+            return self._cargar(cursor)
+        conn = db_pool.connect()
+        try:
+            return self._cargar(conn.cursor())
+        finally:
+            conn.close()
+
+    def invalidate(self):
+        with self._lock:
+            self._valores = None
+
+config_cache = ConfigCache(CONFIG_CACHE_CHECK_INTERVAL)
 
 def get_config_value(cursor, clave, default=None):
-    cursor.execute('SELECT valor FROM configuraciones WHERE clave = ?', (clave,))
-    row = cursor.fetchone()
-    return row[0] if row else default
+    valor = config_cache.snapshot(cursor).get(clave)
+    return valor if valor is not None else default
 
 def parse_plan_features(raw_value, fallback):
     lines = [line.strip() for line in (raw_value or '').splitlines() if line.strip()]
@@ -127,9 +395,98 @@ def parse_max_cajeros(value):
         return None
     return max_cajeros if max_cajeros > 0 else None
 
+def parse_limite(value, default, maximo):
+    try:
+        limite = int(value) if value not in (None, '') else default
+    except (TypeError, ValueError):
+        return None
+    return limite if 0 < limite <= maximo else None
+
+def encode_page_cursor(*valores):
+    raw = json.dumps(list(valores), separators=(',', ':')).encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii').rstrip('=')
+
+def decode_page_cursor(token, *tipos):
+    """Devuelve la lista de valores del cursor o None si es inválido.
+
+    `tipos` es el tipo esperado de cada posición: un cursor armado a mano con
+    otros valores no debe llegar al bind de SQLite.
+    """
+    try:
+        padding = '=' * (-len(token) % 4)
+        valores = json.loads(base64.urlsafe_b64decode(token + padding).decode('utf-8'))
+    except (ValueError, TypeError):
+        return None
+    if not isinstance(valores, list) or len(valores) != len(tipos):
+        return None
+    for valor, tipo in zip(valores, tipos):
+        # bool es subclase de int pero no es un valor válido de cursor
+        if isinstance(valor, bool) or not isinstance(valor, tipo):
+            return None
+    return valores
+
+# cargas.fecha_ts: segundos desde epoch de la hora de pared guardada en
+# cargas.fecha (sin zona), lo mismo que strftime('%s', fecha) en SQLite.
+FORMATOS_FECHA = ('%Y-%m-%d %H:%M:%S', '%Y-%m-%d %H:%M', '%Y-%m-%d')
+
+def parse_fecha(valor):
+    """datetime de 'YYYY-MM-DD[ HH:MM[:SS]]' (acepta 'T' y fracciones) o None."""
+    texto = (valor or '').strip().replace('T', ' ')[:19]
+    for formato in FORMATOS_FECHA:
+        try:
+            return datetime.strptime(texto, formato)
+        except ValueError:
+            continue
+    return None
+
+def fecha_a_ts(valor):
+    fecha = parse_fecha(valor) if isinstance(valor, str) else valor
+    return calendar.timegm(fecha.timetuple()) if fecha else None
+
+def precision_fecha(valor):
+    """Segundos que abarca la fecha tal como vino: día, minuto o segundo.
+
+    Los inputs datetime-local mandan 'YYYY-MM-DDTHH:MM', que incluye todo ese minuto.
+    """
+    largo = len((valor or '').strip())
+    if largo <= 10:
+        return 86400
+    if largo <= 16:
+        return 60
+    return 1
+
+def rango_fechas(fecha_inicio, fecha_fin):
+    """Rango semiabierto [desde, hasta) de fecha_ts para los filtros del cliente.
+
+    fecha_fin se extiende hasta el final de su precisión: sin hora cubre el
+    día completo, con minutos el minuto completo y con segundos ese segundo.
+    None si alguna fecha es inválida.
+    """
+    desde = fecha_a_ts(fecha_inicio)
+    hasta = fecha_a_ts(fecha_fin)
+    if desde is None or hasta is None:
+        return None
+    return desde, hasta + precision_fecha(fecha_fin)
+
+def fin_exclusivo_texto(fecha_fin):
+    """Límite superior exclusivo como texto, para columnas de fecha guardadas
+    como 'YYYY-MM-DD HH:MM:SS'. Mismo criterio que rango_fechas."""
+    fecha = parse_fecha(fecha_fin)
+    if fecha is None:
+        return None
+    fin = fecha + timedelta(seconds=precision_fecha(fecha_fin))
+    if len(fecha_fin.strip()) <= 10:
+        return fin.strftime('%Y-%m-%d')
+    return fin.strftime('%Y-%m-%d %H:%M:%S')
+
+def rango_dia(dia):
+    desde = fecha_a_ts(dia)
+    return desde, desde + 86400
+
 def ensure_dirs():
     os.makedirs(BACKUP_DIR, exist_ok=True)
     os.makedirs(CACHE_DIR, exist_ok=True)
+    os.makedirs(JOBS_DIR, exist_ok=True)
 
 def load_backup_metadata():
     ensure_dirs()
@@ -179,6 +536,9 @@ def init_db():
     conn = sqlite3.connect(DB_PATH)
     cursor = conn.cursor()
 
+    # WAL queda persistido en el archivo: lectores concurrentes con un escritor
+    cursor.execute('PRAGMA journal_mode=WAL')
+
     # Tabla usuarios (login)
     cursor.execute('''
         CREATE TABLE IF NOT EXISTS usuarios (
@@ -285,6 +645,743 @@ def init_db():
     conn.commit()
     conn.close()
 
+# ========== SALDOS PENDIENTES ==========
+# saldos_pendientes guarda, por cajero y plataforma, el total y la cantidad de
+# cargas NO PAGADAS. Lo mantienen los triggers sobre cargas dentro de la misma
+# transacción que la escritura; las columnas *_positivo excluyen las deudas
+# para cuando permitir_deudas está desactivado.
+SQL_SALDOS_PENDIENTES = '''
+    SELECT usuario_id, cajero_id, COALESCE(plataforma, ''),
+           COALESCE(SUM(monto), 0), COUNT(*),
+           COALESCE(SUM(CASE WHEN monto > 0 THEN monto ELSE 0 END), 0),
+           SUM(CASE WHEN monto > 0 THEN 1 ELSE 0 END)
+    FROM cargas
+    WHERE (pagado = 0 OR pagado IS NULL) AND cajero_id IS NOT NULL{filtro}
+    GROUP BY usuario_id, cajero_id, COALESCE(plataforma, '')
+'''
+
+def _sql_sumar_saldo(ref):
+    return f'''
+        INSERT INTO saldos_pendientes
+            (usuario_id, cajero_id, plataforma, total, cantidad, total_positivo, cantidad_positivo)
+        SELECT {ref}.usuario_id, {ref}.cajero_id, COALESCE({ref}.plataforma, ''), {ref}.monto, 1,
+               CASE WHEN {ref}.monto > 0 THEN {ref}.monto ELSE 0 END,
+               CASE WHEN {ref}.monto > 0 THEN 1 ELSE 0 END
+        WHERE ({ref}.pagado = 0 OR {ref}.pagado IS NULL) AND {ref}.cajero_id IS NOT NULL
+        ON CONFLICT (usuario_id, cajero_id, plataforma) DO UPDATE SET
+            total = total + excluded.total,
+            cantidad = cantidad + 1,
+            total_positivo = total_positivo + excluded.total_positivo,
+            cantidad_positivo = cantidad_positivo + excluded.cantidad_positivo;
+    '''
+
+def _sql_restar_saldo(ref):
+    # Al llegar a 0 cargas se fija el total en 0 para no acumular error de coma flotante
+    return f'''
+        UPDATE saldos_pendientes SET
+            total = CASE WHEN cantidad <= 1 THEN 0 ELSE total - {ref}.monto END,
+            cantidad = cantidad - 1,
+            total_positivo = CASE
+                WHEN {ref}.monto <= 0 THEN total_positivo
+                WHEN cantidad_positivo <= 1 THEN 0
+                ELSE total_positivo - {ref}.monto
+            END,
+            cantidad_positivo = cantidad_positivo - (CASE WHEN {ref}.monto > 0 THEN 1 ELSE 0 END)
+        WHERE usuario_id = {ref}.usuario_id AND cajero_id = {ref}.cajero_id
+            AND plataforma = COALESCE({ref}.plataforma, '')
+            AND ({ref}.pagado = 0 OR {ref}.pagado IS NULL);
+    '''
+
+def crear_saldos_pendientes(cursor):
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS saldos_pendientes (
+            usuario_id INTEGER NOT NULL,
+            cajero_id INTEGER NOT NULL,
+            plataforma TEXT NOT NULL DEFAULT '',
+            total REAL NOT NULL DEFAULT 0,
+            cantidad INTEGER NOT NULL DEFAULT 0,
+            total_positivo REAL NOT NULL DEFAULT 0,
+            cantidad_positivo INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (usuario_id, cajero_id, plataforma)
+        )
+    ''')
+    cursor.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS trg_cargas_saldos_insert AFTER INSERT ON cargas
+        BEGIN {_sql_sumar_saldo('NEW')} END
+    ''')
+    cursor.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS trg_cargas_saldos_delete AFTER DELETE ON cargas
+        BEGIN {_sql_restar_saldo('OLD')} END
+    ''')
+    cursor.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS trg_cargas_saldos_update
+        AFTER UPDATE OF usuario_id, cajero_id, plataforma, monto, pagado ON cargas
+        BEGIN {_sql_restar_saldo('OLD')} {_sql_sumar_saldo('NEW')} END
+    ''')
+    reconstruir_saldos_pendientes(cursor)
+
+def reconstruir_saldos_pendientes(cursor, usuario_id=None):
+    """Recalcula saldos_pendientes desde cargas (todos los usuarios o uno)."""
+    if usuario_id is None:
+        cursor.execute('DELETE FROM saldos_pendientes')
+        cursor.execute('INSERT INTO saldos_pendientes ' + SQL_SALDOS_PENDIENTES.format(filtro=''))
+    else:
+        cursor.execute('DELETE FROM saldos_pendientes WHERE usuario_id = ?', (usuario_id,))
+        cursor.execute(
+            'INSERT INTO saldos_pendientes ' + SQL_SALDOS_PENDIENTES.format(filtro=' AND usuario_id = ?'),
+            (usuario_id,)
+        )
+
+def verificar_saldos_pendientes(cursor):
+    """Compara saldos_pendientes con lo calculado desde cargas y devuelve las diferencias."""
+    cursor.execute(SQL_SALDOS_PENDIENTES.format(filtro=''))
+    esperado = {tuple(row[:3]): row[3:] for row in cursor.fetchall()}
+    cursor.execute('''
+        SELECT usuario_id, cajero_id, plataforma, total, cantidad, total_positivo, cantidad_positivo
+        FROM saldos_pendientes
+        WHERE cantidad != 0 OR total != 0
+    ''')
+    actual = {tuple(row[:3]): row[3:] for row in cursor.fetchall()}
+
+    diferencias = []
+    for clave in sorted(set(esperado) | set(actual), key=str):
+        valores_esperados = esperado.get(clave, (0, 0, 0, 0))
+        valores_actuales = actual.get(clave, (0, 0, 0, 0))
+        if any(abs((a or 0) - (b or 0)) > 0.005 for a, b in zip(valores_esperados, valores_actuales)):
+            diferencias.append({
+                'usuario_id': clave[0],
+                'cajero_id': clave[1],
+                'plataforma': clave[2],
+                'esperado': {'total': valores_esperados[0], 'cantidad': valores_esperados[1]},
+                'actual': {'total': valores_actuales[0], 'cantidad': valores_actuales[1]}
+            })
+    return diferencias
+
+# ========== RESUMEN DIARIO ==========
+# resumen_diario acumula, por usuario, día, cajero y plataforma, la cantidad y
+# el total de cargas, y aparte lo NO PAGADO. Lo mantienen triggers sobre cargas
+# como saldos_pendientes; los reportes por período suman días en vez de cargas.
+SQL_RESUMEN_DIARIO = '''
+    SELECT usuario_id, COALESCE(substr(fecha, 1, 10), ''), COALESCE(cajero_id, 0),
+           COALESCE(plataforma, ''), COUNT(*), COALESCE(SUM(monto), 0),
+           SUM(CASE WHEN pagado = 0 OR pagado IS NULL THEN 1 ELSE 0 END),
+           COALESCE(SUM(CASE WHEN pagado = 0 OR pagado IS NULL THEN monto ELSE 0 END), 0)
+    FROM cargas
+    WHERE 1 = 1{filtro}
+    GROUP BY usuario_id, COALESCE(substr(fecha, 1, 10), ''), COALESCE(cajero_id, 0), COALESCE(plataforma, '')
+'''
+
+def _sql_sumar_resumen_diario(ref):
+    return f'''
+        INSERT INTO resumen_diario
+            (usuario_id, dia, cajero_id, plataforma, cantidad, total, cantidad_pendiente, total_pendiente)
+        VALUES (
+            {ref}.usuario_id, COALESCE(substr({ref}.fecha, 1, 10), ''), COALESCE({ref}.cajero_id, 0),
+            COALESCE({ref}.plataforma, ''), 1, {ref}.monto,
+            CASE WHEN {ref}.pagado = 0 OR {ref}.pagado IS NULL THEN 1 ELSE 0 END,
+            CASE WHEN {ref}.pagado = 0 OR {ref}.pagado IS NULL THEN {ref}.monto ELSE 0 END
+        )
+        ON CONFLICT (usuario_id, dia, cajero_id, plataforma) DO UPDATE SET
+            cantidad = cantidad + 1,
+            total = total + excluded.total,
+            cantidad_pendiente = cantidad_pendiente + excluded.cantidad_pendiente,
+            total_pendiente = total_pendiente + excluded.total_pendiente;
+    '''
+
+def _sql_restar_resumen_diario(ref):
+    # Igual que en saldos_pendientes: al quedar en 0 se fija el total en 0
+    return f'''
+        UPDATE resumen_diario SET
+            total = CASE WHEN cantidad <= 1 THEN 0 ELSE total - {ref}.monto END,
+            cantidad = cantidad - 1,
+            total_pendiente = CASE
+                WHEN NOT ({ref}.pagado = 0 OR {ref}.pagado IS NULL) THEN total_pendiente
+                WHEN cantidad_pendiente <= 1 THEN 0
+                ELSE total_pendiente - {ref}.monto
+            END,
+            cantidad_pendiente = cantidad_pendiente
+                - (CASE WHEN {ref}.pagado = 0 OR {ref}.pagado IS NULL THEN 1 ELSE 0 END)
+        WHERE usuario_id = {ref}.usuario_id AND dia = COALESCE(substr({ref}.fecha, 1, 10), '')
+            AND cajero_id = COALESCE({ref}.cajero_id, 0) AND plataforma = COALESCE({ref}.plataforma, '');
+    '''
+
+def crear_resumen_diario(cursor):
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS resumen_diario (
+            usuario_id INTEGER NOT NULL,
+            dia TEXT NOT NULL,
+            cajero_id INTEGER NOT NULL,
+            plataforma TEXT NOT NULL DEFAULT '',
+            cantidad INTEGER NOT NULL DEFAULT 0,
+            total REAL NOT NULL DEFAULT 0,
+            cantidad_pendiente INTEGER NOT NULL DEFAULT 0,
+            total_pendiente REAL NOT NULL DEFAULT 0,
+            PRIMARY KEY (usuario_id, dia, cajero_id, plataforma)
+        )
+    ''')
+    cursor.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS trg_cargas_resumen_diario_insert AFTER INSERT ON cargas
+        BEGIN {_sql_sumar_resumen_diario('NEW')} END
+    ''')
+    cursor.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS trg_cargas_resumen_diario_delete AFTER DELETE ON cargas
+        BEGIN {_sql_restar_resumen_diario('OLD')} END
+    ''')
+    cursor.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS trg_cargas_resumen_diario_update
+        AFTER UPDATE OF usuario_id, cajero_id, plataforma, monto, fecha, pagado ON cargas
+        BEGIN {_sql_restar_resumen_diario('OLD')} {_sql_sumar_resumen_diario('NEW')} END
+    ''')
+    reconstruir_resumen_diario(cursor)
+
+def reconstruir_resumen_diario(cursor, usuario_id=None):
+    """Recalcula resumen_diario desde cargas (todos los usuarios o uno)."""
+    if usuario_id is None:
+        cursor.execute('DELETE FROM resumen_diario')
+        cursor.execute('INSERT INTO resumen_diario ' + SQL_RESUMEN_DIARIO.format(filtro=''))
+    else:
+        cursor.execute('DELETE FROM resumen_diario WHERE usuario_id = ?', (usuario_id,))
+        cursor.execute(
+            'INSERT INTO resumen_diario ' + SQL_RESUMEN_DIARIO.format(filtro=' AND usuario_id = ?'),
+            (usuario_id,)
+        )
+
+# ========== RESUMEN POR USUARIO ==========
+# resumen_usuarios guarda por usuario lo que muestra el panel admin: cajeros
+# activos, cantidad de cargas, pendiente (neto y sin deudas) y la fecha de la
+# carga más reciente. Lo mantienen triggers sobre cargas y cajeros.
+def _sql_asegurar_resumen_usuario(ref):
+    return f'''
+        INSERT OR IGNORE INTO resumen_usuarios (usuario_id) VALUES ({ref}.usuario_id);
+    '''
+
+def _sql_resumen_usuario_carga(ref, signo):
+    pendiente = f'({ref}.pagado = 0 OR {ref}.pagado IS NULL)'
+    actividad = (
+        f", ultima_actividad = MAX(COALESCE(ultima_actividad, ''), COALESCE({ref}.fecha, ''))"
+        if signo == '+' else ''
+    )
+    return f'''
+        UPDATE resumen_usuarios SET
+            total_cargas = total_cargas {signo} 1,
+            total_pendiente = total_pendiente {signo} (CASE WHEN {pendiente} THEN {ref}.monto ELSE 0 END),
+            total_pendiente_positivo = total_pendiente_positivo
+                {signo} (CASE WHEN {pendiente} AND {ref}.monto > 0 THEN {ref}.monto ELSE 0 END)
+            {actividad}
+        WHERE usuario_id = {ref}.usuario_id;
+    '''
+
+def _sql_resumen_usuario_cajero(ref, signo):
+    return f'''
+        UPDATE resumen_usuarios SET
+            cajeros_activos = cajeros_activos {signo} (CASE WHEN {ref}.activo = 1 THEN 1 ELSE 0 END)
+        WHERE usuario_id = {ref}.usuario_id;
+    '''
+
+def crear_resumen_usuarios(cursor):
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS resumen_usuarios (
+            usuario_id INTEGER PRIMARY KEY,
+            cajeros_activos INTEGER NOT NULL DEFAULT 0,
+            total_cargas INTEGER NOT NULL DEFAULT 0,
+            total_pendiente REAL NOT NULL DEFAULT 0,
+            total_pendiente_positivo REAL NOT NULL DEFAULT 0,
+            ultima_actividad TEXT
+        )
+    ''')
+    cursor.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS trg_cargas_resumen_usuarios_insert AFTER INSERT ON cargas
+        BEGIN {_sql_asegurar_resumen_usuario('NEW')} {_sql_resumen_usuario_carga('NEW', '+')} END
+    ''')
+    cursor.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS trg_cargas_resumen_usuarios_delete AFTER DELETE ON cargas
+        BEGIN {_sql_resumen_usuario_carga('OLD', '-')} END
+    ''')
+    cursor.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS trg_cargas_resumen_usuarios_update
+        AFTER UPDATE OF usuario_id, monto, pagado, fecha ON cargas
+        BEGIN
+            {_sql_resumen_usuario_carga('OLD', '-')}
+            {_sql_asegurar_resumen_usuario('NEW')}
+            {_sql_resumen_usuario_carga('NEW', '+')}
+        END
+    ''')
+    cursor.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS trg_cajeros_resumen_usuarios_insert AFTER INSERT ON cajeros
+        BEGIN {_sql_asegurar_resumen_usuario('NEW')} {_sql_resumen_usuario_cajero('NEW', '+')} END
+    ''')
+    cursor.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS trg_cajeros_resumen_usuarios_delete AFTER DELETE ON cajeros
+        BEGIN {_sql_resumen_usuario_cajero('OLD', '-')} END
+    ''')
+    cursor.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS trg_cajeros_resumen_usuarios_update
+        AFTER UPDATE OF usuario_id, activo ON cajeros
+        BEGIN
+            {_sql_resumen_usuario_cajero('OLD', '-')}
+            {_sql_asegurar_resumen_usuario('NEW')}
+            {_sql_resumen_usuario_cajero('NEW', '+')}
+        END
+    ''')
+    reconstruir_resumen_usuarios(cursor)
+
+def reconstruir_resumen_usuarios(cursor, usuario_id=None):
+    """Recalcula resumen_usuarios desde cargas y cajeros (todos los usuarios o uno)."""
+    filtro = '' if usuario_id is None else ' WHERE u.id = ?'
+    params = () if usuario_id is None else (usuario_id,)
+    if usuario_id is None:
+        cursor.execute('DELETE FROM resumen_usuarios')
+    else:
+        cursor.execute('DELETE FROM resumen_usuarios WHERE usuario_id = ?', (usuario_id,))
+    cursor.execute(f'''
+        INSERT INTO resumen_usuarios
+            (usuario_id, cajeros_activos, total_cargas, total_pendiente,
+             total_pendiente_positivo, ultima_actividad)
+        SELECT u.id,
+               (SELECT COUNT(*) FROM cajeros c WHERE c.usuario_id = u.id AND c.activo = 1),
+               COALESCE(cg.total_cargas, 0), COALESCE(cg.total_pendiente, 0),
+               COALESCE(cg.total_pendiente_positivo, 0), cg.ultima_actividad
+        FROM usuarios u
+        LEFT JOIN (
+            SELECT usuario_id, COUNT(*) AS total_cargas,
+                   SUM(CASE WHEN pagado = 0 OR pagado IS NULL THEN monto ELSE 0 END) AS total_pendiente,
+                   SUM(CASE WHEN (pagado = 0 OR pagado IS NULL) AND monto > 0 THEN monto ELSE 0 END)
+                       AS total_pendiente_positivo,
+                   MAX(fecha) AS ultima_actividad
+            FROM cargas
+            GROUP BY usuario_id
+        ) cg ON cg.usuario_id = u.id{filtro}
+    ''', params)
+
+# Migración 13: los triggers de cargas llevan además cuántas cargas pendientes
+# (y pendientes positivas) tiene cada usuario. Con eso el total se fija en 0 al
+# salir la última, sin residuo de coma flotante, como en saldos_pendientes; y
+# ultima_actividad se recalcula al borrar o atrasar la carga más reciente.
+# Las funciones de arriba son las de la migración 9 y no se tocan.
+def _sql_resumen_usuario_carga_pendientes(ref, signo):
+    pendiente = f'({ref}.pagado = 0 OR {ref}.pagado IS NULL)'
+    positiva = f'({pendiente} AND {ref}.monto > 0)'
+    if signo == '+':
+        total = f'total_pendiente + (CASE WHEN {pendiente} THEN {ref}.monto ELSE 0 END)'
+        total_positivo = f'total_pendiente_positivo + (CASE WHEN {positiva} THEN {ref}.monto ELSE 0 END)'
+        actividad = f"MAX(COALESCE(ultima_actividad, ''), COALESCE({ref}.fecha, ''))"
+    else:
+        total = f'''CASE WHEN NOT {pendiente} THEN total_pendiente
+                         WHEN cargas_pendientes <= 1 THEN 0
+                         ELSE total_pendiente - {ref}.monto END'''
+        total_positivo = f'''CASE WHEN NOT {positiva} THEN total_pendiente_positivo
+                                  WHEN cargas_pendientes_positivas <= 1 THEN 0
+                                  ELSE total_pendiente_positivo - {ref}.monto END'''
+        # Si la carga que sale era la más reciente, se busca la nueva más
+        # reciente por idx_cargas_usuario_fecha; si no, no cambia
+        actividad = f'''CASE WHEN COALESCE({ref}.fecha, '') < COALESCE(ultima_actividad, '')
+                             THEN ultima_actividad
+                             ELSE (SELECT MAX(fecha) FROM cargas WHERE usuario_id = {ref}.usuario_id) END'''
+    return f'''
+        UPDATE resumen_usuarios SET
+            total_cargas = total_cargas {signo} 1,
+            total_pendiente = {total},
+            total_pendiente_positivo = {total_positivo},
+            cargas_pendientes = cargas_pendientes {signo} (CASE WHEN {pendiente} THEN 1 ELSE 0 END),
+            cargas_pendientes_positivas = cargas_pendientes_positivas
+                {signo} (CASE WHEN {positiva} THEN 1 ELSE 0 END),
+            ultima_actividad = {actividad}
+        WHERE usuario_id = {ref}.usuario_id;
+    '''
+
+def agregar_pendientes_resumen_usuarios(cursor):
+    for columna in ('cargas_pendientes', 'cargas_pendientes_positivas'):
+        cursor.execute(f'ALTER TABLE resumen_usuarios ADD COLUMN {columna} INTEGER NOT NULL DEFAULT 0')
+    for evento in ('insert', 'delete', 'update'):
+        cursor.execute(f'DROP TRIGGER IF EXISTS trg_cargas_resumen_usuarios_{evento}')
+    cursor.execute(f'''
+        CREATE TRIGGER trg_cargas_resumen_usuarios_insert AFTER INSERT ON cargas
+        BEGIN {_sql_asegurar_resumen_usuario('NEW')} {_sql_resumen_usuario_carga_pendientes('NEW', '+')} END
+    ''')
+    cursor.execute(f'''
+        CREATE TRIGGER trg_cargas_resumen_usuarios_delete AFTER DELETE ON cargas
+        BEGIN {_sql_resumen_usuario_carga_pendientes('OLD', '-')} END
+    ''')
+    cursor.execute(f'''
+        CREATE TRIGGER trg_cargas_resumen_usuarios_update
+        AFTER UPDATE OF usuario_id, monto, pagado, fecha ON cargas
+        BEGIN
+            {_sql_resumen_usuario_carga_pendientes('OLD', '-')}
+            {_sql_asegurar_resumen_usuario('NEW')}
+            {_sql_resumen_usuario_carga_pendientes('NEW', '+')}
+        END
+    ''')
+    reconstruir_pendientes_resumen_usuarios(cursor)
+
+def reconstruir_pendientes_resumen_usuarios(cursor, usuario_id=None):
+    """Recalcula resumen_usuarios completo, contadores de pendientes incluidos."""
+    reconstruir_resumen_usuarios(cursor, usuario_id)
+    filtro = '' if usuario_id is None else ' WHERE usuario_id = ?'
+    params = () if usuario_id is None else (usuario_id,)
+    cursor.execute(f'''
+        UPDATE resumen_usuarios SET
+            cargas_pendientes = (
+                SELECT COUNT(*) FROM cargas cg
+                WHERE cg.usuario_id = resumen_usuarios.usuario_id
+                  AND (cg.pagado = 0 OR cg.pagado IS NULL)
+            ),
+            cargas_pendientes_positivas = (
+                SELECT COUNT(*) FROM cargas cg
+                WHERE cg.usuario_id = resumen_usuarios.usuario_id
+                  AND (cg.pagado = 0 OR cg.pagado IS NULL) AND cg.monto > 0
+            ){filtro}
+    ''', params)
+
+def leer_resumen_usuarios(cursor, permitir_deudas, usuario_ids=None):
+    """{usuario_id: estadísticas} desde resumen_usuarios (los ids dados o todos)."""
+    columna = 'r.total_pendiente' if permitir_deudas else 'r.total_pendiente_positivo'
+    query = f'''
+        SELECT u.id, COALESCE(r.cajeros_activos, 0), COALESCE(r.total_cargas, 0),
+               COALESCE({columna}, 0), r.ultima_actividad
+        FROM usuarios u
+        LEFT JOIN resumen_usuarios r ON r.usuario_id = u.id
+    '''
+    params = ()
+    if usuario_ids is not None:
+        params = tuple(usuario_ids)
+        if not params:
+            return {}
+        query += f' WHERE u.id IN ({",".join("?" * len(params))})'
+    cursor.execute(query, params)
+    return {
+        row[0]: {
+            'cajeros_activos': row[1],
+            'total_cargas': row[2],
+            'total_pendiente': round(row[3], 2),
+            'ultima_actividad': row[4] or '--'
+        } for row in cursor.fetchall()
+    }
+
+# ========== BÚSQUEDA DE USUARIOS ==========
+# usuarios_fts indexa email y nombre (contenido externo: lee de usuarios, los
+# triggers solo mantienen el índice). unicode61 ignora mayúsculas y acentos y
+# separa el email en palabras, así "juan" encuentra juan.perez@... y "Pérez".
+def crear_usuarios_fts(cursor):
+    cursor.execute('''
+        CREATE VIRTUAL TABLE IF NOT EXISTS usuarios_fts USING fts5(
+            email, nombre,
+            content='usuarios', content_rowid='id',
+            tokenize='unicode61 remove_diacritics 2', prefix='2 3'
+        )
+    ''')
+    cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS trg_usuarios_fts_insert AFTER INSERT ON usuarios
+        BEGIN
+            INSERT INTO usuarios_fts (rowid, email, nombre) VALUES (NEW.id, NEW.email, NEW.nombre);
+        END
+    ''')
+    cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS trg_usuarios_fts_delete AFTER DELETE ON usuarios
+        BEGIN
+            INSERT INTO usuarios_fts (usuarios_fts, rowid, email, nombre)
+            VALUES ('delete', OLD.id, OLD.email, OLD.nombre);
+        END
+    ''')
+    cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS trg_usuarios_fts_update AFTER UPDATE OF email, nombre ON usuarios
+        BEGIN
+            INSERT INTO usuarios_fts (usuarios_fts, rowid, email, nombre)
+            VALUES ('delete', OLD.id, OLD.email, OLD.nombre);
+            INSERT INTO usuarios_fts (rowid, email, nombre) VALUES (NEW.id, NEW.email, NEW.nombre);
+        END
+    ''')
+    cursor.execute("INSERT INTO usuarios_fts (usuarios_fts) VALUES ('rebuild')")
+
+def expresion_fts(termino):
+    """Consulta FTS5 con cada palabra del término como prefijo (AND implícito).
+
+    Las palabras van entre comillas para que el texto del usuario no se
+    interprete como sintaxis de FTS5. None si el término no tiene palabras.
+    """
+    palabras = re.findall(r'\w+', termino or '')
+    if not palabras:
+        return None
+    return ' '.join(f'"{palabra}"*' for palabra in palabras)
+
+# ========== BÚSQUEDA DE CARGAS ==========
+# cargas_fts guarda nota, nombre del cajero y plataforma de cada carga
+# (rowid = cargas.id). El nombre del cajero vive en otra tabla, por eso no
+# es de contenido externo: los triggers copian el texto al insertar, al
+# editar la carga y al renombrar el cajero. usuario_id se indexa como un
+# token más para que el MATCH ya venga acotado al usuario.
+SQL_CARGA_FTS = '''
+    INSERT INTO cargas_fts (rowid, nota, cajero, plataforma, usuario_id)
+    VALUES ({ref}.id, {ref}.nota,
+            (SELECT nombre FROM cajeros WHERE id = {ref}.cajero_id),
+            {ref}.plataforma, {ref}.usuario_id);
+'''
+
+def crear_cargas_fts(cursor):
+    cursor.execute('''
+        CREATE VIRTUAL TABLE IF NOT EXISTS cargas_fts USING fts5(
+            nota, cajero, plataforma, usuario_id,
+            tokenize='unicode61 remove_diacritics 2', prefix='2 3'
+        )
+    ''')
+    cursor.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS trg_cargas_fts_insert AFTER INSERT ON cargas
+        BEGIN {SQL_CARGA_FTS.format(ref='NEW')} END
+    ''')
+    cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS trg_cargas_fts_delete AFTER DELETE ON cargas
+        BEGIN
+            DELETE FROM cargas_fts WHERE rowid = OLD.id;
+        END
+    ''')
+    cursor.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS trg_cargas_fts_update
+        AFTER UPDATE OF nota, plataforma, cajero_id, usuario_id ON cargas
+        BEGIN
+            DELETE FROM cargas_fts WHERE rowid = OLD.id;
+            {SQL_CARGA_FTS.format(ref='NEW')}
+        END
+    ''')
+    cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS trg_cajeros_fts_update AFTER UPDATE OF nombre ON cajeros
+        BEGIN
+            UPDATE cargas_fts SET cajero = NEW.nombre
+            WHERE rowid IN (
+                SELECT id FROM cargas WHERE usuario_id = NEW.usuario_id AND cajero_id = NEW.id
+            );
+        END
+    ''')
+    cursor.execute('''
+        INSERT INTO cargas_fts (rowid, nota, cajero, plataforma, usuario_id)
+        SELECT cg.id, cg.nota, c.nombre, cg.plataforma, cg.usuario_id
+        FROM cargas cg
+        LEFT JOIN cajeros c ON c.id = cg.cajero_id
+    ''')
+
+# ========== VERSIONES DE DATOS ==========
+# versiones_datos lleva un contador por usuario que los triggers incrementan en
+# cada escritura sobre sus cajeros, cargas y pagos. Sirve como marca de agua
+# para saber si algo derivado de esos datos (p. ej. una exportación) quedó viejo.
+TABLAS_VERSIONADAS = ('cargas', 'cajeros', 'pagos')
+
+def crear_versiones_datos(cursor):
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS versiones_datos (
+            usuario_id INTEGER PRIMARY KEY,
+            version INTEGER NOT NULL DEFAULT 0
+        )
+    ''')
+    for tabla in TABLAS_VERSIONADAS:
+        for evento, ref in (('INSERT', 'NEW'), ('UPDATE', 'NEW'), ('DELETE', 'OLD')):
+            cursor.execute(f'''
+                CREATE TRIGGER IF NOT EXISTS trg_{tabla}_version_{evento.lower()}
+                AFTER {evento} ON {tabla}
+                BEGIN
+                    INSERT INTO versiones_datos (usuario_id, version) VALUES ({ref}.usuario_id, 1)
+                    ON CONFLICT (usuario_id) DO UPDATE SET version = version + 1;
+                END
+            ''')
+
+def obtener_version_datos(cursor, usuario_id):
+    cursor.execute('SELECT version FROM versiones_datos WHERE usuario_id = ?', (usuario_id,))
+    row = cursor.fetchone()
+    return row[0] if row else 0
+
+def crear_versiones_sistema(cursor):
+    # Contadores globales, p. ej. 'configuraciones' para invalidar la ConfigCache
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS versiones_sistema (
+            clave TEXT PRIMARY KEY,
+            version INTEGER NOT NULL DEFAULT 0
+        )
+    ''')
+    for evento in ('INSERT', 'UPDATE', 'DELETE'):
+        cursor.execute(f'''
+            CREATE TRIGGER IF NOT EXISTS trg_configuraciones_version_{evento.lower()}
+            AFTER {evento} ON configuraciones
+            BEGIN
+                INSERT INTO versiones_sistema (clave, version) VALUES ('configuraciones', 1)
+                ON CONFLICT (clave) DO UPDATE SET version = version + 1;
+            END
+        ''')
+
+def crear_eventos_usuario(cursor):
+    # Bitácora corta de eventos para SSE; la comparten los workers de gunicorn
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS eventos_usuario (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            usuario_id INTEGER NOT NULL,
+            tipo TEXT NOT NULL,
+            datos TEXT,
+            fecha TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+    cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_eventos_usuario_id
+        ON eventos_usuario (usuario_id, id)
+    ''')
+
+# ========== CONTADORES MONÓTONOS ==========
+# Las versiones (ETags, nombres de exportaciones, ConfigCache) y los ids de
+# eventos SSE solo sirven si nunca retroceden. Restaurar un backup los lleva a
+# valores viejos, así que se guardan antes y se reanudan por encima después.
+def leer_contadores_monotonos(cursor):
+    contadores = {'versiones_datos': [], 'versiones_sistema': [], 'eventos_usuario': 0}
+    try:
+        cursor.execute('SELECT usuario_id, version FROM versiones_datos')
+        contadores['versiones_datos'] = cursor.fetchall()
+        cursor.execute('SELECT clave, version FROM versiones_sistema')
+        contadores['versiones_sistema'] = cursor.fetchall()
+        cursor.execute("SELECT COALESCE(MAX(seq), 0) FROM sqlite_sequence WHERE name = 'eventos_usuario'")
+        contadores['eventos_usuario'] = cursor.fetchone()[0]
+    except sqlite3.OperationalError:
+        pass
+    return contadores
+
+def reanudar_contadores_monotonos(cursor, previos):
+    """Deja cada contador por encima de su valor previo y del restaurado."""
+    cursor.executemany('''
+        INSERT INTO versiones_datos (usuario_id, version) VALUES (?, ?)
+        ON CONFLICT (usuario_id) DO UPDATE SET version = MAX(version, excluded.version)
+    ''', previos['versiones_datos'])
+    cursor.execute('UPDATE versiones_datos SET version = version + 1')
+    cursor.executemany('''
+        INSERT INTO versiones_sistema (clave, version) VALUES (?, ?)
+        ON CONFLICT (clave) DO UPDATE SET version = MAX(version, excluded.version)
+    ''', previos['versiones_sistema'])
+    # Sin fila la ConfigCache lee 0 antes y después: se crea para que cambie
+    cursor.execute("INSERT OR IGNORE INTO versiones_sistema (clave, version) VALUES ('configuraciones', 0)")
+    cursor.execute('UPDATE versiones_sistema SET version = version + 1')
+    cursor.execute("UPDATE sqlite_sequence SET seq = MAX(seq, ?) WHERE name = 'eventos_usuario'",
+                   (previos['eventos_usuario'],))
+    if cursor.rowcount == 0:
+        cursor.execute("INSERT INTO sqlite_sequence (name, seq) VALUES ('eventos_usuario', ?)",
+                       (previos['eventos_usuario'],))
+
+def crear_pago_cargas(cursor):
+    # Qué cargas cubrió cada pago y por cuánto
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS pago_cargas (
+            pago_id INTEGER NOT NULL,
+            carga_id INTEGER NOT NULL,
+            monto REAL NOT NULL,
+            PRIMARY KEY (pago_id, carga_id)
+        )
+    ''')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_pago_cargas_carga ON pago_cargas (carga_id)')
+    cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS trg_cargas_pago_cargas_delete
+        AFTER DELETE ON cargas
+        BEGIN
+            DELETE FROM pago_cargas WHERE carga_id = OLD.id;
+        END
+    ''')
+    # Recorrido de pendientes de un cajero del más antiguo al más nuevo
+    cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_cargas_usuario_cajero_pagado_fecha
+        ON cargas (usuario_id, cajero_id, pagado, fecha, id)
+    ''')
+
+SQL_FECHA_TS = "COALESCE(CAST(strftime('%s', replace(substr({ref}, 1, 19), 'T', ' ')) AS INTEGER), 0)"
+
+def crear_fecha_ts_cargas(cursor):
+    # Columna entera para filtrar y ordenar por fecha con rangos que usen índice
+    cursor.execute("PRAGMA table_info(cargas)")
+    if 'fecha_ts' not in [col[1] for col in cursor.fetchall()]:
+        cursor.execute('ALTER TABLE cargas ADD COLUMN fecha_ts INTEGER')
+    cursor.execute(f"UPDATE cargas SET fecha_ts = {SQL_FECHA_TS.format(ref='fecha')}")
+    cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_cargas_usuario_fecha_ts
+        ON cargas (usuario_id, fecha_ts, id)
+    ''')
+    # Respaldo para escrituras que no calculen fecha_ts (la app la envía siempre)
+    cursor.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS trg_cargas_fecha_ts_insert
+        AFTER INSERT ON cargas WHEN NEW.fecha_ts IS NULL
+        BEGIN
+            UPDATE cargas SET fecha_ts = {SQL_FECHA_TS.format(ref='NEW.fecha')} WHERE id = NEW.id;
+        END
+    ''')
+    cursor.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS trg_cargas_fecha_ts_update
+        AFTER UPDATE OF fecha ON cargas
+        BEGIN
+            UPDATE cargas SET fecha_ts = {SQL_FECHA_TS.format(ref='NEW.fecha')} WHERE id = NEW.id;
+        END
+    ''')
+
+# Migraciones versionadas (PRAGMA user_version). Cada entrada se aplica una
+# sola vez, en orden, y nunca se edita: los cambios nuevos van al final.
+MIGRACIONES_BD = [
+    (1, [
+        # Pendientes por cajero/plataforma (resumen, registrar_pago); cubre monto
+        '''CREATE INDEX IF NOT EXISTS idx_cargas_usuario_cajero_pagado
+           ON cargas (usuario_id, cajero_id, pagado, plataforma, monto)''',
+        # Listados y reportes por fecha (get_cargas, reportes, exportaciones)
+        '''CREATE INDEX IF NOT EXISTS idx_cargas_usuario_fecha
+           ON cargas (usuario_id, fecha)''',
+        '''CREATE INDEX IF NOT EXISTS idx_pagos_usuario_cajero_fecha
+           ON pagos (usuario_id, cajero_id, fecha_pago)''',
+        # Pagos pendientes del admin e ingresos verificados
+        '''CREATE INDEX IF NOT EXISTS idx_solicitudes_estado_fecha
+           ON solicitudes_pago (estado, fecha_solicitud)''',
+        '''CREATE INDEX IF NOT EXISTS idx_solicitudes_estado_respuesta
+           ON solicitudes_pago (estado, fecha_respuesta)''',
+        # Mis solicitudes
+        '''CREATE INDEX IF NOT EXISTS idx_solicitudes_usuario_fecha
+           ON solicitudes_pago (usuario_id, fecha_solicitud)''',
+    ]),
+    (2, [crear_saldos_pendientes]),
+    (3, [crear_versiones_datos]),
+    (4, [crear_versiones_sistema]),
+    (5, [crear_eventos_usuario]),
+    (6, [crear_pago_cargas]),
+    (7, [crear_resumen_diario]),
+    (8, [crear_fecha_ts_cargas]),
+    (9, [crear_resumen_usuarios]),
+    (10, [
+        crear_usuarios_fts,
+        # Listado paginado del admin y filtro por ventana de expiración
+        '''CREATE INDEX IF NOT EXISTS idx_usuarios_registro
+           ON usuarios (fecha_registro, id)''',
+        '''CREATE INDEX IF NOT EXISTS idx_usuarios_expiracion
+           ON usuarios (fecha_expiracion)''',
+    ]),
+    (11, [crear_cargas_fts]),
+    (12, [
+        # El índice de la migración 6 no servía: con "pagado = 0 OR pagado IS NULL"
+        # el planificador no puede fijar pagado y prefería idx_cargas_usuario_fecha
+        # (todas las cargas del usuario). Un índice parcial con la misma condición
+        # sí se usa y ya entrega las pendientes ordenadas por fecha, id.
+        'DROP INDEX IF EXISTS idx_cargas_usuario_cajero_pagado_fecha',
+        '''CREATE INDEX IF NOT EXISTS idx_cargas_pendientes_cajero_fecha
+           ON cargas (usuario_id, cajero_id, fecha, id, monto)
+           WHERE pagado = 0 OR pagado IS NULL''',
+    ]),
+    (13, [agregar_pendientes_resumen_usuarios]),
+    (14, [
+        # Usuarios con fecha_registro NULL (altas viejas o manuales) rompían la
+        # paginación del admin: (NULL, id) < (?, ?) nunca es verdadero. Se ordena
+        # por COALESCE(fecha_registro, '') con un índice sobre esa expresión.
+        'DROP INDEX IF EXISTS idx_usuarios_registro',
+        '''CREATE INDEX IF NOT EXISTS idx_usuarios_registro_orden
+           ON usuarios (COALESCE(fecha_registro, ''), id)''',
+    ]),
+]
+
+def aplicar_migraciones(cursor):
+    cursor.execute('PRAGMA user_version')
+    version = cursor.fetchone()[0]
+    for numero, pasos in MIGRACIONES_BD:
+        if numero <= version:
+            continue
+        for paso in pasos:
+            if callable(paso):
+                paso(cursor)
+            else:
+                cursor.execute(paso)
+        cursor.execute(f'PRAGMA user_version = {int(numero)}')
+        print(f"🔧 Migración {numero} aplicada")
+
 def actualizar_bd():
     """Actualizar base de datos existente"""
     try:
@@ -435,6 +1532,8 @@ def actualizar_bd():
                     (clave, valor)
                 )
 
+        aplicar_migraciones(cursor)
+
         # Usuario admin por defecto si no hay usuarios (email: admin@paybook.local, contraseña: Admin123)
         cursor.execute("SELECT name FROM sqlite_master WHERE type='table' AND name='usuarios'")
         if cursor.fetchone():
@@ -466,6 +1565,11 @@ def handle_json():
         except:
             request.json_data = None
 
+@app.teardown_request
+def release_db_connections(exception=None):
+    # Recupera conexiones que una ruta no devolvió por salir con excepción
+    db_pool.release_thread()
+
 # ========== RUTAS PRINCIPALES ==========
 @app.route('/')
 def index():
@@ -516,19 +1620,18 @@ def api_login():
         if not email or not password:
             return jsonify({'success': False, 'error': 'Email y contraseña son obligatorios'}), 400
 
-        with db_lock:
-            conn = sqlite3.connect(DB_PATH)
-            cursor = conn.cursor()
-            cursor.execute(
-                '''
-                SELECT id, email, password_hash, nombre, plan, rol, avatar, telefono, fecha_expiracion, fecha_registro, theme_primary, theme_accent
-                FROM usuarios
-                WHERE email = ? AND activo = 1
-                ''',
-                (email,)
-            )
-            row = cursor.fetchone()
-            conn.close()
+        conn = db_pool.connect()
+        cursor = conn.cursor()
+        cursor.execute(
+            '''
+            SELECT id, email, password_hash, nombre, plan, rol, avatar, telefono, fecha_expiracion, fecha_registro, theme_primary, theme_accent
+            FROM usuarios
+            WHERE email = ? AND activo = 1
+            ''',
+            (email,)
+        )
+        row = cursor.fetchone()
+        conn.close()
 
         if not row:
             return jsonify({'success': False, 'error': 'Credenciales inválidas'}), 401
@@ -578,8 +1681,8 @@ def api_register():
         if password_error:
             return jsonify({'success': False, 'error': password_error}), 400
 
-        with db_lock:
-            conn = sqlite3.connect(DB_PATH)
+        with db_write_lock:
+            conn = db_pool.connect()
             cursor = conn.cursor()
             cursor.execute('SELECT id FROM usuarios WHERE email = ?', (email,))
             if cursor.fetchone():
@@ -646,8 +1749,8 @@ def api_auth_update():
         if theme_accent and not hex_pattern.match(theme_accent):
             return jsonify({'success': False, 'error': 'Color secundario inválido'}), 400
 
-        with db_lock:
-            conn = sqlite3.connect(DB_PATH)
+        with db_write_lock:
+            conn = db_pool.connect()
             cursor = conn.cursor()
             cursor.execute('''
                 UPDATE usuarios
@@ -664,6 +1767,7 @@ def api_auth_update():
 
             conn.commit()
             conn.close()
+        user_cache.invalidate(current_user.id)
 
         return jsonify({'success': True})
     except Exception:
@@ -680,15 +1784,14 @@ def api_auth_me():
         theme_primary = None
         theme_accent = None
         try:
-            with db_lock:
-                conn = sqlite3.connect(DB_PATH)
-                cursor = conn.cursor()
-                cursor.execute(
-                    'SELECT telefono, fecha_expiracion, avatar, fecha_registro, theme_primary, theme_accent FROM usuarios WHERE id = ?',
-                    (current_user.id,)
-                )
-                row = cursor.fetchone()
-                conn.close()
+            conn = db_pool.connect()
+            cursor = conn.cursor()
+            cursor.execute(
+                'SELECT telefono, fecha_expiracion, avatar, fecha_registro, theme_primary, theme_accent FROM usuarios WHERE id = ?',
+                (current_user.id,)
+            )
+            row = cursor.fetchone()
+            conn.close()
             if row:
                 telefono, expiracion, avatar_db, fecha_registro, theme_primary, theme_accent = row
                 avatar = avatar_db or avatar
@@ -722,8 +1825,8 @@ def solicitar_pago_manual():
         if plan not in ['lite', 'pro']:
             plan = 'lite'
 
-        with db_lock:
-            conn = sqlite3.connect(DB_PATH)
+        with db_write_lock:
+            conn = db_pool.connect()
             cursor = conn.cursor()
             cursor.execute('SELECT plan, fecha_expiracion FROM usuarios WHERE id = ?', (current_user.id,))
             user_row = cursor.fetchone()
@@ -814,17 +1917,16 @@ def solicitar_pago_manual():
 @login_required
 def mis_solicitudes_pago():
     try:
-        with db_lock:
-            conn = sqlite3.connect(DB_PATH)
-            cursor = conn.cursor()
-            cursor.execute('''
-                SELECT codigo, plan, monto, estado, fecha_solicitud, fecha_respuesta, notas
-                FROM solicitudes_pago
-                WHERE usuario_id = ?
-                ORDER BY fecha_solicitud DESC
-            ''', (current_user.id,))
-            rows = cursor.fetchall()
-            conn.close()
+        conn = db_pool.connect()
+        cursor = conn.cursor()
+        cursor.execute('''
+            SELECT codigo, plan, monto, estado, fecha_solicitud, fecha_respuesta, notas
+            FROM solicitudes_pago
+            WHERE usuario_id = ?
+            ORDER BY fecha_solicitud DESC
+        ''', (current_user.id,))
+        rows = cursor.fetchall()
+        conn.close()
 
         data = [{
             'codigo': row[0],
@@ -840,22 +1942,254 @@ def mis_solicitudes_pago():
     except Exception:
         return jsonify({'success': False, 'error': 'Error interno'}), 500
 
+# ========== EVENTOS EN TIEMPO REAL (SSE) ==========
+SSE_POLL_INTERVAL = float(os.environ.get('SSE_POLL_INTERVAL', 1))
+SSE_KEEPALIVE = float(os.environ.get('SSE_KEEPALIVE', 15))
+SSE_MAX_DURACION = int(os.environ.get('SSE_MAX_DURACION', 300))
+# Cada stream ocupa un hilo de gunicorn (Procfile: --threads 16 por worker).
+# El tope global deja hilos libres para la API; el tope por usuario evita que
+# unas pocas pestañas de un mismo usuario acaparen todo el cupo.
+SSE_MAX_CONEXIONES = int(os.environ.get('SSE_MAX_CONEXIONES', 10))
+SSE_MAX_CONEXIONES_USUARIO = int(os.environ.get('SSE_MAX_CONEXIONES_USUARIO', 3))
+SSE_EVENTOS_TTL = int(os.environ.get('SSE_EVENTOS_TTL', 3600))
+SSE_REINTENTO_MS = 3000
+
+def registrar_evento(cursor, usuario_id, tipo, datos=None):
+    """Agrega un evento dentro de la transacción de la escritura que lo origina."""
+    datos = dict(datos or {})
+    # La pestaña que hizo la escritura ya se refrescó sola: con su id puede
+    # ignorar el eco del evento
+    if has_request_context():
+        origen = request.headers.get('X-Pestana-Id', '')[:64]
+        if origen:
+            datos['origen'] = origen
+    cursor.execute(
+        'INSERT INTO eventos_usuario (usuario_id, tipo, datos) VALUES (?, ?, ?)',
+        (usuario_id, tipo, json.dumps(datos, ensure_ascii=False))
+    )
+
+def leer_eventos(cursor, desde_id, usuario_id=None):
+    if usuario_id is None:
+        cursor.execute(
+            'SELECT id, usuario_id, tipo, datos FROM eventos_usuario WHERE id > ? ORDER BY id',
+            (desde_id,)
+        )
+    else:
+        cursor.execute('''
+            SELECT id, usuario_id, tipo, datos FROM eventos_usuario
+            WHERE usuario_id = ? AND id > ? ORDER BY id
+        ''', (usuario_id, desde_id))
+    return cursor.fetchall()
+
+class EventBroker:
+    """Reparte eventos de eventos_usuario a las conexiones SSE de este worker.
+
+    Un solo hilo por proceso lee la tabla (cada `poll_interval` o enseguida
+    cuando una escritura local llama a notificar()) y encola cada evento en
+    las conexiones abiertas de su usuario. Así los eventos escritos por el
+    otro worker también llegan, con una sola consulta para todos los clientes.
+    """
+
+    def __init__(self, poll_interval, max_conexiones, max_por_usuario, ttl):
+        self.poll_interval = poll_interval
+        self.max_conexiones = max_conexiones
+        self.max_por_usuario = max_por_usuario
+        self.ttl = ttl
+        self._lock = Lock()
+        self._suscriptores = {}
+        self._conexiones = 0
+        self._despertar = Event()
+        self._hilo = None
+        self._ultimo_id = 0
+        self._proxima_limpieza = 0
+
+    def suscribir(self, usuario_id):
+        with self._lock:
+            colas = self._suscriptores.get(usuario_id, ())
+            if self._conexiones >= self.max_conexiones or len(colas) >= self.max_por_usuario:
+                return None
+            cola = queue.Queue()
+            self._suscriptores.setdefault(usuario_id, set()).add(cola)
+            self._conexiones += 1
+            if self._hilo is None or not self._hilo.is_alive():
+                self._ultimo_id = self._max_id()
+                self._hilo = Thread(target=self._run, name='sse-broker', daemon=True)
+                self._hilo.start()
+            return cola
+
+    def desuscribir(self, usuario_id, cola):
+        with self._lock:
+            colas = self._suscriptores.get(usuario_id)
+            if colas and cola in colas:
+                colas.discard(cola)
+                self._conexiones -= 1
+                if not colas:
+                    del self._suscriptores[usuario_id]
+
+    def notificar(self):
+        self._despertar.set()
+
+    def _max_id(self):
+        conn = db_pool.connect()
+        try:
+            cursor = conn.cursor()
+            cursor.execute('SELECT COALESCE(MAX(id), 0) FROM eventos_usuario')
+            return cursor.fetchone()[0]
+        finally:
+            conn.close()
+
+    def _limpiar(self, ahora):
+        # Los eventos solo sirven para reconexiones cercanas (Last-Event-ID)
+        self._proxima_limpieza = ahora + 600
+        # fecha se llena con CURRENT_TIMESTAMP (UTC): el límite sale del mismo reloj
+        with db_write_lock:
+            conn = db_pool.connect()
+            try:
+                conn.execute("DELETE FROM eventos_usuario WHERE fecha < datetime('now', ?)",
+                             (f'-{int(self.ttl)} seconds',))
+                conn.commit()
+            finally:
+                conn.close()
+
+    def _run(self):
+        while True:
+            self._despertar.wait(self.poll_interval)
+            self._despertar.clear()
+            with self._lock:
+                if not self._suscriptores:
+                    self._hilo = None
+                    return
+            try:
+                conn = db_pool.connect()
+                try:
+                    eventos = leer_eventos(conn.cursor(), self._ultimo_id)
+                finally:
+                    conn.close()
+                with self._lock:
+                    for evento in eventos:
+                        self._ultimo_id = evento[0]
+                        for cola in self._suscriptores.get(evento[1], ()):
+                            cola.put(evento)
+                ahora = time.monotonic()
+                if ahora >= self._proxima_limpieza:
+                    self._limpiar(ahora)
+            except Exception as e:
+                print(f"⚠️ Error en eventos SSE: {e}")
+
+event_broker = EventBroker(SSE_POLL_INTERVAL, SSE_MAX_CONEXIONES, SSE_MAX_CONEXIONES_USUARIO, SSE_EVENTOS_TTL)
+
+def formatear_evento_sse(evento):
+    evento_id, _, tipo, datos = evento
+    return f"id: {evento_id}\nevent: {tipo}\ndata: {datos}\n\n"
+
+@app.route('/api/eventos', methods=['GET'])
+@login_required
+def stream_eventos():
+    try:
+        usuario_id = current_user.id
+        desde = request.headers.get('Last-Event-ID') or request.args.get('last_event_id')
+        try:
+            desde_id = int(desde) if desde else None
+        except ValueError:
+            desde_id = None
+
+        cola = event_broker.suscribir(usuario_id)
+        if cola is None:
+            # Cada conexión ocupa un hilo de gunicorn: se limita por usuario y
+            # por worker; el cliente sigue con refresco periódico y reintenta
+            response = jsonify({'success': False, 'error': 'Demasiadas conexiones en tiempo real'})
+            response.headers['Retry-After'] = '30'
+            return response, 503
+
+        def generar():
+            ultimo_id = desde_id or 0
+            fin = time.monotonic() + SSE_MAX_DURACION
+            try:
+                yield f"retry: {SSE_REINTENTO_MS}\n\n"
+                if desde_id is not None:
+                    # Reconexión: reenviar lo que se perdió mientras estaba caído
+                    conn = db_pool.connect()
+                    try:
+                        perdidos = leer_eventos(conn.cursor(), desde_id, usuario_id)
+                    finally:
+                        conn.close()
+                    for evento in perdidos:
+                        ultimo_id = evento[0]
+                        yield formatear_evento_sse(evento)
+                while True:
+                    restante = fin - time.monotonic()
+                    if restante <= 0:
+                        # El navegador reconecta solo con Last-Event-ID y libera el hilo
+                        return
+                    try:
+                        evento = cola.get(timeout=min(SSE_KEEPALIVE, restante))
+                    except queue.Empty:
+                        yield ": keepalive\n\n"
+                        continue
+                    if evento[0] > ultimo_id:
+                        ultimo_id = evento[0]
+                        yield formatear_evento_sse(evento)
+            finally:
+                event_broker.desuscribir(usuario_id, cola)
+
+        response = app.response_class(generar(), mimetype='text/event-stream')
+        response.headers['Cache-Control'] = 'no-cache'
+        response.headers['X-Accel-Buffering'] = 'no'
+        return response
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+# ========== ETAG DE DATOS DEL USUARIO ==========
+# Las vistas del dashboard solo cambian cuando cambia versiones_datos del usuario
+# (la suben los triggers de cajeros/cargas/pagos). Con esa marca se arma el ETag
+# y se responde 304 leyendo una sola fila, sin ejecutar las consultas de la vista.
+def version_datos_usuario(usuario_id):
+    conn = db_pool.connect()
+    try:
+        return obtener_version_datos(conn.cursor(), usuario_id)
+    finally:
+        conn.close()
+
+def etag_datos_usuario(*extras):
+    """ETag de la ruta actual para current_user; `extras` son otros datos que alteran la respuesta."""
+    partes = [request.path, str(current_user.id), str(version_datos_usuario(current_user.id))]
+    partes.extend(str(extra) for extra in extras)
+    return hashlib.sha256('|'.join(partes).encode('utf-8')).hexdigest()[:32]
+
+def no_modificado(etag):
+    """Respuesta 304 si el cliente ya tiene esta versión, None si hay que generarla."""
+    if etag in request.if_none_match:
+        return con_etag(app.response_class(status=304), etag)
+    return None
+
+def con_etag(response, etag):
+    response.set_etag(etag)
+    # private + no-cache: el navegador guarda la copia pero revalida siempre
+    response.cache_control.private = True
+    response.cache_control.no_cache = True
+    response.vary.add('Cookie')
+    return response
+
 # ========== API CAJEROS ==========
 @app.route('/api/cajeros', methods=['GET'])
 @login_required
 def get_cajeros():
     try:
-        with db_lock:
-            conn = sqlite3.connect(DB_PATH)
-            cursor = conn.cursor()
-            cursor.execute(
-                'SELECT id, nombre, activo, fecha_creacion FROM cajeros WHERE usuario_id = ? ORDER BY nombre',
-                (current_user.id,)
-            )
-            cajeros = cursor.fetchall()
-            conn.close()
-        
-        return jsonify({
+        etag = etag_datos_usuario()
+        cached = no_modificado(etag)
+        if cached:
+            return cached
+
+        conn = db_pool.connect()
+        cursor = conn.cursor()
+        cursor.execute(
+            'SELECT id, nombre, activo, fecha_creacion FROM cajeros WHERE usuario_id = ? ORDER BY nombre',
+            (current_user.id,)
+        )
+        cajeros = cursor.fetchall()
+        conn.close()
+    
+        return con_etag(jsonify({
             'success': True,
             'data': [{
                 'id': row[0],
@@ -863,7 +2197,7 @@ def get_cajeros():
                 'activo': bool(row[2]),
                 'fecha_creacion': row[3]
             } for row in cajeros]
-        })
+        }), etag)
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)}), 500
 
@@ -887,8 +2221,8 @@ def add_cajero():
         if len(nombre) < 2:
             return jsonify({'success': False, 'error': 'El nombre debe tener al menos 2 caracteres'}), 400
         
-        with db_lock:
-            conn = sqlite3.connect(DB_PATH)
+        with db_write_lock:
+            conn = db_pool.connect()
             cursor = conn.cursor()
             
             try:
@@ -976,8 +2310,8 @@ def update_cajero(id):
         if not nombre:
             return jsonify({'success': False, 'error': 'El nombre no puede estar vacío'}), 400
         
-        with db_lock:
-            conn = sqlite3.connect(DB_PATH)
+        with db_write_lock:
+            conn = db_pool.connect()
             cursor = conn.cursor()
             
             # Verificar si existe
@@ -1022,8 +2356,8 @@ def update_cajero(id):
 def eliminar_cajero_completamente(id):
     """Eliminar completamente un cajero (solo si no tiene cargas)"""
     try:
-        with db_lock:
-            conn = sqlite3.connect(DB_PATH)
+        with db_write_lock:
+            conn = db_pool.connect()
             cursor = conn.cursor()
             
             # Verificar si existe
@@ -1066,8 +2400,8 @@ def eliminar_cajero_completamente(id):
 def delete_cajero(id):
     """Desactivar cajero (marcar como inactivo)"""
     try:
-        with db_lock:
-            conn = sqlite3.connect(DB_PATH)
+        with db_write_lock:
+            conn = db_pool.connect()
             cursor = conn.cursor()
             
             # Verificar si existe
@@ -1098,50 +2432,87 @@ def delete_cajero(id):
         return jsonify({'success': False, 'error': str(e)}), 500
 
 # ========== API CARGAS - GET ==========
+CARGAS_LIMITE_DEFAULT = 100
+CARGAS_LIMITE_MAX = 500
+
 @app.route('/api/cargas', methods=['GET'])
 @login_required
 def get_cargas():
     try:
-        with db_lock:
-            conn = sqlite3.connect(DB_PATH)
-            cursor = conn.cursor()
-            
-            # Obtener parámetros de filtro
-            fecha_inicio = request.args.get('fecha_inicio')
-            fecha_fin = request.args.get('fecha_fin')
-            cajero_id = request.args.get('cajero_id')
-            plataforma = request.args.get('plataforma')
-            limite = request.args.get('limite', 100)
-            
-            query = '''
-                SELECT cg.id, c.nombre, cg.plataforma, cg.monto, cg.fecha, cg.nota, cg.pagado, cg.es_deuda
-                FROM cargas cg
-                JOIN cajeros c ON cg.cajero_id = c.id
-                WHERE cg.usuario_id = ? AND c.usuario_id = ?
-            '''
-            
-            params = [current_user.id, current_user.id]
-            
-            if fecha_inicio and fecha_fin:
-                query += ' AND cg.fecha BETWEEN ? AND ?'
-                params.extend([fecha_inicio, fecha_fin])
-            
-            if cajero_id:
-                query += ' AND cg.cajero_id = ?'
-                params.append(cajero_id)
-            
-            if plataforma:
-                query += ' AND cg.plataforma = ?'
-                params.append(plataforma)
-            
-            query += ' ORDER BY cg.fecha DESC LIMIT ?'
-            params.append(limite)
-            
-            cursor.execute(query, params)
-            cargas = cursor.fetchall()
-            conn.close()
+        # Obtener parámetros de filtro
+        fecha_inicio = request.args.get('fecha_inicio')
+        fecha_fin = request.args.get('fecha_fin')
+        cajero_id = request.args.get('cajero_id')
+        plataforma = request.args.get('plataforma')
+        limite = parse_limite(request.args.get('limite'), CARGAS_LIMITE_DEFAULT, CARGAS_LIMITE_MAX)
+        if limite is None:
+            return jsonify({
+                'success': False,
+                'error': f'El límite debe ser un número entre 1 y {CARGAS_LIMITE_MAX}'
+            }), 400
+
+        rango = None
+        if fecha_inicio and fecha_fin:
+            rango = rango_fechas(fecha_inicio, fecha_fin)
+            if rango is None:
+                return jsonify({'success': False, 'error': 'Fechas inválidas'}), 400
+
+        # Paginación por cursor sobre (fecha_ts, id), el mismo orden del índice
+        pagina_cursor = request.args.get('cursor')
+        posicion = None
+        if pagina_cursor:
+            posicion = decode_page_cursor(pagina_cursor, int, int)
+            if posicion is None:
+                return jsonify({'success': False, 'error': 'Cursor inválido'}), 400
+
+        # Filtros y cursor forman parte de la respuesta, así que van en el ETag
+        etag = etag_datos_usuario(request.query_string.decode('utf-8', 'replace'))
+        cached = no_modificado(etag)
+        if cached:
+            return cached
+
+        query = '''
+            SELECT cg.id, c.nombre, cg.plataforma, cg.monto, cg.fecha, cg.nota, cg.pagado, cg.es_deuda,
+                   cg.fecha_ts
+            FROM cargas cg
+            JOIN cajeros c ON cg.cajero_id = c.id
+            WHERE cg.usuario_id = ? AND c.usuario_id = ?
+        '''
         
-        return jsonify({
+        params = [current_user.id, current_user.id]
+        
+        if rango:
+            query += ' AND cg.fecha_ts >= ? AND cg.fecha_ts < ?'
+            params.extend(rango)
+        
+        if cajero_id:
+            query += ' AND cg.cajero_id = ?'
+            params.append(cajero_id)
+        
+        if plataforma:
+            query += ' AND cg.plataforma = ?'
+            params.append(plataforma)
+
+        if posicion:
+            query += ' AND (cg.fecha_ts, cg.id) < (?, ?)'
+            params.extend(posicion)
+        
+        # Se pide una fila extra para saber si hay página siguiente
+        query += ' ORDER BY cg.fecha_ts DESC, cg.id DESC LIMIT ?'
+        params.append(limite + 1)
+        
+        conn = db_pool.connect()
+        cursor = conn.cursor()
+        cursor.execute(query, params)
+        cargas = cursor.fetchall()
+        conn.close()
+
+        next_cursor = None
+        if len(cargas) > limite:
+            cargas = cargas[:limite]
+            next_cursor = encode_page_cursor(cargas[-1][8], cargas[-1][0])
+    
+        return con_etag(jsonify({
             'success': True,
             'data': [{
                 'id': row[0],
@@ -1152,8 +2523,9 @@ def get_cargas():
                 'nota': row[5] or '',
                 'pagado': bool(row[6]),
                 'es_deuda': bool(row[7])
-            } for row in cargas]
-        })
+            } for row in cargas],
+            'next_cursor': next_cursor
+        }), etag)
         
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)}), 500
@@ -1191,8 +2563,8 @@ def add_carga():
         fecha = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
         es_deuda = 1 if monto < 0 else 0
         
-        with db_lock:
-            conn = sqlite3.connect(DB_PATH)
+        with db_write_lock:
+            conn = db_pool.connect()
             cursor = conn.cursor()
             
             # Verificar que el cajero existe
@@ -1206,18 +2578,12 @@ def add_carga():
                 return jsonify({'success': False, 'error': 'El cajero no existe o está inactivo'}), 400
             
             cursor.execute('''
-                INSERT INTO cargas (usuario_id, cajero_id, plataforma, monto, fecha, nota, es_deuda)
-                VALUES (?, ?, ?, ?, ?, ?, ?)
-            ''', (current_user.id, cajero_id, plataforma, monto, fecha, nota, es_deuda))
-            
-            conn.commit()
+                INSERT INTO cargas (usuario_id, cajero_id, plataforma, monto, fecha, fecha_ts, nota, es_deuda)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+            ''', (current_user.id, cajero_id, plataforma, monto, fecha, fecha_a_ts(fecha), nota, es_deuda))
             carga_id = cursor.lastrowid
-            conn.close()
-        
-        tipo_carga = "deuda" if monto < 0 else "carga"
-        return jsonify({
-            'success': True,
-            'data': {
+
+            carga = {
                 'id': carga_id,
                 'cajero': cajero[1],
                 'plataforma': plataforma,
@@ -1226,10 +2592,20 @@ def add_carga():
                 'nota': nota,
                 'pagado': False,
                 'es_deuda': es_deuda
-            },
-            'message': f'{tipo_carga.capitalize()} registrada exitosamente'
-        })
-        
+            }
+            registrar_evento(cursor, current_user.id, 'carga_creada', carga)
+            
+            conn.commit()
+            conn.close()
+        event_broker.notificar()
+        
+        tipo_carga = "deuda" if monto < 0 else "carga"
+        return jsonify({
+            'success': True,
+            'data': carga,
+            'message': f'{tipo_carga.capitalize()} registrada exitosamente'
+        })
+        
     except ValueError:
         return jsonify({'success': False, 'error': 'El monto debe ser un número válido'}), 400
     except Exception as e:
@@ -1239,8 +2615,8 @@ def add_carga():
 @login_required
 def delete_carga(id):
     try:
-        with db_lock:
-            conn = sqlite3.connect(DB_PATH)
+        with db_write_lock:
+            conn = db_pool.connect()
             cursor = conn.cursor()
             
             # Verificar si existe
@@ -1254,8 +2630,10 @@ def delete_carga(id):
             
             # Eliminar carga
             cursor.execute('DELETE FROM cargas WHERE id = ? AND usuario_id = ?', (id, current_user.id))
+            registrar_evento(cursor, current_user.id, 'carga_eliminada', {'id': id})
             conn.commit()
             conn.close()
+        event_broker.notificar()
         
         return jsonify({
             'success': True,
@@ -1265,90 +2643,307 @@ def delete_carga(id):
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)}), 500
 
-# ========== API RESÚMEN ==========
-@app.route('/api/resumen', methods=['GET'])
+# ========== API CARGAS - LOTE ==========
+CARGAS_LOTE_MAX = int(os.environ.get('CARGAS_LOTE_MAX', 500))
+
+def validar_carga_lote(item):
+    """Valida una carga del lote igual que add_carga. Devuelve (valores, error)."""
+    if not isinstance(item, dict):
+        return None, 'Formato de carga inválido'
+    for field in ('cajero_id', 'plataforma', 'monto'):
+        if field not in item:
+            return None, f'Falta el campo: {field}'
+    try:
+        cajero_id = int(item['cajero_id'])
+    except (TypeError, ValueError):
+        return None, 'El cajero no existe o está inactivo'
+    try:
+        monto = float(item['monto'])
+    except (TypeError, ValueError):
+        return None, 'El monto debe ser un número válido'
+    if monto == 0:
+        return None, 'El monto no puede ser 0'
+    if abs(monto) > 1000000:
+        return None, 'El monto no puede superar $1,000,000'
+    # Un valor JSON que no es texto no puede ir a la base: error de esa fila
+    plataforma = item['plataforma']
+    if not isinstance(plataforma, str):
+        return None, 'La plataforma debe ser texto'
+    nota = item.get('nota') or ''
+    if not isinstance(nota, str):
+        return None, 'La nota debe ser texto'
+    return (cajero_id, plataforma, monto, nota.strip()), None
+
+@app.route('/api/cargas/lote', methods=['POST'])
 @login_required
-def get_resumen():
+def add_cargas_lote():
+    """Registra varias cargas en una transacción; devuelve el resultado por fila."""
     try:
-        with db_lock:
-            conn = sqlite3.connect(DB_PATH)
+        # Un cuerpo ausente o que no es JSON es un error del cliente, no un 500
+        data = request.get_json(silent=True)
+
+        items = data.get('cargas') if isinstance(data, dict) else data
+        if not isinstance(items, list) or not items:
+            return jsonify({'success': False, 'error': 'Se requiere una lista de cargas'}), 400
+        if len(items) > CARGAS_LOTE_MAX:
+            return jsonify({
+                'success': False,
+                'error': f'Máximo {CARGAS_LOTE_MAX} cargas por lote'
+            }), 400
+
+        resultados = [None] * len(items)
+        validas = []
+        for indice, item in enumerate(items):
+            valores, error = validar_carga_lote(item)
+            if error:
+                resultados[indice] = {'indice': indice, 'success': False, 'error': error}
+            else:
+                validas.append((indice, valores))
+
+        fecha = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+        fecha_ts = fecha_a_ts(fecha)
+        insertadas = []
+
+        with db_write_lock:
+            conn = db_pool.connect()
             cursor = conn.cursor()
-            
-            # Obtener configuración de deudas
-            cursor.execute("SELECT valor FROM configuraciones WHERE clave = 'permitir_deudas'")
-            permitir_deudas = cursor.fetchone()
-            permitir_deudas = bool(int(permitir_deudas[0])) if permitir_deudas else True
-            
-            # Obtener todos los cajeros activos
-            cursor.execute(
-                'SELECT id, nombre FROM cajeros WHERE activo = 1 AND usuario_id = ? ORDER BY nombre',
-                (current_user.id,)
-            )
-            cajeros = cursor.fetchall()
-            
-            resumen = []
-            
-            for cajero_id, nombre in cajeros:
-                # Calcular totales por plataforma - SOLO NO PAGADAS
-                if permitir_deudas:
-                    # Si se permiten deudas, incluir montos negativos
-                    cursor.execute('''
-                        SELECT plataforma, SUM(monto) as total
-                        FROM cargas 
-                        WHERE cajero_id = ? AND usuario_id = ? AND (pagado = 0 OR pagado IS NULL)
-                        GROUP BY plataforma
-                    ''', (cajero_id, current_user.id))
-                else:
-                    # Si no se permiten deudas, solo montos positivos
-                    cursor.execute('''
-                        SELECT plataforma, SUM(monto) as total
-                        FROM cargas 
-                        WHERE cajero_id = ? AND usuario_id = ? AND (pagado = 0 OR pagado IS NULL) AND monto > 0
-                        GROUP BY plataforma
-                    ''', (cajero_id, current_user.id))
-                
-                montos = cursor.fetchall()
-                
-                # Inicializar en 0
-                totales = {'Zeus': 0, 'Gana': 0, 'Ganamos': 0}
-                
-                for plataforma, total in montos:
-                    if plataforma in totales:
-                        totales[plataforma] = total or 0
-                
-                total_general = sum(totales.values())
-                
-                # Obtener cantidad de cargas NO PAGADAS
-                if permitir_deudas:
-                    cursor.execute(
-                        'SELECT COUNT(*) FROM cargas WHERE cajero_id = ? AND usuario_id = ? AND (pagado = 0 OR pagado IS NULL)',
-                        (cajero_id, current_user.id)
-                    )
-                else:
-                    cursor.execute(
-                        'SELECT COUNT(*) FROM cargas WHERE cajero_id = ? AND usuario_id = ? AND (pagado = 0 OR pagado IS NULL) AND monto > 0',
-                        (cajero_id, current_user.id)
-                    )
-                
-                cantidad_cargas = cursor.fetchone()[0]
-                
-                resumen.append({
-                    'cajero': nombre,
-                    'cajero_id': cajero_id,
-                    'zeus': totales['Zeus'],
-                    'gana': totales['Gana'],
-                    'ganamos': totales['Ganamos'],
-                    'total': total_general,
-                    'cargas': cantidad_cargas
+
+            # Todos los cajeros del lote en una sola consulta
+            cajero_ids = sorted({valores[0] for _, valores in validas})
+            cajeros = {}
+            if cajero_ids:
+                marcadores = ','.join('?' * len(cajero_ids))
+                cursor.execute(f'''
+                    SELECT id, nombre FROM cajeros
+                    WHERE usuario_id = ? AND activo = 1 AND id IN ({marcadores})
+                ''', [current_user.id, *cajero_ids])
+                cajeros = dict(cursor.fetchall())
+
+            filas = []
+            for indice, (cajero_id, plataforma, monto, nota) in validas:
+                if cajero_id not in cajeros:
+                    resultados[indice] = {
+                        'indice': indice,
+                        'success': False,
+                        'error': 'El cajero no existe o está inactivo'
+                    }
+                    continue
+                es_deuda = 1 if monto < 0 else 0
+                filas.append((current_user.id, cajero_id, plataforma, monto, fecha, fecha_ts, nota, es_deuda))
+                insertadas.append((indice, cajero_id, plataforma, monto, nota, es_deuda))
+
+            if filas:
+                cursor.executemany('''
+                    INSERT INTO cargas (usuario_id, cajero_id, plataforma, monto, fecha, fecha_ts, nota, es_deuda)
+                    VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+                ''', filas)
+                # cargas.id es AUTOINCREMENT y la transacción tiene el lock de
+                # escritura: los ids del lote son consecutivos hasta el último
+                cursor.execute('SELECT last_insert_rowid()')
+                primer_id = cursor.fetchone()[0] - len(filas) + 1
+
+                for offset, (indice, cajero_id, plataforma, monto, nota, es_deuda) in enumerate(insertadas):
+                    resultados[indice] = {
+                        'indice': indice,
+                        'success': True,
+                        'data': {
+                            'id': primer_id + offset,
+                            'cajero': cajeros[cajero_id],
+                            'plataforma': plataforma,
+                            'monto': monto,
+                            'fecha': fecha,
+                            'nota': nota,
+                            'pagado': False,
+                            'es_deuda': es_deuda
+                        }
+                    }
+                registrar_evento(cursor, current_user.id, 'cargas_creadas', {
+                    'primer_id': primer_id,
+                    'ultimo_id': primer_id + len(filas) - 1,
+                    'cantidad': len(filas)
                 })
-            
+                conn.commit()
             conn.close()
-        
+
+        if insertadas:
+            event_broker.notificar()
+
         return jsonify({
             'success': True,
-            'data': resumen
+            'data': {
+                'insertadas': len(insertadas),
+                'errores': len(items) - len(insertadas),
+                'resultados': resultados
+            },
+            'message': f'{len(insertadas)} de {len(items)} cargas registradas'
         })
-        
+
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+# ========== API CARGAS - BÚSQUEDA ==========
+CARGAS_BUSQUEDA_LIMITE_DEFAULT = 50
+
+@app.route('/api/cargas/buscar', methods=['GET'])
+@login_required
+def buscar_cargas():
+    """Cargas del usuario cuyo texto (nota, cajero o plataforma) coincide con q.
+
+    Cada palabra de q se busca como prefijo y los resultados vienen
+    ordenados por relevancia (bm25). Admite fecha_inicio/fecha_fin como
+    /api/cargas. El orden por relevancia no sirve de clave estable, así que
+    el cursor guarda la posición (desplazamiento) dentro del resultado.
+    """
+    try:
+        expresion = expresion_fts(request.args.get('q'))
+        if expresion is None:
+            return jsonify({'success': False, 'error': 'Ingrese un texto para buscar'}), 400
+
+        limite = parse_limite(request.args.get('limite'), CARGAS_BUSQUEDA_LIMITE_DEFAULT, CARGAS_LIMITE_MAX)
+        if limite is None:
+            return jsonify({
+                'success': False,
+                'error': f'El límite debe ser un número entre 1 y {CARGAS_LIMITE_MAX}'
+            }), 400
+
+        fecha_inicio = request.args.get('fecha_inicio')
+        fecha_fin = request.args.get('fecha_fin')
+        rango = None
+        if fecha_inicio and fecha_fin:
+            rango = rango_fechas(fecha_inicio, fecha_fin)
+            if rango is None:
+                return jsonify({'success': False, 'error': 'Fechas inválidas'}), 400
+
+        desplazamiento = 0
+        pagina_cursor = request.args.get('cursor')
+        if pagina_cursor:
+            posicion = decode_page_cursor(pagina_cursor, int)
+            if posicion is None or posicion[0] < 0:
+                return jsonify({'success': False, 'error': 'Cursor inválido'}), 400
+            desplazamiento = posicion[0]
+
+        etag = etag_datos_usuario(request.query_string.decode('utf-8', 'replace'))
+        cached = no_modificado(etag)
+        if cached:
+            return cached
+
+        # El filtro por usuario va dentro del MATCH: FTS5 cruza las listas de
+        # ambos términos y no recorre coincidencias de otros usuarios
+        match = f'usuario_id : "{int(current_user.id)}" AND {{nota cajero plataforma}} : ({expresion})'
+        query = '''
+            SELECT cg.id, c.nombre, cg.plataforma, cg.monto, cg.fecha, cg.nota, cg.pagado, cg.es_deuda
+            FROM cargas_fts f
+            JOIN cargas cg ON cg.id = f.rowid
+            JOIN cajeros c ON cg.cajero_id = c.id
+            WHERE cargas_fts MATCH ? AND cg.usuario_id = ?
+        '''
+        params = [match, current_user.id]
+
+        if rango:
+            query += ' AND cg.fecha_ts >= ? AND cg.fecha_ts < ?'
+            params.extend(rango)
+
+        # Peso 0 para usuario_id: coincide en todas las filas y no aporta relevancia.
+        # Se pide una fila extra para saber si hay página siguiente
+        query += '''
+            ORDER BY bm25(cargas_fts, 1.0, 1.0, 1.0, 0.0), cg.fecha_ts DESC, cg.id DESC
+            LIMIT ? OFFSET ?
+        '''
+        params.extend([limite + 1, desplazamiento])
+
+        conn = db_pool.connect()
+        cursor = conn.cursor()
+        cursor.execute(query, params)
+        cargas = cursor.fetchall()
+        conn.close()
+
+        next_cursor = None
+        if len(cargas) > limite:
+            cargas = cargas[:limite]
+            next_cursor = encode_page_cursor(desplazamiento + limite)
+
+        return con_etag(jsonify({
+            'success': True,
+            'data': [{
+                'id': row[0],
+                'cajero': row[1],
+                'plataforma': row[2],
+                'monto': row[3],
+                'fecha': row[4],
+                'nota': row[5] or '',
+                'pagado': bool(row[6]),
+                'es_deuda': bool(row[7])
+            } for row in cargas],
+            'next_cursor': next_cursor
+        }), etag)
+
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+# ========== API RESÚMEN ==========
+PLATAFORMAS_RESUMEN = ('Zeus', 'Gana', 'Ganamos')
+
+def get_permitir_deudas(cursor):
+    valor = get_config_value(cursor, 'permitir_deudas')
+    return bool(int(valor)) if valor else True
+
+def calcular_resumen_pendiente(cursor, usuario_id, permitir_deudas):
+    """Totales NO PAGADOS por cajero activo y plataforma, leídos de saldos_pendientes."""
+    if permitir_deudas:
+        columnas = 'COALESCE(s.total, 0), COALESCE(s.cantidad, 0)'
+    else:
+        columnas = 'COALESCE(s.total_positivo, 0), COALESCE(s.cantidad_positivo, 0)'
+    cursor.execute(f'''
+        SELECT c.id, c.nombre, s.plataforma, {columnas}
+        FROM cajeros c
+        LEFT JOIN saldos_pendientes s ON s.usuario_id = c.usuario_id AND s.cajero_id = c.id
+        WHERE c.activo = 1 AND c.usuario_id = ?
+        ORDER BY c.nombre, c.id
+    ''', (usuario_id,))
+
+    resumen = []
+    por_cajero = {}
+    for cajero_id, nombre, plataforma, total, cantidad in cursor.fetchall():
+        item = por_cajero.get(cajero_id)
+        if item is None:
+            item = {'cajero': nombre, 'cajero_id': cajero_id, 'totales': dict.fromkeys(PLATAFORMAS_RESUMEN, 0), 'cargas': 0}
+            por_cajero[cajero_id] = item
+            resumen.append(item)
+        if plataforma in item['totales']:
+            item['totales'][plataforma] = total or 0
+        item['cargas'] += cantidad
+
+    return [{
+        'cajero': item['cajero'],
+        'cajero_id': item['cajero_id'],
+        'zeus': item['totales']['Zeus'],
+        'gana': item['totales']['Gana'],
+        'ganamos': item['totales']['Ganamos'],
+        'total': sum(item['totales'].values()),
+        'cargas': item['cargas']
+    } for item in resumen]
+
+@app.route('/api/resumen', methods=['GET'])
+@login_required
+def get_resumen():
+    try:
+        # permitir_deudas cambia qué se suma, por eso también entra en el ETag
+        permitir_deudas = get_permitir_deudas(None)
+        etag = etag_datos_usuario(permitir_deudas)
+        cached = no_modificado(etag)
+        if cached:
+            return cached
+
+        conn = db_pool.connect()
+        cursor = conn.cursor()
+        resumen = calcular_resumen_pendiente(cursor, current_user.id, permitir_deudas)
+        conn.close()
+
+        return con_etag(jsonify({
+            'success': True,
+            'data': resumen
+        }), etag)
+
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)}), 500
 
@@ -1357,83 +2952,23 @@ def get_resumen():
 def get_resumen_pendientes():
     """Obtener resumen solo de comisiones NO PAGADAS"""
     try:
-        with db_lock:
-            conn = sqlite3.connect(DB_PATH)
-            cursor = conn.cursor()
-            
-            # Obtener configuración de deudas
-            cursor.execute("SELECT valor FROM configuraciones WHERE clave = 'permitir_deudas'")
-            permitir_deudas = cursor.fetchone()
-            permitir_deudas = bool(int(permitir_deudas[0])) if permitir_deudas else True
-            
-            # Obtener todos los cajeros activos
-            cursor.execute(
-                'SELECT id, nombre FROM cajeros WHERE activo = 1 AND usuario_id = ? ORDER BY nombre',
-                (current_user.id,)
-            )
-            cajeros = cursor.fetchall()
-            
-            resumen = []
-            
-            for cajero_id, nombre in cajeros:
-                # Calcular totales por plataforma (SOLO NO PAGADAS)
-                if permitir_deudas:
-                    cursor.execute('''
-                        SELECT plataforma, SUM(monto) as total
-                        FROM cargas 
-                        WHERE cajero_id = ? AND usuario_id = ? AND (pagado = 0 OR pagado IS NULL)
-                        GROUP BY plataforma
-                    ''', (cajero_id, current_user.id))
-                else:
-                    cursor.execute('''
-                        SELECT plataforma, SUM(monto) as total
-                        FROM cargas 
-                        WHERE cajero_id = ? AND usuario_id = ? AND (pagado = 0 OR pagado IS NULL) AND monto > 0
-                        GROUP BY plataforma
-                    ''', (cajero_id, current_user.id))
-                
-                montos = cursor.fetchall()
-                
-                # Inicializar en 0
-                totales = {'Zeus': 0, 'Gana': 0, 'Ganamos': 0}
-                
-                for plataforma, total in montos:
-                    if plataforma in totales:
-                        totales[plataforma] = total or 0
-                
-                total_general = sum(totales.values())
-                
-                # Obtener cantidad de cargas NO PAGADAS
-                if permitir_deudas:
-                    cursor.execute(
-                        'SELECT COUNT(*) FROM cargas WHERE cajero_id = ? AND usuario_id = ? AND (pagado = 0 OR pagado IS NULL)',
-                        (cajero_id, current_user.id)
-                    )
-                else:
-                    cursor.execute(
-                        'SELECT COUNT(*) FROM cargas WHERE cajero_id = ? AND usuario_id = ? AND (pagado = 0 OR pagado IS NULL) AND monto > 0',
-                        (cajero_id, current_user.id)
-                    )
-                
-                cantidad_cargas = cursor.fetchone()[0]
-                
-                resumen.append({
-                    'cajero': nombre,
-                    'cajero_id': cajero_id,
-                    'zeus': totales['Zeus'],
-                    'gana': totales['Gana'],
-                    'ganamos': totales['Ganamos'],
-                    'total': total_general,
-                    'cargas': cantidad_cargas
-                })
-            
-            conn.close()
-        
-        return jsonify({
+        # permitir_deudas cambia qué se suma, por eso también entra en el ETag
+        permitir_deudas = get_permitir_deudas(None)
+        etag = etag_datos_usuario(permitir_deudas)
+        cached = no_modificado(etag)
+        if cached:
+            return cached
+
+        conn = db_pool.connect()
+        cursor = conn.cursor()
+        resumen = calcular_resumen_pendiente(cursor, current_user.id, permitir_deudas)
+        conn.close()
+
+        return con_etag(jsonify({
             'success': True,
             'data': resumen
-        })
-        
+        }), etag)
+
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)}), 500
 
@@ -1442,47 +2977,52 @@ def get_resumen_pendientes():
 @login_required
 def get_estadisticas():
     try:
-        with db_lock:
-            conn = sqlite3.connect(DB_PATH)
-            cursor = conn.cursor()
-            
-            # Total cajeros
-            cursor.execute(
-                'SELECT COUNT(*) FROM cajeros WHERE activo = 1 AND usuario_id = ?',
-                (current_user.id,)
-            )
-            total_cajeros = cursor.fetchone()[0]
-            
-            # Total cargas
-            cursor.execute(
-                'SELECT COUNT(*), COALESCE(SUM(monto), 0) FROM cargas WHERE usuario_id = ?',
-                (current_user.id,)
-            )
-            total_cargas, monto_total = cursor.fetchone()
-            
-            # Cargas hoy
-            hoy = datetime.now().strftime('%Y-%m-%d')
-            cursor.execute(
-                'SELECT COUNT(*), COALESCE(SUM(monto), 0) FROM cargas WHERE usuario_id = ? AND fecha LIKE ?',
-                (current_user.id, f'{hoy}%')
-            )
-            cargas_hoy, monto_hoy = cursor.fetchone()
-            
-            # Top cajero (de todas las cargas)
-            cursor.execute('''
-                SELECT c.nombre, SUM(cg.monto) as total
-                FROM cajeros c
-                JOIN cargas cg ON c.id = cg.cajero_id
-                WHERE c.usuario_id = ? AND cg.usuario_id = ?
-                GROUP BY c.id
-                ORDER BY total DESC
-                LIMIT 1
-            ''', (current_user.id, current_user.id))
-            top_cajero = cursor.fetchone()
-            
-            conn.close()
+        # "hoy" depende de la fecha, así que el ETag cambia al cambiar el día
+        hoy = datetime.now().strftime('%Y-%m-%d')
+        etag = etag_datos_usuario(hoy)
+        cached = no_modificado(etag)
+        if cached:
+            return cached
+
+        conn = db_pool.connect()
+        cursor = conn.cursor()
         
-        return jsonify({
+        # Total cajeros
+        cursor.execute(
+            'SELECT COUNT(*) FROM cajeros WHERE activo = 1 AND usuario_id = ?',
+            (current_user.id,)
+        )
+        total_cajeros = cursor.fetchone()[0]
+        
+        # Total cargas
+        cursor.execute(
+            'SELECT COUNT(*), COALESCE(SUM(monto), 0) FROM cargas WHERE usuario_id = ?',
+            (current_user.id,)
+        )
+        total_cargas, monto_total = cursor.fetchone()
+        
+        # Cargas hoy
+        cursor.execute(
+            'SELECT COUNT(*), COALESCE(SUM(monto), 0) FROM cargas WHERE usuario_id = ? AND fecha_ts >= ? AND fecha_ts < ?',
+            (current_user.id, *rango_dia(hoy))
+        )
+        cargas_hoy, monto_hoy = cursor.fetchone()
+        
+        # Top cajero (de todas las cargas)
+        cursor.execute('''
+            SELECT c.nombre, SUM(cg.monto) as total
+            FROM cajeros c
+            JOIN cargas cg ON c.id = cg.cajero_id
+            WHERE c.usuario_id = ? AND cg.usuario_id = ?
+            GROUP BY c.id
+            ORDER BY total DESC
+            LIMIT 1
+        ''', (current_user.id, current_user.id))
+        top_cajero = cursor.fetchone()
+        
+        conn.close()
+    
+        return con_etag(jsonify({
             'success': True,
             'data': {
                 'totales': {
@@ -1499,11 +3039,71 @@ def get_estadisticas():
                     'monto': top_cajero[1] if top_cajero else 0
                 }
             }
-        })
+        }), etag)
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)}), 500
 
 # ========== API PAGOS ==========
+# Pago parcial: se cubren cargas pendientes de la más antigua a la más nueva
+# mientras el acumulado no supere el monto. MAX del acumulado hace que el corte
+# sea un prefijo aunque haya deudas (montos negativos) en el medio.
+# Los montos llegan redondeados a centavos desde el cliente
+PAGO_TOLERANCIA = 0.005
+
+SQL_ASIGNAR_PAGO_PARCIAL = '''
+    INSERT INTO pago_cargas (pago_id, carga_id, monto)
+    WITH pendientes AS (
+        SELECT id, monto, fecha,
+               SUM(monto) OVER (ORDER BY fecha, id ROWS UNBOUNDED PRECEDING) AS acumulado
+        FROM cargas
+        WHERE usuario_id = :usuario_id AND cajero_id = :cajero_id
+          AND (pagado = 0 OR pagado IS NULL) {filtro}
+    ),
+    prefijo AS (
+        SELECT id, monto,
+               MAX(acumulado) OVER (ORDER BY fecha, id ROWS UNBOUNDED PRECEDING) AS maximo
+        FROM pendientes
+    )
+    SELECT :pago_id, id, monto FROM prefijo WHERE maximo <= :monto + :tolerancia
+'''
+
+SQL_ASIGNAR_PAGO_TOTAL = '''
+    INSERT INTO pago_cargas (pago_id, carga_id, monto)
+    SELECT :pago_id, id, monto
+    FROM cargas
+    WHERE usuario_id = :usuario_id AND cajero_id = :cajero_id
+      AND (pagado = 0 OR pagado IS NULL)
+'''
+
+def asignar_pago(cursor, pago_id, usuario_id, cajero_id, monto_pagado, total_comisiones, permitir_deudas):
+    """Registra en pago_cargas las cargas que cubre el pago y las marca pagadas.
+
+    Devuelve (cargas_afectadas, monto_asignado). Son dos sentencias sin
+    importar cuántas cargas pendientes tenga el cajero. Un pago parcial cubre
+    las cargas más viejas completas; el llamador decide qué hacer si queda resto.
+    """
+    params = {
+        'pago_id': pago_id,
+        'usuario_id': usuario_id,
+        'cajero_id': cajero_id,
+        'monto': monto_pagado,
+        'tolerancia': PAGO_TOLERANCIA
+    }
+    if monto_pagado >= total_comisiones - PAGO_TOLERANCIA:
+        # Si paga todo, se saldan todas las pendientes (deudas incluidas)
+        cursor.execute(SQL_ASIGNAR_PAGO_TOTAL, params)
+    else:
+        filtro = '' if permitir_deudas else 'AND monto > 0'
+        cursor.execute(SQL_ASIGNAR_PAGO_PARCIAL.format(filtro=filtro), params)
+
+    cursor.execute('''
+        UPDATE cargas SET pagado = 1
+        WHERE id IN (SELECT carga_id FROM pago_cargas WHERE pago_id = ?)
+    ''', (pago_id,))
+    cargas_afectadas = cursor.rowcount
+    cursor.execute('SELECT COALESCE(SUM(monto), 0) FROM pago_cargas WHERE pago_id = ?', (pago_id,))
+    return cargas_afectadas, cursor.fetchone()[0]
+
 @app.route('/api/pagos', methods=['POST'])
 @login_required
 def registrar_pago():
@@ -1523,8 +3123,8 @@ def registrar_pago():
         if not cajero_id:
             return jsonify({'success': False, 'error': 'Se requiere ID del cajero'}), 400
         
-        with db_lock:
-            conn = sqlite3.connect(DB_PATH)
+        with db_write_lock:
+            conn = db_pool.connect()
             cursor = conn.cursor()
             
             # Verificar que el cajero existe
@@ -1539,28 +3139,32 @@ def registrar_pago():
                 return jsonify({'success': False, 'error': 'Cajero no encontrado o inactivo'}), 404
             
             # Obtener configuración de deudas
-            cursor.execute("SELECT valor FROM configuraciones WHERE clave = 'permitir_deudas'")
-            permitir_deudas = cursor.fetchone()
-            permitir_deudas = bool(int(permitir_deudas[0])) if permitir_deudas else True
+            permitir_deudas = get_permitir_deudas(cursor)
             
             # Obtener el total actual de comisiones NO pagadas (incluyendo deudas si está permitido)
             if permitir_deudas:
                 cursor.execute('''
-                    SELECT COALESCE(SUM(monto), 0), COUNT(*)
-                    FROM cargas 
-                    WHERE cajero_id = ? AND usuario_id = ? AND (pagado = 0 OR pagado IS NULL)
-                ''', (cajero_id, current_user.id))
+                    SELECT COALESCE(SUM(total), 0), COALESCE(SUM(cantidad), 0)
+                    FROM saldos_pendientes
+                    WHERE usuario_id = ? AND cajero_id = ?
+                ''', (current_user.id, cajero_id))
             else:
                 cursor.execute('''
-                    SELECT COALESCE(SUM(monto), 0), COUNT(*)
-                    FROM cargas 
-                    WHERE cajero_id = ? AND usuario_id = ? AND (pagado = 0 OR pagado IS NULL) AND monto > 0
-                ''', (cajero_id, current_user.id))
+                    SELECT COALESCE(SUM(total_positivo), 0), COALESCE(SUM(cantidad_positivo), 0)
+                    FROM saldos_pendientes
+                    WHERE usuario_id = ? AND cajero_id = ?
+                ''', (current_user.id, cajero_id))
             
             total_comisiones, cantidad_cargas = cursor.fetchone()
             
             if monto_pagado is None:
                 monto_pagado = total_comisiones
+            else:
+                try:
+                    monto_pagado = float(monto_pagado)
+                except (TypeError, ValueError):
+                    conn.close()
+                    return jsonify({'success': False, 'error': 'El monto debe ser un número válido'}), 400
             
             # Registrar el pago
             cursor.execute('''
@@ -1571,32 +3175,41 @@ def registrar_pago():
             pago_id = cursor.lastrowid
             
             # Marcar cargas como pagadas (solo hasta el monto pagado)
-            if monto_pagado >= total_comisiones:
-                # Si paga todo, marcar todas como pagadas
-                cursor.execute('''
-                    UPDATE cargas 
-                    SET pagado = 1 
-                    WHERE cajero_id = ? AND usuario_id = ? AND (pagado = 0 OR pagado IS NULL)
-                ''', (cajero_id, current_user.id))
-            else:
-                # Si paga parcialmente, marcar cargas más antiguas primero
-                cursor.execute('''
-                    UPDATE cargas 
-                    SET pagado = 1 
-                    WHERE id IN (
-                        SELECT id FROM cargas 
-                        WHERE cajero_id = ? AND usuario_id = ? AND (pagado = 0 OR pagado IS NULL)
-                        ORDER BY fecha ASC
-                        LIMIT ?
-                    )
-                ''', (cajero_id, current_user.id, cantidad_cargas))
+            cantidad_cargas, monto_asignado = asignar_pago(
+                cursor, pago_id, current_user.id, cajero_id,
+                monto_pagado, total_comisiones, permitir_deudas
+            )
+
+            # Un pago parcial tiene que cerrar en el límite de una carga: el
+            # resto no tendría dónde quedar registrado
+            if monto_pagado < total_comisiones - PAGO_TOLERANCIA and \
+                    abs(monto_pagado - monto_asignado) > PAGO_TOLERANCIA:
+                conn.rollback()
+                conn.close()
+                return jsonify({
+                    'success': False,
+                    'error': (
+                        f'El monto no cubre cargas completas: puede pagar ${monto_asignado:.2f} '
+                        f'o el total de ${total_comisiones:.2f}'
+                    ),
+                    'monto_asignable': round(monto_asignado, 2),
+                    'total_comisiones': round(total_comisiones, 2)
+                }), 400
             
             # Registrar carga especial en el historial para el pago
             fecha_pago = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
             cursor.execute('''
-                INSERT INTO cargas (usuario_id, cajero_id, plataforma, monto, fecha, nota, pagado, es_deuda)
-                VALUES (?, ?, ?, ?, ?, ?, 1, 0)
-            ''', (current_user.id, cajero_id, 'PAGO', -monto_pagado, fecha_pago, f'Pago registrado - {notas}' if notas else 'Pago registrado'))
+                INSERT INTO cargas (usuario_id, cajero_id, plataforma, monto, fecha, fecha_ts, nota, pagado, es_deuda)
+                VALUES (?, ?, ?, ?, ?, ?, ?, 1, 0)
+            ''', (current_user.id, cajero_id, 'PAGO', -monto_pagado, fecha_pago, fecha_a_ts(fecha_pago), f'Pago registrado - {notas}' if notas else 'Pago registrado'))
+
+            registrar_evento(cursor, current_user.id, 'pago_registrado', {
+                'id': pago_id,
+                'cajero_id': cajero_id,
+                'cajero_nombre': cajero[0],
+                'monto_pagado': monto_pagado,
+                'total_comisiones': total_comisiones
+            })
             
             conn.commit()
             
@@ -1610,6 +3223,7 @@ def registrar_pago():
             
             pago = cursor.fetchone()
             conn.close()
+        event_broker.notificar()
         
         return jsonify({
             'success': True,
@@ -1622,7 +3236,8 @@ def registrar_pago():
                 'fecha_pago': pago[5],
                 'notas': pago[6],
                 'diferencia': pago[3] - pago[4],
-                'cargas_afectadas': cantidad_cargas
+                'cargas_afectadas': cantidad_cargas,
+                'monto_asignado': monto_asignado
             },
             'message': f'Pago registrado exitosamente para {cajero[0]}'
         })
@@ -1630,7 +3245,316 @@ def registrar_pago():
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)}), 500
 
+@app.route('/api/pagos/lote', methods=['POST'])
+@login_required
+def registrar_pagos_lote():
+    """Salda por completo varios cajeros (o todos) en una sola transacción.
+
+    Solo se paga a los cajeros con saldo pendiente positivo. Si las cargas
+    pendientes de un cajero suman cero o menos (descuentos, ajustes
+    negativos), no se registra un pago de monto cero o negativo: sus cargas
+    quedan pendientes y el cajero se informa en saldo_no_positivo.
+    """
+    try:
+        data = request.json_data or request.get_json(silent=True) or {}
+        cajero_ids = data.get('cajero_ids')
+        notas = (data.get('notas') or '').strip()
+
+        if cajero_ids is not None:
+            if not isinstance(cajero_ids, list) or not cajero_ids:
+                return jsonify({'success': False, 'error': 'cajero_ids debe ser una lista no vacía'}), 400
+            try:
+                cajero_ids = sorted({int(cajero_id) for cajero_id in cajero_ids})
+            except (TypeError, ValueError):
+                return jsonify({'success': False, 'error': 'cajero_ids inválidos'}), 400
+
+        fecha_pago = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+        nota_pago = f'Pago registrado - {notas}' if notas else 'Pago registrado'
+
+        with db_write_lock:
+            conn = db_pool.connect()
+            cursor = conn.cursor()
+
+            permitir_deudas = get_permitir_deudas(cursor)
+            if permitir_deudas:
+                columnas = 'COALESCE(SUM(s.total), 0), COALESCE(SUM(s.cantidad), 0)'
+            else:
+                columnas = 'COALESCE(SUM(s.total_positivo), 0), COALESCE(SUM(s.cantidad_positivo), 0)'
+
+            # Total pendiente de todos los cajeros pedidos en una consulta agrupada
+            query = f'''
+                SELECT c.id, c.nombre, {columnas}
+                FROM cajeros c
+                LEFT JOIN saldos_pendientes s ON s.usuario_id = c.usuario_id AND s.cajero_id = c.id
+                WHERE c.activo = 1 AND c.usuario_id = ?
+            '''
+            params = [current_user.id]
+            if cajero_ids is not None:
+                query += f" AND c.id IN ({','.join('?' * len(cajero_ids))})"
+                params.extend(cajero_ids)
+            query += ' GROUP BY c.id ORDER BY c.nombre, c.id'
+            cursor.execute(query, params)
+            saldos = cursor.fetchall()
+
+            encontrados = {row[0] for row in saldos}
+            no_encontrados = [cajero_id for cajero_id in (cajero_ids or []) if cajero_id not in encontrados]
+            # Se decide por el total, no por la cantidad: un saldo neto <= 0 no se paga
+            a_pagar = [row for row in saldos if round(row[2], 2) > 0]
+            sin_pendientes = [{'cajero_id': row[0], 'cajero_nombre': row[1]} for row in saldos if row[3] == 0]
+            saldo_no_positivo = [{
+                'cajero_id': row[0],
+                'cajero_nombre': row[1],
+                'total_pendiente': round(row[2], 2),
+                'cargas_pendientes': row[3]
+            } for row in saldos if row[3] > 0 and round(row[2], 2) <= 0]
+
+            pagos = []
+            if a_pagar:
+                cursor.executemany('''
+                    INSERT INTO pagos (usuario_id, cajero_id, monto_pagado, total_comisiones, notas)
+                    VALUES (?, ?, ?, ?, ?)
+                ''', [(current_user.id, cajero_id, total, total, notas) for cajero_id, _, total, _ in a_pagar])
+                # pagos.id es AUTOINCREMENT y la transacción tiene el lock de escritura
+                cursor.execute('SELECT last_insert_rowid()')
+                ultimo_pago = cursor.fetchone()[0]
+                primer_pago = ultimo_pago - len(a_pagar) + 1
+
+                # Pago total: cada pago cubre todas las pendientes de su cajero
+                cursor.execute('''
+                    INSERT INTO pago_cargas (pago_id, carga_id, monto)
+                    SELECT p.id, cg.id, cg.monto
+                    FROM pagos p
+                    JOIN cargas cg ON cg.usuario_id = p.usuario_id AND cg.cajero_id = p.cajero_id
+                    WHERE p.id BETWEEN ? AND ? AND (cg.pagado = 0 OR cg.pagado IS NULL)
+                ''', (primer_pago, ultimo_pago))
+                cursor.execute('''
+                    UPDATE cargas SET pagado = 1
+                    WHERE id IN (SELECT carga_id FROM pago_cargas WHERE pago_id BETWEEN ? AND ?)
+                ''', (primer_pago, ultimo_pago))
+                cargas_afectadas = cursor.rowcount
+
+                cursor.executemany('''
+                    INSERT INTO cargas (usuario_id, cajero_id, plataforma, monto, fecha, fecha_ts, nota, pagado, es_deuda)
+                    VALUES (?, ?, ?, ?, ?, ?, ?, 1, 0)
+                ''', [(current_user.id, cajero_id, 'PAGO', -total, fecha_pago, fecha_a_ts(fecha_pago), nota_pago)
+                      for cajero_id, _, total, _ in a_pagar])
+
+                cursor.execute('''
+                    SELECT p.id, p.cajero_id, p.monto_pagado, p.total_comisiones, p.fecha_pago,
+                           COUNT(pc.carga_id)
+                    FROM pagos p
+                    LEFT JOIN pago_cargas pc ON pc.pago_id = p.id
+                    WHERE p.id BETWEEN ? AND ? AND p.usuario_id = ?
+                    GROUP BY p.id
+                    ORDER BY p.id
+                ''', (primer_pago, ultimo_pago, current_user.id))
+                nombres = {row[0]: row[1] for row in a_pagar}
+                pagos = [{
+                    'id': row[0],
+                    'cajero_id': row[1],
+                    'cajero_nombre': nombres.get(row[1]),
+                    'monto_pagado': row[2],
+                    'total_comisiones': row[3],
+                    'fecha_pago': row[4],
+                    'cargas_afectadas': row[5]
+                } for row in cursor.fetchall()]
+
+                registrar_evento(cursor, current_user.id, 'pagos_registrados', {
+                    'pagos': len(pagos),
+                    'monto_total': sum(pago['monto_pagado'] for pago in pagos)
+                })
+                conn.commit()
+            else:
+                cargas_afectadas = 0
+            conn.close()
+
+        if pagos:
+            event_broker.notificar()
+
+        return jsonify({
+            'success': True,
+            'data': {
+                'pagos': pagos,
+                'cajeros_pagados': len(pagos),
+                'monto_total': sum(pago['monto_pagado'] for pago in pagos),
+                'cargas_afectadas': cargas_afectadas,
+                'sin_pendientes': sin_pendientes,
+                'saldo_no_positivo': saldo_no_positivo,
+                'no_encontrados': no_encontrados,
+                'fecha_pago': fecha_pago,
+                'notas': notas
+            },
+            'message': f'{len(pagos)} pagos registrados'
+        })
+
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+# ========== CACHE DE EXPORTACIONES ==========
+class ExportCache:
+    """Cache en disco de exportaciones (CSV/PDF) con desalojo LRU por tamaño.
+
+    El nombre de cada archivo incluye usuario, versión de datos y un hash de los
+    filtros, así una exportación cacheada nunca se sirve si las cargas del
+    usuario cambiaron. Al guardar se borran las versiones viejas del usuario.
+    """
+
+    NOMBRE_RE = re.compile(r'^export_(\d+)_v(\d+)_[0-9a-f]{32}\.(csv|pdf)$')
+
+    def __init__(self, directorio, max_bytes):
+        self.directorio = directorio
+        self.max_bytes = max_bytes
+        self._lock = Lock()
+        self._stats = {'hits': 0, 'misses': 0, 'stores': 0, 'evictions': 0, 'invalidations': 0}
+
+    def nombre(self, usuario_id, version, formato, **filtros):
+        digest = hashlib.sha256(
+            json.dumps([usuario_id, formato, filtros], sort_keys=True).encode('utf-8')
+        ).hexdigest()[:32]
+        return f'export_{usuario_id}_v{version}_{digest}.{formato}'
+
+    def ruta(self, nombre):
+        return os.path.join(self.directorio, nombre)
+
+    def _count(self, key, amount=1):
+        with self._lock:
+            self._stats[key] += amount
+
+    def get(self, nombre):
+        path = self.ruta(nombre)
+        try:
+            # Marca de uso para el LRU
+            os.utime(path)
+        except OSError:
+            self._count('misses')
+            return None
+        self._count('hits')
+        return path
+
+    def put(self, nombre, tmp_path):
+        ensure_dirs()
+        path = self.ruta(nombre)
+        os.replace(tmp_path, path)
+        self._count('stores')
+        match = self.NOMBRE_RE.match(nombre)
+        if match:
+            self._invalidar_versiones_viejas(match.group(1), int(match.group(2)))
+        self._desalojar()
+        return path
+
+    def _entradas(self):
+        entradas = []
+        for name in os.listdir(self.directorio):
+            match = self.NOMBRE_RE.match(name)
+            if not match:
+                continue
+            try:
+                stat = os.stat(os.path.join(self.directorio, name))
+            except OSError:
+                continue
+            entradas.append((stat.st_mtime, stat.st_size, name, match))
+        return entradas
+
+    def _borrar(self, name, key):
+        try:
+            os.remove(os.path.join(self.directorio, name))
+            self._count(key)
+        except OSError:
+            pass
+
+    def _invalidar_versiones_viejas(self, usuario_id, version):
+        for _, _, name, match in self._entradas():
+            if match.group(1) == usuario_id and int(match.group(2)) < version:
+                self._borrar(name, 'invalidations')
+
+    def purgar(self):
+        # Tras restaurar un backup ningún archivo corresponde a los datos actuales.
+        # Solo toca archivos export_*: los .tmp de exportaciones en curso quedan
+        if not os.path.isdir(self.directorio):
+            return 0
+        entradas = self._entradas()
+        for _, _, name, _ in entradas:
+            self._borrar(name, 'invalidations')
+        return len(entradas)
+
+    def _desalojar(self):
+        entradas = sorted(self._entradas())
+        total = sum(size for _, size, _, _ in entradas)
+        for _, size, name, _ in entradas:
+            if total <= self.max_bytes:
+                break
+            self._borrar(name, 'evictions')
+            total -= size
+
+    def stats(self):
+        with self._lock:
+            data = dict(self._stats)
+        entradas = self._entradas() if os.path.isdir(self.directorio) else []
+        data['archivos'] = len(entradas)
+        data['bytes'] = sum(size for _, size, _, _ in entradas)
+        data['max_bytes'] = self.max_bytes
+        return data
+
+EXPORT_CACHE_MAX_BYTES = int(os.environ.get('EXPORT_CACHE_MAX_MB', 200)) * 1024 * 1024
+export_cache = ExportCache(CACHE_DIR, EXPORT_CACHE_MAX_BYTES)
+
 # ========== API EXPORTACIÓN ==========
+EXPORT_CHUNK_SIZE = 1000
+EXPORT_HEADERS = ['Cajero', 'Plataforma', 'Monto', 'Fecha', 'Nota', 'Estado', 'Tipo']
+
+def iterar_cargas_exportacion(usuario_id, fecha_inicio=None, fecha_fin=None, chunk_size=EXPORT_CHUNK_SIZE):
+    """Recorre las cargas a exportar en bloques por cursor (fecha_ts, id).
+
+    Cada bloque usa una conexión del pool y la devuelve antes de entregar las
+    filas, así una descarga lenta no retiene conexiones ni transacciones.
+    """
+    query = '''
+        SELECT c.nombre, cg.plataforma, cg.monto, cg.fecha, cg.nota,
+               CASE 
+                   WHEN cg.pagado = 1 THEN 'PAGADO'
+                   WHEN cg.es_deuda = 1 THEN 'DEUDA'
+                   ELSE 'PENDIENTE'
+               END as estado,
+               CASE 
+                   WHEN cg.es_deuda = 1 THEN 'DEUDA'
+                   ELSE 'CARGA'
+               END as tipo,
+               cg.id, cg.fecha_ts
+        FROM cargas cg
+        JOIN cajeros c ON cg.cajero_id = c.id
+        WHERE cg.usuario_id = ? AND c.usuario_id = ?
+    '''
+    params = [usuario_id, usuario_id]
+    rango = rango_fechas(fecha_inicio, fecha_fin) if fecha_inicio and fecha_fin else None
+    if rango:
+        query += ' AND cg.fecha_ts >= ? AND cg.fecha_ts < ?'
+        params.extend(rango)
+
+    posicion = None
+    while True:
+        query_bloque = query
+        params_bloque = list(params)
+        if posicion:
+            query_bloque += ' AND (cg.fecha_ts, cg.id) < (?, ?)'
+            params_bloque.extend(posicion)
+        query_bloque += ' ORDER BY cg.fecha_ts DESC, cg.id DESC LIMIT ?'
+        params_bloque.append(chunk_size)
+
+        conn = db_pool.connect()
+        try:
+            cursor = conn.cursor()
+            cursor.execute(query_bloque, params_bloque)
+            filas = cursor.fetchall()
+        finally:
+            conn.close()
+
+        if not filas:
+            return
+        posicion = (filas[-1][8], filas[-1][7])
+        yield [fila[:7] for fila in filas]
+        if len(filas) < chunk_size:
+            return
+
 @app.route('/api/exportar/excel', methods=['GET'])
 @login_required
 def exportar_excel():
@@ -1638,359 +3562,732 @@ def exportar_excel():
         # Obtener parámetros
         fecha_inicio = request.args.get('fecha_inicio')
         fecha_fin = request.args.get('fecha_fin')
-        
-        with db_lock:
-            conn = sqlite3.connect(DB_PATH)
-            cursor = conn.cursor()
-            
-            # Construir query según tipo de reporte
-            query_cargas = '''
-                SELECT c.nombre, cg.plataforma, cg.monto, cg.fecha, cg.nota,
-                       CASE 
-                           WHEN cg.pagado = 1 THEN 'PAGADO'
-                           WHEN cg.es_deuda = 1 THEN 'DEUDA'
-                           ELSE 'PENDIENTE'
-                       END as estado,
-                       CASE 
-                           WHEN cg.es_deuda = 1 THEN 'DEUDA'
-                           ELSE 'CARGA'
-                       END as tipo
-                FROM cargas cg
-                JOIN cajeros c ON cg.cajero_id = c.id
-                WHERE cg.usuario_id = ? AND c.usuario_id = ?
-            '''
-            
-            params = [current_user.id, current_user.id]
-            if fecha_inicio and fecha_fin:
-                query_cargas += ' AND cg.fecha BETWEEN ? AND ?'
-                params.extend([fecha_inicio, fecha_fin])
-            
-            query_cargas += ' ORDER BY cg.fecha DESC'
-            
-            cursor.execute(query_cargas, params)
-            cargas_data = cursor.fetchall()
-            
-            # Crear CSV en memoria
+        if fecha_inicio and fecha_fin and rango_fechas(fecha_inicio, fecha_fin) is None:
+            return jsonify({'success': False, 'error': 'Fechas inválidas'}), 400
+        usuario_id = current_user.id
+        filename = f'reporte_comisiones_{datetime.now().strftime("%Y%m%d_%H%M%S")}.csv'
+
+        nombre_cache = export_cache.nombre(
+            usuario_id, version_datos_usuario(usuario_id), 'csv',
+            fecha_inicio=fecha_inicio, fecha_fin=fecha_fin
+        )
+        cache_path = export_cache.get(nombre_cache)
+        if cache_path:
+            return send_file(cache_path, mimetype='text/csv', as_attachment=True, download_name=filename)
+
+        def generar_csv():
+            # Un solo buffer que se vacía después de cada bloque: memoria constante.
+            # Lo enviado se copia a un temporal que pasa a la cache al terminar.
+            ensure_dirs()
+            tmp_path = export_cache.ruta(f'{nombre_cache}.{secrets.token_hex(4)}.tmp')
+            completo = False
             output = io.StringIO()
             writer = csv.writer(output)
-            
-            # Escribir encabezados
-            writer.writerow(['Cajero', 'Plataforma', 'Monto', 'Fecha', 'Nota', 'Estado', 'Tipo'])
-            
-            # Escribir datos
-            for row in cargas_data:
-                writer.writerow(row)
-            
-            # Preparar respuesta
-            output.seek(0)
-            
-            conn.close()
-        
-        # Crear PDF
-        buffer = io.BytesIO()
-        
-        # Configurar documento
-        doc = SimpleDocTemplate(
-            buffer,
-            pagesize=landscape(letter),
-            rightMargin=72,
-            leftMargin=72,
-            topMargin=72,
-            bottomMargin=72
-        )
-        
-        # Estilos
-        styles = getSampleStyleSheet()
-        title_style = ParagraphStyle(
-            'CustomTitle',
-            parent=styles['Heading1'],
-            fontSize=16,
-            spaceAfter=30,
-            alignment=1  # Centered
+            writer.writerow(EXPORT_HEADERS)
+            try:
+                with open(tmp_path, 'w', encoding='utf-8', newline='') as tmp_file:
+                    for bloque in iterar_cargas_exportacion(usuario_id, fecha_inicio, fecha_fin):
+                        writer.writerows(bloque)
+                        chunk = output.getvalue()
+                        tmp_file.write(chunk)
+                        yield chunk
+                        output.seek(0)
+                        output.truncate(0)
+                    if output.tell():
+                        chunk = output.getvalue()
+                        tmp_file.write(chunk)
+                        yield chunk
+                completo = True
+                export_cache.put(nombre_cache, tmp_path)
+            finally:
+                if not completo:
+                    try:
+                        os.remove(tmp_path)
+                    except OSError:
+                        pass
+
+        return app.response_class(
+            generar_csv(),
+            mimetype='text/csv',
+            headers={'Content-Disposition': f'attachment; filename={filename}'}
         )
         
-        # Contenido
-        elements = []
-        
-        # Título
-        title_text = f"Reporte Paybook - {tipo_reporte.capitalize()}"
-        if fecha_inicio and fecha_fin:
-            fecha_inicio_formatted = fecha_inicio.split('T')[0] if 'T' in fecha_inicio else fecha_inicio
-            fecha_fin_formatted = fecha_fin.split('T')[0] if 'T' in fecha_fin else fecha_fin
-            title_text += f"\nDel {fecha_inicio_formatted} al {fecha_fin_formatted}"
-        else:
-            title_text += f"\n{datetime.now().strftime('%Y-%m-%d %H:%M:%S')}"
-        
-        elements.append(Paragraph(title_text, title_style))
-        elements.append(Spacer(1, 20))
-        
-        # Totales - FORMATO CORRECTO
-        totales_data = [
-            ['Total Cargas:', str(total_cargas)],
-            ['Monto Total:', f"${abs(total_monto):.2f}" + (" (-)" if total_monto < 0 else "")],
-            ['Generado:', datetime.now().strftime('%Y-%m-%d %H:%M:%S')]
-        ]
-        
-        totales_table = Table(totales_data, colWidths=[200, 200])
-        totales_table.setStyle(TableStyle([
-            ('BACKGROUND', (0, 0), (-1, -1), colors.HexColor('#2c3e50')),
-            ('TEXTCOLOR', (0, 0), (-1, -1), colors.white),
-            ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
-            ('FONTNAME', (0, 0), (-1, -1), 'Helvetica-Bold'),
-            ('FONTSIZE', (0, 0), (-1, -1), 10),
-            ('BOTTOMPADDING', (0, 0), (-1, -1), 12),
-            ('TOPPADDING', (0, 0), (-1, -1), 12),
-        ]))
-        elements.append(totales_table)
-        elements.append(Spacer(1, 20))
-        
-        # Tabla de datos
-        if cargas_data:
-            # Encabezados
-            headers = ['Cajero', 'Plataforma', 'Monto', 'Fecha', 'Estado', 'Tipo']
-            data = [headers]
-            
-            # Crear respuesta
-            filename = f'reporte_comisiones_{datetime.now().strftime("%Y%m%d_%H%M%S")}.csv'
-            
-            response = app.response_class(
-                output.getvalue(),
-                mimetype='text/csv',
-                headers={'Content-Disposition': f'attachment; filename={filename}'}
-            )
-            
-            return response
-        
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)}), 500
 
-@app.route('/api/exportar/pdf', methods=['GET'])
+# ========== RENDER DE PDF ==========
+# La tabla de cargas se emite en bloques de PDF_FILAS_POR_TABLA filas, cada uno
+# como una Table chica con encabezado repetido. ReportLab maqueta cada bloque
+# por separado (en vez de partir una tabla gigante página por página) y los
+# bloques se generan a medida que el documento los consume.
+PDF_FILAS_POR_TABLA = 40
+PDF_HEADERS = ['Cajero', 'Plataforma', 'Monto', 'Fecha', 'Estado', 'Tipo']
+PDF_COL_WIDTHS = [120, 80, 80, 80, 80, 80]
+PDF_STYLES = getSampleStyleSheet()
+PDF_TITLE_STYLE = ParagraphStyle(
+    'CustomTitle',
+    parent=PDF_STYLES['Heading1'],
+    fontSize=16,
+    spaceAfter=30,
+    alignment=1  # Centered
+)
+PDF_TOTALES_STYLE = TableStyle([
+    ('BACKGROUND', (0, 0), (-1, -1), colors.HexColor('#2c3e50')),
+    ('TEXTCOLOR', (0, 0), (-1, -1), colors.white),
+    ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
+    ('FONTNAME', (0, 0), (-1, -1), 'Helvetica-Bold'),
+    ('FONTSIZE', (0, 0), (-1, -1), 10),
+    ('BOTTOMPADDING', (0, 0), (-1, -1), 12),
+    ('TOPPADDING', (0, 0), (-1, -1), 12),
+])
+PDF_CARGAS_STYLE = TableStyle([
+    ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#34495e')),
+    ('TEXTCOLOR', (0, 0), (-1, 0), colors.white),
+    ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
+    ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+    ('FONTSIZE', (0, 0), (-1, 0), 10),
+    ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
+    ('BACKGROUND', (0, 1), (-1, -1), colors.HexColor('#ecf0f1')),
+    ('TEXTCOLOR', (0, 1), (-1, -1), colors.black),
+    ('FONTNAME', (0, 1), (-1, -1), 'Helvetica'),
+    ('FONTSIZE', (0, 1), (-1, -1), 8),
+    ('GRID', (0, 0), (-1, -1), 1, colors.grey),
+])
+
+class FlowablesEnStreaming(list):
+    """Lista de flowables que se rellena desde un iterador a medida que
+    doc.build() consume el frente, para no tener el documento entero en memoria."""
+
+    def __init__(self, iterable, reserva=8):
+        super().__init__()
+        self._iterador = iter(iterable)
+        self._reserva = reserva
+        self._rellenar()
+
+    def _rellenar(self):
+        while self._iterador is not None and super().__len__() < self._reserva:
+            try:
+                self.append(next(self._iterador))
+            except StopIteration:
+                self._iterador = None
+
+    def __len__(self):
+        self._rellenar()
+        return super().__len__()
+
+    def __getitem__(self, index):
+        self._rellenar()
+        return super().__getitem__(index)
+
+def totales_exportacion(usuario_id, fecha_inicio=None, fecha_fin=None):
+    query = '''
+        SELECT COUNT(*), COALESCE(SUM(cg.monto), 0)
+        FROM cargas cg
+        JOIN cajeros c ON cg.cajero_id = c.id
+        WHERE cg.usuario_id = ? AND c.usuario_id = ?
+    '''
+    params = [usuario_id, usuario_id]
+    rango = rango_fechas(fecha_inicio, fecha_fin) if fecha_inicio and fecha_fin else None
+    if rango:
+        query += ' AND cg.fecha_ts >= ? AND cg.fecha_ts < ?'
+        params.extend(rango)
+    conn = db_pool.connect()
+    try:
+        cursor = conn.cursor()
+        cursor.execute(query, params)
+        return cursor.fetchone()
+    finally:
+        conn.close()
+
+def fila_pdf_carga(row):
+    monto = float(row[2])
+    fecha = row[3] or ''
+    return [
+        row[0],  # Cajero
+        row[1],  # Plataforma
+        f"${abs(monto):.2f}" + (" (-)" if monto < 0 else ""),  # Monto
+        fecha.split(' ')[0],  # Fecha
+        row[5],  # Estado
+        row[6]   # Tipo
+    ]
+
+def flowables_reporte_pdf(usuario_id, fecha_inicio, fecha_fin, tipo_reporte):
+    total_cargas, total_monto = totales_exportacion(usuario_id, fecha_inicio, fecha_fin)
+
+    # Título
+    title_text = f"Reporte Paybook - {tipo_reporte.capitalize()}"
+    if fecha_inicio and fecha_fin:
+        fecha_inicio_formatted = fecha_inicio.split('T')[0] if 'T' in fecha_inicio else fecha_inicio
+        fecha_fin_formatted = fecha_fin.split('T')[0] if 'T' in fecha_fin else fecha_fin
+        title_text += f"\nDel {fecha_inicio_formatted} al {fecha_fin_formatted}"
+    else:
+        title_text += f"\n{datetime.now().strftime('%Y-%m-%d %H:%M:%S')}"
+    
+    yield Paragraph(title_text, PDF_TITLE_STYLE)
+    yield Spacer(1, 20)
+    
+    # Totales
+    totales_data = [
+        ['Total Cargas:', str(total_cargas)],
+        ['Monto Total:', f"${total_monto:.2f}"],
+        ['Generado:', datetime.now().strftime('%Y-%m-%d %H:%M:%S')]
+    ]
+    yield Table(totales_data, colWidths=[200, 200], style=PDF_TOTALES_STYLE)
+    yield Spacer(1, 20)
+    
+    # Tabla de datos, en bloques con el encabezado repetido
+    hay_datos = False
+    for bloque in iterar_cargas_exportacion(usuario_id, fecha_inicio, fecha_fin):
+        hay_datos = True
+        for inicio in range(0, len(bloque), PDF_FILAS_POR_TABLA):
+            data = [PDF_HEADERS]
+            data.extend(fila_pdf_carga(row) for row in bloque[inicio:inicio + PDF_FILAS_POR_TABLA])
+            yield Table(data, colWidths=PDF_COL_WIDTHS, repeatRows=1, style=PDF_CARGAS_STYLE)
+    if not hay_datos:
+        yield Paragraph("No hay datos para mostrar", PDF_STYLES['Normal'])
+    
+    # Pie de página
+    yield Spacer(1, 30)
+    yield Paragraph("© Paybook - Sistema de Gestión de Comisiones", PDF_STYLES['Normal'])
+
+def generar_pdf_reporte(usuario_id, fecha_inicio, fecha_fin, tipo_reporte, destino):
+    """Genera el PDF del reporte de cargas y lo escribe en el archivo `destino`."""
+    doc = SimpleDocTemplate(
+        destino,
+        pagesize=landscape(letter),
+        rightMargin=72,
+        leftMargin=72,
+        topMargin=72,
+        bottomMargin=72
+    )
+    doc.build(FlowablesEnStreaming(flowables_reporte_pdf(usuario_id, fecha_inicio, fecha_fin, tipo_reporte)))
+
+# ========== TRABAJOS DE EXPORTACIÓN PDF ==========
+# Los PDF se generan en un pool de hilos acotado (EXPORT_PDF_WORKERS) fuera del
+# hilo del request. El estado de cada trabajo se guarda como JSON en JOBS_DIR,
+# así cualquier worker de gunicorn puede responder su estado.
+EXPORT_PDF_WORKERS = int(os.environ.get('EXPORT_PDF_WORKERS', 2))
+EXPORT_JOB_TTL = int(os.environ.get('EXPORT_JOB_TTL', 3600))
+pdf_executor = ThreadPoolExecutor(max_workers=EXPORT_PDF_WORKERS, thread_name_prefix='pdf')
+PDF_JOB_ID_RE = re.compile(r'^[A-Za-z0-9_-]{16,64}$')
+
+def pdf_job_path(job_id):
+    return os.path.join(JOBS_DIR, f'pdf_{job_id}.json')
+
+def guardar_pdf_job(job):
+    ensure_dirs()
+    meta_path = pdf_job_path(job['id'])
+    tmp_path = f'{meta_path}.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as job_file:
+        json.dump(job, job_file, ensure_ascii=False)
+    os.replace(tmp_path, meta_path)
+
+def cargar_pdf_job(job_id):
+    if not PDF_JOB_ID_RE.match(job_id or ''):
+        return None
+    meta_path = pdf_job_path(job_id)
+    try:
+        with open(meta_path, 'r', encoding='utf-8') as job_file:
+            return json.load(job_file)
+    except (OSError, json.JSONDecodeError):
+        return None
+
+def serializar_pdf_job(job):
+    return {
+        'id': job['id'],
+        'estado': job['estado'],
+        'tipo_reporte': job['tipo_reporte'],
+        'creado': job['creado'],
+        'finalizado': job.get('finalizado'),
+        'error': job.get('error'),
+        'status_url': f"/api/exportar/pdf/{job['id']}",
+        'download_url': f"/api/exportar/pdf/{job['id']}/descargar" if job['estado'] == 'listo' else None
+    }
+
+def job_interrumpido(meta_path, job, limite):
+    """True si el trabajo sigue sin terminar pero su estado no cambia hace más de EXPORT_JOB_TTL.
+
+    Pasa cuando un reinicio corta el hilo que lo procesaba: nadie lo va a
+    terminar, así que se cierra como error para que el cliente deje de esperar.
+    """
+    if job['estado'] in ('listo', 'error'):
+        return False
+    try:
+        return os.path.getmtime(meta_path) < limite
+    except OSError:
+        return False
+
+def cerrar_job_interrumpido(job, guardar, temporal):
+    job['estado'] = 'error'
+    job['error'] = 'El trabajo se interrumpió; vuelva a intentarlo'
+    job['finalizado'] = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+    guardar(job)
+    try:
+        os.remove(temporal)
+    except OSError:
+        pass
+
+def limpiar_pdf_jobs_vencidos():
+    ensure_dirs()
+    limite = time.time() - EXPORT_JOB_TTL
+    for name in os.listdir(JOBS_DIR):
+        if not (name.startswith('pdf_') and name.endswith('.json')):
+            continue
+        job = cargar_pdf_job(name[len('pdf_'):-len('.json')])
+        if not job:
+            continue
+        if job_interrumpido(pdf_job_path(job['id']), job, limite):
+            cerrar_job_interrumpido(job, guardar_pdf_job, os.path.join(JOBS_DIR, f"pdf_{job['id']}.pdf.tmp"))
+        # El PDF queda en la cache de exportaciones, que tiene su propio desalojo
+        elif job.get('creado_ts', 0) < limite and job['estado'] in ('listo', 'error'):
+            try:
+                os.remove(pdf_job_path(job['id']))
+            except OSError:
+                pass
+
+def ejecutar_pdf_job(job):
+    tmp_path = os.path.join(JOBS_DIR, f"pdf_{job['id']}.pdf.tmp")
+    job['estado'] = 'procesando'
+    guardar_pdf_job(job)
+    try:
+        generar_pdf_reporte(job['usuario_id'], job['fecha_inicio'], job['fecha_fin'], job['tipo_reporte'], tmp_path)
+        export_cache.put(job['archivo'], tmp_path)
+        job['estado'] = 'listo'
+    except Exception as e:
+        traceback.print_exc()
+        job['estado'] = 'error'
+        job['error'] = str(e)
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+    job['finalizado'] = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+    guardar_pdf_job(job)
+
+@app.route('/api/exportar/pdf', methods=['POST'])
 @login_required
 def exportar_pdf():
+    """Encola la generación del PDF y devuelve el trabajo para consultar su estado."""
     try:
         # Obtener parámetros
-        fecha_inicio = request.args.get('fecha_inicio')
-        fecha_fin = request.args.get('fecha_fin')
-        tipo_reporte = request.args.get('tipo_reporte', 'general')
-        
-        with db_lock:
-            conn = sqlite3.connect(DB_PATH)
-            cursor = conn.cursor()
-            
-            # Construir query según tipo de reporte
-            query_cargas = '''
-                SELECT c.nombre, cg.plataforma, cg.monto, cg.fecha, cg.nota,
-                       CASE 
-                           WHEN cg.pagado = 1 THEN 'PAGADO'
-                           WHEN cg.es_deuda = 1 THEN 'DEUDA'
-                           ELSE 'PENDIENTE'
-                       END as estado,
-                       CASE 
-                           WHEN cg.es_deuda = 1 THEN 'DEUDA'
-                           ELSE 'CARGA'
-                       END as tipo
-                FROM cargas cg
-                JOIN cajeros c ON cg.cajero_id = c.id
-                WHERE cg.usuario_id = ? AND c.usuario_id = ?
-            '''
-            
-            params = [current_user.id, current_user.id]
-            if fecha_inicio and fecha_fin:
-                query_cargas += ' AND cg.fecha BETWEEN ? AND ?'
-                params.extend([fecha_inicio, fecha_fin])
-            
-            query_cargas += ' ORDER BY cg.fecha DESC'
-            
-            cursor.execute(query_cargas, params)
-            cargas_data = cursor.fetchall()
-            
-            # Calcular totales CORRECTAMENTE
-            total_cargas = len(cargas_data)
-            total_monto = sum(row[2] for row in cargas_data)
-            
-            conn.close()
-        
-        # Crear PDF
-        buffer = io.BytesIO()
-        
-        # Configurar documento
-        doc = SimpleDocTemplate(
-            buffer,
-            pagesize=landscape(letter),
-            rightMargin=72,
-            leftMargin=72,
-            topMargin=72,
-            bottomMargin=72
-        )
-        
-        # Estilos
-        styles = getSampleStyleSheet()
-        title_style = ParagraphStyle(
-            'CustomTitle',
-            parent=styles['Heading1'],
-            fontSize=16,
-            spaceAfter=30,
-            alignment=1  # Centered
-        )
-        
-        # Contenido
-        elements = []
-        
-        # Título
-        title_text = f"Reporte Paybook - {tipo_reporte.capitalize()}"
-        if fecha_inicio and fecha_fin:
-            fecha_inicio_formatted = fecha_inicio.split('T')[0] if 'T' in fecha_inicio else fecha_inicio
-            fecha_fin_formatted = fecha_fin.split('T')[0] if 'T' in fecha_fin else fecha_fin
-            title_text += f"\nDel {fecha_inicio_formatted} al {fecha_fin_formatted}"
-        else:
-            title_text += f"\n{datetime.now().strftime('%Y-%m-%d %H:%M:%S')}"
-        
-        elements.append(Paragraph(title_text, title_style))
-        elements.append(Spacer(1, 20))
-        
-        # Totales
-        totales_data = [
-            ['Total Cargas:', str(total_cargas)],
-            ['Monto Total:', f"${total_monto:.2f}"],
-            ['Generado:', datetime.now().strftime('%Y-%m-%d %H:%M:%S')]
-        ]
-        
-        totales_table = Table(totales_data, colWidths=[200, 200])
-        totales_table.setStyle(TableStyle([
-            ('BACKGROUND', (0, 0), (-1, -1), colors.HexColor('#2c3e50')),
-            ('TEXTCOLOR', (0, 0), (-1, -1), colors.white),
-            ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
-            ('FONTNAME', (0, 0), (-1, -1), 'Helvetica-Bold'),
-            ('FONTSIZE', (0, 0), (-1, -1), 10),
-            ('BOTTOMPADDING', (0, 0), (-1, -1), 12),
-            ('TOPPADDING', (0, 0), (-1, -1), 12),
-        ]))
-        elements.append(totales_table)
-        elements.append(Spacer(1, 20))
-        
-        # Tabla de datos
-        if cargas_data:
-            # Encabezados
-            headers = ['Cajero', 'Plataforma', 'Monto', 'Fecha', 'Estado', 'Tipo']
-            data = [headers]
-            
-            for row in cargas_data:
-                monto = float(row[2])
-                fecha = row[3]
-                fecha_formatted = fecha.split(' ')[0] if ' ' in fecha else fecha
-                
-                data.append([
-                    row[0],  # Cajero
-                    row[1],  # Plataforma
-                    f"${abs(monto):.2f}" + (" (-)" if monto < 0 else ""),  # Monto
-                    fecha_formatted,  # Fecha
-                    row[5],  # Estado
-                    row[6]   # Tipo
-                ])
-            
-            # Crear tabla
-            table = Table(data, colWidths=[120, 80, 80, 80, 80, 80])
-            table.setStyle(TableStyle([
-                ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#34495e')),
-                ('TEXTCOLOR', (0, 0), (-1, 0), colors.white),
-                ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
-                ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-                ('FONTSIZE', (0, 0), (-1, 0), 10),
-                ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
-                ('BACKGROUND', (0, 1), (-1, -1), colors.HexColor('#ecf0f1')),
-                ('TEXTCOLOR', (0, 1), (-1, -1), colors.black),
-                ('FONTNAME', (0, 1), (-1, -1), 'Helvetica'),
-                ('FONTSIZE', (0, 1), (-1, -1), 8),
-                ('GRID', (0, 0), (-1, -1), 1, colors.grey),
-            ]))
-            
-            elements.append(table)
+        data = request.get_json(silent=True) or {}
+        fecha_inicio = data.get('fecha_inicio') or request.args.get('fecha_inicio')
+        fecha_fin = data.get('fecha_fin') or request.args.get('fecha_fin')
+        tipo_reporte = data.get('tipo_reporte') or request.args.get('tipo_reporte', 'general')
+        if fecha_inicio and fecha_fin and rango_fechas(fecha_inicio, fecha_fin) is None:
+            return jsonify({'success': False, 'error': 'Fechas inválidas'}), 400
+
+        limpiar_pdf_jobs_vencidos()
+        job = {
+            'id': secrets.token_urlsafe(18),
+            'usuario_id': current_user.id,
+            'fecha_inicio': fecha_inicio,
+            'fecha_fin': fecha_fin,
+            'tipo_reporte': tipo_reporte,
+            'archivo': export_cache.nombre(
+                current_user.id, version_datos_usuario(current_user.id), 'pdf',
+                fecha_inicio=fecha_inicio, fecha_fin=fecha_fin, tipo_reporte=tipo_reporte
+            ),
+            'estado': 'pendiente',
+            'creado': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+            'creado_ts': time.time()
+        }
+
+        # Mismo usuario, filtros y versión de datos: se reutiliza el PDF ya generado
+        if export_cache.get(job['archivo']):
+            job['estado'] = 'listo'
+            job['finalizado'] = job['creado']
+            guardar_pdf_job(job)
         else:
-            elements.append(Paragraph("No hay datos para mostrar", styles['Normal']))
-        
-        # Pie de página
-        elements.append(Spacer(1, 30))
-        elements.append(Paragraph("© Paybook - Sistema de Gestión de Comisiones", styles['Normal']))
-        
-        # Construir PDF
-        doc.build(elements)
-        
-        # Preparar respuesta
-        buffer.seek(0)
-        filename = f'reporte_paybook_{tipo_reporte}_{datetime.now().strftime("%Y%m%d_%H%M%S")}.pdf'
-        
-        return send_file(
-            buffer,
-            mimetype='application/pdf',
-            as_attachment=True,
-            download_name=filename
-        )
+            guardar_pdf_job(job)
+            pdf_executor.submit(ejecutar_pdf_job, dict(job))
+
+        return jsonify({'success': True, 'data': serializar_pdf_job(job)}), 202
         
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)}), 500
 
+@app.route('/api/exportar/pdf/<job_id>', methods=['GET'])
+@login_required
+def exportar_pdf_estado(job_id):
+    job = cargar_pdf_job(job_id)
+    if not job or job['usuario_id'] != current_user.id:
+        return jsonify({'success': False, 'error': 'Trabajo no encontrado'}), 404
+    if job_interrumpido(pdf_job_path(job_id), job, time.time() - EXPORT_JOB_TTL):
+        cerrar_job_interrumpido(job, guardar_pdf_job, os.path.join(JOBS_DIR, f'pdf_{job_id}.pdf.tmp'))
+    return jsonify({'success': True, 'data': serializar_pdf_job(job)})
+
+@app.route('/api/exportar/pdf/<job_id>/descargar', methods=['GET'])
+@login_required
+def exportar_pdf_descargar(job_id):
+    job = cargar_pdf_job(job_id)
+    if not job or job['usuario_id'] != current_user.id:
+        return jsonify({'success': False, 'error': 'Trabajo no encontrado'}), 404
+    if job['estado'] != 'listo':
+        return jsonify({'success': False, 'error': 'El reporte todavía no está listo'}), 409
+
+    pdf_path = export_cache.ruta(job['archivo'])
+    if not os.path.exists(pdf_path):
+        return jsonify({'success': False, 'error': 'El reporte expiró, vuelve a generarlo'}), 410
+
+    filename = f"reporte_paybook_{job['tipo_reporte']}_{job['creado'].replace('-', '').replace(':', '').replace(' ', '_')}.pdf"
+    return send_file(
+        pdf_path,
+        mimetype='application/pdf',
+        as_attachment=True,
+        download_name=filename
+    )
+
+# ========== IMPORTACIÓN CSV DE CARGAS ==========
+# Acepta el mismo formato que exportar_excel. El archivo se guarda en JOBS_DIR
+# y un hilo aparte lo lee fila por fila (sin cargarlo entero en memoria),
+# insertando en transacciones de IMPORT_LOTE filas. El progreso queda en un
+# JSON como los trabajos PDF, así cualquier worker puede consultarlo.
+IMPORT_LOTE = int(os.environ.get('IMPORT_LOTE', 1000))
+IMPORT_MAX_ERRORES = 100
+IMPORT_MAX_BYTES = int(os.environ.get('IMPORT_MAX_BYTES', 20 * 1024 * 1024))
+IMPORT_MAX_FILAS = int(os.environ.get('IMPORT_MAX_FILAS', 200000))
+# Es el único upload de la app: Werkzeug corta cualquier cuerpo más grande con
+# 413 mientras lo lee, sin llegar a escribirlo (margen para el multipart)
+app.config['MAX_CONTENT_LENGTH'] = IMPORT_MAX_BYTES + 64 * 1024
+IMPORT_COLUMNAS_REQUERIDAS = ('Cajero', 'Plataforma', 'Monto', 'Fecha')
+import_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='import')
+
+def import_job_path(job_id):
+    return os.path.join(JOBS_DIR, f'import_{job_id}.json')
+
+def guardar_import_job(job):
+    ensure_dirs()
+    meta_path = import_job_path(job['id'])
+    tmp_path = f'{meta_path}.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as job_file:
+        json.dump(job, job_file, ensure_ascii=False)
+    os.replace(tmp_path, meta_path)
+
+def cargar_import_job(job_id):
+    if not PDF_JOB_ID_RE.match(job_id or ''):
+        return None
+    try:
+        with open(import_job_path(job_id), 'r', encoding='utf-8') as job_file:
+            return json.load(job_file)
+    except (OSError, json.JSONDecodeError):
+        return None
+
+def serializar_import_job(job):
+    return {
+        'id': job['id'],
+        'estado': job['estado'],
+        'archivo': job['nombre_original'],
+        'bytes_total': job['bytes_total'],
+        'bytes_procesados': job['bytes_procesados'],
+        'progreso': round(100 * job['bytes_procesados'] / job['bytes_total'], 1) if job['bytes_total'] else 100,
+        'procesadas': job['procesadas'],
+        'insertadas': job['insertadas'],
+        'errores': job['errores'],
+        'detalle_errores': job['detalle_errores'],
+        'creado': job['creado'],
+        'finalizado': job.get('finalizado'),
+        'error': job.get('error'),
+        'status_url': f"/api/importar/cargas/{job['id']}"
+    }
+
+def limpiar_import_jobs_vencidos():
+    ensure_dirs()
+    limite = time.time() - EXPORT_JOB_TTL
+    for name in os.listdir(JOBS_DIR):
+        if not (name.startswith('import_') and name.endswith('.json')):
+            continue
+        job = cargar_import_job(name[len('import_'):-len('.json')])
+        if not job:
+            continue
+        # La importación guarda su progreso en cada lote, así que el mtime
+        # solo queda viejo si el hilo que la procesaba ya no existe
+        if job_interrumpido(import_job_path(job['id']), job, limite):
+            cerrar_job_interrumpido(job, guardar_import_job, os.path.join(JOBS_DIR, f"import_{job['id']}.csv"))
+        elif job.get('creado_ts', 0) < limite and job['estado'] in ('listo', 'error'):
+            try:
+                os.remove(import_job_path(job['id']))
+            except OSError:
+                pass
+
+def parsear_fila_importacion(fila, cajeros):
+    """Convierte una fila del CSV en valores de cargas. Devuelve (valores, error)."""
+    nombre = (fila.get('Cajero') or '').strip()
+    cajero_id = cajeros.get(nombre.lower())
+    if cajero_id is None:
+        return None, f'Cajero no encontrado: {nombre}' if nombre else 'Falta el cajero'
+
+    plataforma = (fila.get('Plataforma') or '').strip()
+    if not plataforma:
+        return None, 'Falta la plataforma'
+
+    try:
+        monto = float((fila.get('Monto') or '').strip())
+    except ValueError:
+        return None, 'El monto debe ser un número válido'
+    if monto == 0:
+        return None, 'El monto no puede ser 0'
+    if abs(monto) > 1000000:
+        return None, 'El monto no puede superar $1,000,000'
+
+    fecha_raw = (fila.get('Fecha') or '').strip()
+    fecha_dt = parse_fecha(fecha_raw)
+    if fecha_dt is None:
+        return None, f'Fecha inválida: {fecha_raw}'
+    fecha = fecha_dt.strftime('%Y-%m-%d %H:%M:%S')
+
+    nota = (fila.get('Nota') or '').strip()
+    pagado = 1 if (fila.get('Estado') or '').strip().upper() == 'PAGADO' else 0
+    tipo = (fila.get('Tipo') or '').strip().upper()
+    es_deuda = 1 if tipo == 'DEUDA' or (not tipo and monto < 0) else 0
+    return (cajero_id, plataforma, monto, fecha, fecha_a_ts(fecha_dt), nota, pagado, es_deuda), None
+
+def insertar_lote_importacion(usuario_id, filas):
+    with db_write_lock:
+        conn = db_pool.connect()
+        try:
+            conn.executemany('''
+                INSERT INTO cargas (usuario_id, cajero_id, plataforma, monto, fecha, fecha_ts, nota, pagado, es_deuda)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+            ''', [(usuario_id, *valores) for valores in filas])
+            conn.commit()
+        finally:
+            conn.close()
+
+def contar_lineas(ruta):
+    """Saltos de línea del archivo, leyendo por bloques: cota superior de filas CSV."""
+    lineas = 0
+    with open(ruta, 'rb') as archivo:
+        for bloque in iter(lambda: archivo.read(1024 * 1024), b''):
+            lineas += bloque.count(b'\n')
+    return lineas
+
+def ejecutar_import_job(job, ruta_csv):
+    job['estado'] = 'procesando'
+    guardar_import_job(job)
+    try:
+        conn = db_pool.connect()
+        try:
+            cursor = conn.cursor()
+            cursor.execute(
+                'SELECT id, nombre FROM cajeros WHERE usuario_id = ? AND activo = 1',
+                (job['usuario_id'],)
+            )
+            # Nombres únicos sin distinguir mayúsculas (igual que add_cajero)
+            cajeros = {nombre.strip().lower(): cajero_id for cajero_id, nombre in cursor.fetchall()}
+        finally:
+            conn.close()
+
+        with open(ruta_csv, 'rb') as binario:
+            texto = io.TextIOWrapper(binario, encoding='utf-8-sig', newline='')
+            lector = csv.DictReader(texto)
+            faltantes = [col for col in IMPORT_COLUMNAS_REQUERIDAS if col not in (lector.fieldnames or [])]
+            if faltantes:
+                raise ValueError(f"Faltan columnas: {', '.join(faltantes)}")
+
+            lote = []
+            for fila in lector:
+                # contar_lineas es solo una cota previa; el tope real es este
+                if job['procesadas'] >= IMPORT_MAX_FILAS:
+                    raise ValueError(f'El archivo supera el máximo de {IMPORT_MAX_FILAS} filas')
+                job['procesadas'] += 1
+                valores, error = parsear_fila_importacion(fila, cajeros)
+                if error:
+                    job['errores'] += 1
+                    if len(job['detalle_errores']) < IMPORT_MAX_ERRORES:
+                        # +1 por la fila de encabezados
+                        job['detalle_errores'].append({'linea': job['procesadas'] + 1, 'error': error})
+                    continue
+                lote.append(valores)
+                if len(lote) >= IMPORT_LOTE:
+                    insertar_lote_importacion(job['usuario_id'], lote)
+                    job['insertadas'] += len(lote)
+                    lote = []
+                    job['bytes_procesados'] = binario.tell()
+                    guardar_import_job(job)
+            if lote:
+                insertar_lote_importacion(job['usuario_id'], lote)
+                job['insertadas'] += len(lote)
+
+        job['bytes_procesados'] = job['bytes_total']
+        job['estado'] = 'listo'
+    except Exception as e:
+        traceback.print_exc()
+        job['estado'] = 'error'
+        job['error'] = str(e)
+    finally:
+        try:
+            os.remove(ruta_csv)
+        except OSError:
+            pass
+
+    if job['insertadas']:
+        with db_write_lock:
+            conn = db_pool.connect()
+            try:
+                registrar_evento(conn.cursor(), job['usuario_id'], 'cargas_importadas', {
+                    'insertadas': job['insertadas']
+                })
+                conn.commit()
+            finally:
+                conn.close()
+        event_broker.notificar()
+
+    job['finalizado'] = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+    guardar_import_job(job)
+
+@app.route('/api/importar/cargas', methods=['POST'])
+@login_required
+def importar_cargas():
+    """Recibe un CSV (campo 'archivo') y encola su importación."""
+    try:
+        archivo = request.files.get('archivo')
+        if not archivo or not archivo.filename:
+            return jsonify({'success': False, 'error': 'Se requiere un archivo CSV'}), 400
+
+        limpiar_import_jobs_vencidos()
+        job_id = secrets.token_urlsafe(18)
+        ruta_csv = os.path.join(JOBS_DIR, f'import_{job_id}.csv')
+        archivo.save(ruta_csv)
+
+        if os.path.getsize(ruta_csv) > IMPORT_MAX_BYTES:
+            os.remove(ruta_csv)
+            return jsonify({
+                'success': False,
+                'error': f'El archivo supera el máximo de {IMPORT_MAX_BYTES // (1024 * 1024)} MB'
+            }), 413
+        # -1 por la fila de encabezados
+        if contar_lineas(ruta_csv) - 1 > IMPORT_MAX_FILAS:
+            os.remove(ruta_csv)
+            return jsonify({
+                'success': False,
+                'error': f'El archivo supera el máximo de {IMPORT_MAX_FILAS} filas'
+            }), 413
+
+        job = {
+            'id': job_id,
+            'usuario_id': current_user.id,
+            'nombre_original': archivo.filename,
+            'estado': 'pendiente',
+            'bytes_total': os.path.getsize(ruta_csv),
+            'bytes_procesados': 0,
+            'procesadas': 0,
+            'insertadas': 0,
+            'errores': 0,
+            'detalle_errores': [],
+            'creado': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+            'creado_ts': time.time()
+        }
+        guardar_import_job(job)
+        import_executor.submit(ejecutar_import_job, dict(job), ruta_csv)
+
+        return jsonify({'success': True, 'data': serializar_import_job(job)}), 202
+    except RequestEntityTooLarge:
+        # Cuerpo mayor a MAX_CONTENT_LENGTH: lo responde el manejador de 413
+        raise
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+@app.route('/api/importar/cargas/<job_id>', methods=['GET'])
+@login_required
+def importar_cargas_estado(job_id):
+    job = cargar_import_job(job_id)
+    if not job or job['usuario_id'] != current_user.id:
+        return jsonify({'success': False, 'error': 'Trabajo no encontrado'}), 404
+    if job_interrumpido(import_job_path(job_id), job, time.time() - EXPORT_JOB_TTL):
+        cerrar_job_interrumpido(job, guardar_import_job, os.path.join(JOBS_DIR, f'import_{job_id}.csv'))
+    return jsonify({'success': True, 'data': serializar_import_job(job)})
+
 # ========== API REPORTES ==========
+# Los totales salen de resumen_diario (una fila por día/cajero/plataforma). El
+# listado de cargas del período se incluye como siempre; ?detalle=0 lo omite
+# para quien solo necesita los totales.
+def construir_reporte_periodo(cursor, usuario_id, dia_inicio, dia_fin, detalle=True):
+    cursor.execute('''
+        SELECT r.dia, r.cajero_id, c.nombre, r.plataforma,
+               r.cantidad, r.total, r.cantidad_pendiente, r.total_pendiente
+        FROM resumen_diario r
+        LEFT JOIN cajeros c ON c.id = r.cajero_id AND c.usuario_id = r.usuario_id
+        WHERE r.usuario_id = ? AND r.dia BETWEEN ? AND ? AND r.cantidad > 0
+        ORDER BY r.dia
+    ''', (usuario_id, dia_inicio, dia_fin))
+
+    totales = {'total_cargas': 0, 'monto_total': 0, 'cargas_pendientes': 0, 'monto_pendiente': 0}
+    por_dia, por_cajero, por_plataforma = {}, {}, {}
+    for dia, cajero_id, nombre, plataforma, cantidad, total, cantidad_pend, total_pend in cursor.fetchall():
+        totales['total_cargas'] += cantidad
+        totales['monto_total'] += total
+        totales['cargas_pendientes'] += cantidad_pend
+        totales['monto_pendiente'] += total_pend
+        for grupo, clave, extra in (
+            (por_dia, dia, {'dia': dia}),
+            (por_cajero, cajero_id, {'cajero_id': cajero_id, 'cajero': nombre}),
+            (por_plataforma, plataforma, {'plataforma': plataforma})
+        ):
+            item = grupo.setdefault(clave, dict(extra, cargas=0, monto=0))
+            item['cargas'] += cantidad
+            item['monto'] += total
+
+    # Redondeo a centavos: las sumas de REAL arrastran error de coma flotante
+    for item in (totales, *por_dia.values(), *por_cajero.values(), *por_plataforma.values()):
+        for clave in ('monto_total', 'monto_pendiente', 'monto'):
+            if clave in item:
+                item[clave] = round(item[clave], 2)
+
+    data = dict(totales)
+    data['por_dia'] = list(por_dia.values())
+    data['por_cajero'] = sorted(por_cajero.values(), key=lambda item: -item['monto'])
+    data['por_plataforma'] = sorted(por_plataforma.values(), key=lambda item: -item['monto'])
+
+    if detalle:
+        # Las mismas filas que suma resumen_diario: LEFT JOIN (una carga cuyo
+        # cajero ya no existe también cuenta) y el día como substr(fecha, 1, 10).
+        # El rango sobre fecha usa idx_cargas_usuario_fecha; el substr deja
+        # afuera textos que no son fechas y caen dentro del rango
+        dia_siguiente = (datetime.strptime(dia_fin, '%Y-%m-%d') + timedelta(days=1)).strftime('%Y-%m-%d')
+        cursor.execute('''
+            SELECT c.nombre, cg.plataforma, cg.monto, cg.fecha, cg.nota,
+                   CASE 
+                       WHEN cg.pagado = 1 THEN 'PAGADO'
+                       WHEN cg.es_deuda = 1 THEN 'DEUDA'
+                       ELSE 'PENDIENTE'
+                   END as estado,
+                   CASE 
+                       WHEN cg.es_deuda = 1 THEN 'DEUDA'
+                       ELSE 'CARGA'
+                   END as tipo
+            FROM cargas cg
+            LEFT JOIN cajeros c ON c.id = cg.cajero_id AND c.usuario_id = cg.usuario_id
+            WHERE cg.usuario_id = ? AND cg.fecha >= ? AND cg.fecha < ?
+              AND substr(cg.fecha, 1, 10) <= ?
+            ORDER BY cg.fecha DESC, cg.id DESC
+        ''', (usuario_id, dia_inicio, dia_siguiente, dia_fin))
+        data['cargas'] = [{
+            'cajero': row[0],
+            'plataforma': row[1],
+            'monto': row[2],
+            'fecha': row[3],
+            'nota': row[4] or '',
+            'estado': row[5],
+            'tipo': row[6]
+        } for row in cursor.fetchall()]
+    return data
+
+def reporte_periodo_response(dia_inicio, dia_fin, **extra):
+    detalle = request.args.get('detalle', '1').lower() not in ('0', 'false', 'no')
+    conn = db_pool.connect()
+    cursor = conn.cursor()
+    data = construir_reporte_periodo(cursor, current_user.id, dia_inicio, dia_fin, detalle)
+    conn.close()
+    data.update(extra)
+    return jsonify({'success': True, 'data': data})
+
 @app.route('/api/reportes/diario', methods=['GET'])
 @login_required
 def get_reporte_diario():
     try:
         hoy = datetime.now().strftime('%Y-%m-%d')
-        fecha_inicio = f'{hoy} 00:00:00'
-        fecha_fin = f'{hoy} 23:59:59'
-        
-        with db_lock:
-            conn = sqlite3.connect(DB_PATH)
-            cursor = conn.cursor()
-            
-            # Obtener cargas del día
-            cursor.execute('''
-                SELECT c.nombre, cg.plataforma, cg.monto, cg.fecha, cg.nota,
-                       CASE 
-                           WHEN cg.pagado = 1 THEN 'PAGADO'
-                           WHEN cg.es_deuda = 1 THEN 'DEUDA'
-                           ELSE 'PENDIENTE'
-                       END as estado,
-                       CASE 
-                           WHEN cg.es_deuda = 1 THEN 'DEUDA'
-                           ELSE 'CARGA'
-                       END as tipo
-                FROM cargas cg
-                JOIN cajeros c ON cg.cajero_id = c.id
-                WHERE cg.fecha BETWEEN ? AND ? AND cg.usuario_id = ? AND c.usuario_id = ?
-                ORDER BY cg.fecha DESC
-            ''', (fecha_inicio, fecha_fin, current_user.id, current_user.id))
-            
-            cargas = cursor.fetchall()
-            
-            # Calcular totales
-            cursor.execute('''
-                SELECT COUNT(*), COALESCE(SUM(monto), 0)
-                FROM cargas 
-                WHERE fecha BETWEEN ? AND ? AND usuario_id = ?
-            ''', (fecha_inicio, fecha_fin, current_user.id))
-            
-            total_cargas, monto_total = cursor.fetchone()
-            
-            conn.close()
-        
-        return jsonify({
-            'success': True,
-            'data': {
-                'fecha': hoy,
-                'total_cargas': total_cargas or 0,
-                'monto_total': monto_total or 0,
-                'cargas': [{
-                    'cajero': row[0],
-                    'plataforma': row[1],
-                    'monto': row[2],
-                    'fecha': row[3],
-                    'nota': row[4] or '',
-                    'estado': row[5],
-                    'tipo': row[6]
-                } for row in cargas]
-            }
-        })
-        
+        return reporte_periodo_response(hoy, hoy, fecha=hoy)
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)}), 500
 
@@ -1999,66 +4296,11 @@ def get_reporte_diario():
 def get_reporte_semanal():
     try:
         hoy = datetime.now()
-        inicio_semana = hoy - timedelta(days=hoy.weekday())
-        fin_semana = inicio_semana + timedelta(days=6)
-        
-        fecha_inicio = inicio_semana.strftime('%Y-%m-%d 00:00:00')
-        fecha_fin = fin_semana.strftime('%Y-%m-%d 23:59:59')
-        
-        with db_lock:
-            conn = sqlite3.connect(DB_PATH)
-            cursor = conn.cursor()
-            
-            # Obtener cargas de la semana
-            cursor.execute('''
-                SELECT c.nombre, cg.plataforma, cg.monto, cg.fecha, cg.nota,
-                       CASE 
-                           WHEN cg.pagado = 1 THEN 'PAGADO'
-                           WHEN cg.es_deuda = 1 THEN 'DEUDA'
-                           ELSE 'PENDIENTE'
-                       END as estado,
-                       CASE 
-                           WHEN cg.es_deuda = 1 THEN 'DEUDA'
-                           ELSE 'CARGA'
-                       END as tipo
-                FROM cargas cg
-                JOIN cajeros c ON cg.cajero_id = c.id
-                WHERE cg.fecha BETWEEN ? AND ? AND cg.usuario_id = ? AND c.usuario_id = ?
-                ORDER BY cg.fecha DESC
-            ''', (fecha_inicio, fecha_fin, current_user.id, current_user.id))
-            
-            cargas = cursor.fetchall()
-            
-            # Calcular totales
-            cursor.execute('''
-                SELECT COUNT(*), COALESCE(SUM(monto), 0)
-                FROM cargas 
-                WHERE fecha BETWEEN ? AND ? AND usuario_id = ?
-            ''', (fecha_inicio, fecha_fin, current_user.id))
-            
-            total_cargas, monto_total = cursor.fetchone()
-            
-            conn.close()
-        
-        return jsonify({
-            'success': True,
-            'data': {
-                'fecha_inicio': inicio_semana.strftime('%Y-%m-%d'),
-                'fecha_fin': fin_semana.strftime('%Y-%m-%d'),
-                'total_cargas': total_cargas or 0,
-                'monto_total': monto_total or 0,
-                'cargas': [{
-                    'cajero': row[0],
-                    'plataforma': row[1],
-                    'monto': row[2],
-                    'fecha': row[3],
-                    'nota': row[4] or '',
-                    'estado': row[5],
-                    'tipo': row[6]
-                } for row in cargas]
-            }
-        })
-        
+        inicio_semana = (hoy - timedelta(days=hoy.weekday())).strftime('%Y-%m-%d')
+        fin_semana = (hoy - timedelta(days=hoy.weekday()) + timedelta(days=6)).strftime('%Y-%m-%d')
+        return reporte_periodo_response(
+            inicio_semana, fin_semana, fecha_inicio=inicio_semana, fecha_fin=fin_semana
+        )
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)}), 500
 
@@ -2072,64 +4314,10 @@ def get_reporte_mensual():
             fin_mes = datetime(hoy.year + 1, 1, 1) - timedelta(days=1)
         else:
             fin_mes = datetime(hoy.year, hoy.month + 1, 1) - timedelta(days=1)
-        
-        fecha_inicio = inicio_mes.strftime('%Y-%m-%d 00:00:00')
-        fecha_fin = fin_mes.strftime('%Y-%m-%d 23:59:59')
-        
-        with db_lock:
-            conn = sqlite3.connect(DB_PATH)
-            cursor = conn.cursor()
-            
-            # Obtener cargas del mes
-            cursor.execute('''
-                SELECT c.nombre, cg.plataforma, cg.monto, cg.fecha, cg.nota,
-                       CASE 
-                           WHEN cg.pagado = 1 THEN 'PAGADO'
-                           WHEN cg.es_deuda = 1 THEN 'DEUDA'
-                           ELSE 'PENDIENTE'
-                       END as estado,
-                       CASE 
-                           WHEN cg.es_deuda = 1 THEN 'DEUDA'
-                           ELSE 'CARGA'
-                       END as tipo
-                FROM cargas cg
-                JOIN cajeros c ON cg.cajero_id = c.id
-                WHERE cg.fecha BETWEEN ? AND ? AND cg.usuario_id = ? AND c.usuario_id = ?
-                ORDER BY cg.fecha DESC
-            ''', (fecha_inicio, fecha_fin, current_user.id, current_user.id))
-            
-            cargas = cursor.fetchall()
-            
-            # Calcular totales
-            cursor.execute('''
-                SELECT COUNT(*), COALESCE(SUM(monto), 0)
-                FROM cargas 
-                WHERE fecha BETWEEN ? AND ? AND usuario_id = ?
-            ''', (fecha_inicio, fecha_fin, current_user.id))
-            
-            total_cargas, monto_total = cursor.fetchone()
-            
-            conn.close()
-        
-        return jsonify({
-            'success': True,
-            'data': {
-                'fecha_inicio': inicio_mes.strftime('%Y-%m-%d'),
-                'fecha_fin': fin_mes.strftime('%Y-%m-%d'),
-                'total_cargas': total_cargas or 0,
-                'monto_total': monto_total or 0,
-                'cargas': [{
-                    'cajero': row[0],
-                    'plataforma': row[1],
-                    'monto': row[2],
-                    'fecha': row[3],
-                    'nota': row[4] or '',
-                    'estado': row[5],
-                    'tipo': row[6]
-                } for row in cargas]
-            }
-        })
-        
+        return reporte_periodo_response(
+            inicio_mes.strftime('%Y-%m-%d'), fin_mes.strftime('%Y-%m-%d'),
+            fecha_inicio=inicio_mes.strftime('%Y-%m-%d'), fecha_fin=fin_mes.strftime('%Y-%m-%d')
+        )
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)}), 500
 
@@ -2138,15 +4326,7 @@ def get_reporte_mensual():
 @login_required
 def get_configuracion():
     try:
-        with db_lock:
-            conn = sqlite3.connect(DB_PATH)
-            cursor = conn.cursor()
-            
-            cursor.execute('SELECT clave, valor FROM configuraciones')
-            configs = cursor.fetchall()
-            conn.close()
-        
-        config_dict = {row[0]: row[1] for row in configs}
+        config_dict = dict(config_cache.snapshot())
         
         return jsonify({
             'success': True,
@@ -2167,8 +4347,8 @@ def update_configuracion():
         if not data:
             return jsonify({'success': False, 'error': 'No se recibieron datos'}), 400
         
-        with db_lock:
-            conn = sqlite3.connect(DB_PATH)
+        with db_write_lock:
+            conn = db_pool.connect()
             cursor = conn.cursor()
             
             for clave, valor in data.items():
@@ -2179,6 +4359,7 @@ def update_configuracion():
             
             conn.commit()
             conn.close()
+        config_cache.invalidate()
         
         return jsonify({
             'success': True,
@@ -2189,155 +4370,311 @@ def update_configuracion():
         return jsonify({'success': False, 'error': str(e)}), 500
 
 # ========== API PLANES (PUBLICO) ==========
-@app.route('/api/planes', methods=['GET'])
-def get_planes():
-    try:
-        with db_lock:
-            conn = sqlite3.connect(DB_PATH)
-            cursor = conn.cursor()
-
-            def parse_price(value, default):
-                try:
-                    return float(value)
-                except (TypeError, ValueError):
-                    return float(default)
-
-            precio_basico = parse_price(get_config_value(cursor, 'precio_basico', '10000'), '10000')
-            precio_premium = parse_price(get_config_value(cursor, 'precio_premium', '20000'), '20000')
-            lite_cajeros_raw = get_config_value(cursor, 'plan_lite_cajeros', '15')
-            pro_cajeros_raw = get_config_value(cursor, 'plan_pro_cajeros', '0')
-
-            lite_features_raw = get_config_value(
-                cursor,
-                'plan_lite_features',
-                'Cargas ilimitadas\nReportes básicos\n- WhatsApp API\n- Reportes avanzados'
-            )
-            pro_features_raw = get_config_value(
-                cursor,
-                'plan_pro_features',
-                'Cargas ilimitadas\nReportes avanzados\nWhatsApp API\nSoporte prioritario'
-            )
-
-            conn.close()
-
-        lite_cajeros_max = parse_max_cajeros(lite_cajeros_raw)
-        pro_cajeros_max = parse_max_cajeros(pro_cajeros_raw)
+# La respuesta de /api/planes depende solo de estas claves de configuración.
+# Se arma una vez por combinación de valores y se sirve con ETag fuerte.
+PLAN_CONFIG_KEYS = (
+    'precio_basico', 'precio_premium', 'plan_lite_cajeros', 'plan_pro_cajeros',
+    'plan_lite_features', 'plan_pro_features'
+)
+PLANES_MAX_AGE = int(os.environ.get('PLANES_MAX_AGE', 60))
+planes_payload_lock = Lock()
+planes_payload = {'clave': None, 'body': None, 'etag': None}
+
+def construir_planes(valores):
+    def parse_price(value, default):
+        try:
+            return float(value)
+        except (TypeError, ValueError):
+            return float(default)
+
+    def valor(clave, default):
+        actual = valores.get(clave)
+        return actual if actual is not None else default
+
+    precio_basico = parse_price(valor('precio_basico', '10000'), '10000')
+    precio_premium = parse_price(valor('precio_premium', '20000'), '20000')
+    lite_cajeros_max = parse_max_cajeros(valor('plan_lite_cajeros', '15'))
+    pro_cajeros_max = parse_max_cajeros(valor('plan_pro_cajeros', '0'))
+
+    lite_features = parse_plan_features(
+        valor('plan_lite_features', 'Cargas ilimitadas\nReportes básicos\n- WhatsApp API\n- Reportes avanzados'),
+        ['Cargas ilimitadas', 'Reportes básicos', '- WhatsApp API', '- Reportes avanzados']
+    )
+    pro_features = parse_plan_features(
+        valor('plan_pro_features', 'Cargas ilimitadas\nReportes avanzados\nWhatsApp API\nSoporte prioritario'),
+        ['Cargas ilimitadas', 'Reportes avanzados', 'WhatsApp API', 'Soporte prioritario']
+    )
+
+    lite_features.insert(0, {
+        'text': 'Cajeros ilimitados' if lite_cajeros_max is None else f'Hasta {lite_cajeros_max} cajeros',
+        'included': True
+    })
+    pro_features.insert(0, {
+        'text': 'Cajeros ilimitados' if pro_cajeros_max is None else f'Hasta {pro_cajeros_max} cajeros',
+        'included': True
+    })
 
-        lite_features = parse_plan_features(
-            lite_features_raw,
-            ['Cargas ilimitadas', 'Reportes básicos', '- WhatsApp API', '- Reportes avanzados']
-        )
-        pro_features = parse_plan_features(
-            pro_features_raw,
-            ['Cargas ilimitadas', 'Reportes avanzados', 'WhatsApp API', 'Soporte prioritario']
-        )
+    return {
+        'lite': {
+            'nombre': 'Lite',
+            'precio': precio_basico,
+            'cajeros_max': lite_cajeros_max,
+            'features': lite_features
+        },
+        'pro': {
+            'nombre': 'Pro',
+            'precio': precio_premium,
+            'cajeros_max': pro_cajeros_max,
+            'features': pro_features
+        }
+    }
 
-        lite_features.insert(0, {
-            'text': 'Cajeros ilimitados' if lite_cajeros_max is None else f'Hasta {lite_cajeros_max} cajeros',
-            'included': True
-        })
-        pro_features.insert(0, {
-            'text': 'Cajeros ilimitados' if pro_cajeros_max is None else f'Hasta {pro_cajeros_max} cajeros',
-            'included': True
-        })
+def obtener_payload_planes():
+    """Devuelve (body, etag) de /api/planes, regenerándolo solo si cambió la config de planes."""
+    valores = config_cache.snapshot()
+    clave = tuple(valores.get(key) for key in PLAN_CONFIG_KEYS)
+    with planes_payload_lock:
+        if planes_payload['clave'] != clave:
+            body = app.json.dumps({'success': True, 'data': construir_planes(valores)})
+            planes_payload['body'] = body.encode('utf-8')
+            planes_payload['etag'] = hashlib.sha256(planes_payload['body']).hexdigest()[:32]
+            planes_payload['clave'] = clave
+        return planes_payload['body'], planes_payload['etag']
 
-        return jsonify({
-            'success': True,
-            'data': {
-                'lite': {
-                    'nombre': 'Lite',
-                    'precio': precio_basico,
-                    'cajeros_max': lite_cajeros_max,
-                    'features': lite_features
-                },
-                'pro': {
-                    'nombre': 'Pro',
-                    'precio': precio_premium,
-                    'cajeros_max': pro_cajeros_max,
-                    'features': pro_features
-                }
-            }
-        })
+@app.route('/api/planes', methods=['GET'])
+def get_planes():
+    try:
+        body, etag = obtener_payload_planes()
+        response = app.response_class(body, mimetype='application/json')
+        response.set_etag(etag)
+        response.cache_control.public = True
+        response.cache_control.max_age = PLANES_MAX_AGE
+        # Si el If-None-Match coincide, responde 304 sin cuerpo
+        return response.make_conditional(request)
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)}), 500
 
 # ========== API ADMIN ==========
+# Las métricas del panel admin se calculan en un hilo de fondo cada
+# ADMIN_STATS_INTERVAL segundos y se sirven desde memoria. El hilo arranca con
+# la primera consulta y se detiene si nadie las pide en ADMIN_STATS_IDLE.
+ADMIN_STATS_INTERVAL = float(os.environ.get('ADMIN_STATS_INTERVAL', 60))
+ADMIN_STATS_IDLE = float(os.environ.get('ADMIN_STATS_IDLE', 600))
+
+def calcular_estadisticas_admin():
+    hoy = datetime.now().strftime('%Y-%m-%d')
+    manana = (datetime.now() + timedelta(days=1)).strftime('%Y-%m-%d')
+    inicio_mes = datetime.now().replace(day=1).strftime('%Y-%m-%d')
+
+    conn = db_pool.connect()
+    try:
+        cursor = conn.cursor()
+        cursor.execute('SELECT COUNT(*), COALESCE(SUM(activo = 1), 0) FROM usuarios')
+        total_usuarios, usuarios_activos = cursor.fetchone()
+
+        cursor.execute('''
+            SELECT
+                (SELECT COUNT(*) FROM solicitudes_pago WHERE estado = 'pendiente'),
+                (SELECT COALESCE(SUM(monto), 0) FROM solicitudes_pago
+                 WHERE estado = 'verificado' AND fecha_respuesta >= ? AND fecha_respuesta < ?),
+                (SELECT COALESCE(SUM(monto), 0) FROM solicitudes_pago
+                 WHERE estado = 'verificado' AND fecha_respuesta >= ?)
+        ''', (hoy, manana, inicio_mes))
+        pagos_pendientes, ingresos_hoy, ingresos_mes = cursor.fetchone()
+    finally:
+        conn.close()
+
+    db_size = 0
+    if os.path.exists(DB_PATH):
+        db_size = os.path.getsize(DB_PATH) / (1024 * 1024)
+
+    ultimo_backup = get_latest_backup()
+    ultimo_backup_label = ultimo_backup['created_at'] if ultimo_backup else '--'
+
+    return {
+        'total_usuarios': total_usuarios,
+        'usuarios_activos': usuarios_activos,
+        'pagos_pendientes': pagos_pendientes,
+        'ingresos_hoy': round(ingresos_hoy, 2),
+        'ingresos_mes': round(ingresos_mes, 2),
+        'db_size': f'{db_size:.2f} MB',
+        'ultimo_backup': ultimo_backup_label,
+        'actualizado': datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+    }
+
+class AdminStatsCache:
+    """Última foto de las métricas admin, renovada por un hilo de fondo."""
+
+    def __init__(self, interval, idle):
+        self.interval = interval
+        self.idle = idle
+        self._lock = Lock()
+        self._refresh_lock = Lock()
+        self._snapshot = None
+        self._ultimo_pedido = 0
+        self._hilo = None
+
+    def _refrescar(self):
+        # Un solo cálculo a la vez; quien llega mientras tanto usa su resultado
+        with self._refresh_lock:
+            snapshot = calcular_estadisticas_admin()
+            with self._lock:
+                self._snapshot = snapshot
+            return snapshot
+
+    def _run(self):
+        while True:
+            time.sleep(self.interval)
+            with self._lock:
+                if time.monotonic() - self._ultimo_pedido > self.idle:
+                    self._hilo = None
+                    return
+            try:
+                self._refrescar()
+            except Exception as e:
+                print(f"⚠️ Error refrescando estadísticas admin: {e}")
+
+    def get(self, forzar=False):
+        with self._lock:
+            self._ultimo_pedido = time.monotonic()
+            snapshot = self._snapshot
+            if self._hilo is None or not self._hilo.is_alive():
+                self._hilo = Thread(target=self._run, name='admin-stats', daemon=True)
+                self._hilo.start()
+        if snapshot is None or forzar:
+            snapshot = self._refrescar()
+        return snapshot
+
+    def invalidate(self):
+        with self._lock:
+            self._snapshot = None
+
+admin_stats_cache = AdminStatsCache(ADMIN_STATS_INTERVAL, ADMIN_STATS_IDLE)
+
 @app.route('/api/estadisticas/admin', methods=['GET'])
 def estadisticas_admin():
     admin_check = require_admin()
     if admin_check:
         return admin_check
     try:
-        hoy = datetime.now().strftime('%Y-%m-%d')
-        inicio_mes = datetime.now().replace(day=1).strftime('%Y-%m-%d')
-
-        with db_lock:
-            conn = sqlite3.connect(DB_PATH)
-            cursor = conn.cursor()
-
-            cursor.execute('SELECT COUNT(*) FROM usuarios')
-            total_usuarios = cursor.fetchone()[0]
-
-            cursor.execute('SELECT COUNT(*) FROM usuarios WHERE activo = 1')
-            usuarios_activos = cursor.fetchone()[0]
-
-            cursor.execute("SELECT COUNT(*) FROM solicitudes_pago WHERE estado = 'pendiente'")
-            pagos_pendientes = cursor.fetchone()[0]
-
-            cursor.execute('''
-                SELECT COALESCE(SUM(monto), 0)
-                FROM solicitudes_pago
-                WHERE estado = 'verificado' AND fecha_respuesta LIKE ?
-            ''', (f'{hoy}%',))
-            ingresos_hoy = cursor.fetchone()[0]
-
-            cursor.execute('''
-                SELECT COALESCE(SUM(monto), 0)
-                FROM solicitudes_pago
-                WHERE estado = 'verificado' AND fecha_respuesta >= ?
-            ''', (inicio_mes,))
-            ingresos_mes = cursor.fetchone()[0]
-
-            conn.close()
-
-        db_size = 0
-        if os.path.exists(DB_PATH):
-            db_size = os.path.getsize(DB_PATH) / (1024 * 1024)
-
-        ultimo_backup = get_latest_backup()
-        ultimo_backup_label = ultimo_backup['created_at'] if ultimo_backup else '--'
-
-        return jsonify({
-            'success': True,
-            'data': {
-                'total_usuarios': total_usuarios,
-                'usuarios_activos': usuarios_activos,
-                'pagos_pendientes': pagos_pendientes,
-                'ingresos_hoy': round(ingresos_hoy, 2),
-                'ingresos_mes': round(ingresos_mes, 2),
-                'db_size': f'{db_size:.2f} MB',
-                'ultimo_backup': ultimo_backup_label
-            }
-        })
+        forzar = request.args.get('refrescar', '').lower() in ('1', 'true', 'si')
+        return jsonify({'success': True, 'data': admin_stats_cache.get(forzar)})
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)}), 500
 
+USUARIOS_LIMITE_DEFAULT = 50
+USUARIOS_LIMITE_MAX = 200
+
 @app.route('/api/admin/usuarios', methods=['GET'])
 def admin_usuarios():
+    """Listado paginado de usuarios con filtros y búsqueda.
+
+    Parámetros: q (prefijos sobre email/nombre), plan, rol, activo (1/0),
+    vencidos (1/0, contra la hora actual del servidor),
+    expira_desde / expira_hasta (YYYY-MM-DD[ HH:MM:SS]), limite y cursor.
+    """
     admin_check = require_admin()
     if admin_check:
         return admin_check
     try:
-        with db_lock:
-            conn = sqlite3.connect(DB_PATH)
-            cursor = conn.cursor()
-            cursor.execute('''
-                SELECT id, email, nombre, plan, rol, telefono, fecha_registro, fecha_expiracion, activo
-                FROM usuarios
-                ORDER BY fecha_registro DESC
-            ''')
-            rows = cursor.fetchall()
-            conn.close()
+        limite = parse_limite(request.args.get('limite'), USUARIOS_LIMITE_DEFAULT, USUARIOS_LIMITE_MAX)
+        if limite is None:
+            return jsonify({
+                'success': False,
+                'error': f'El límite debe ser un número entre 1 y {USUARIOS_LIMITE_MAX}'
+            }), 400
+
+        condiciones = []
+        params = []
+
+        termino = (request.args.get('q') or '').strip()
+        if termino:
+            expresion = expresion_fts(termino)
+            if expresion is None:
+                return jsonify({'success': True, 'data': [], 'next_cursor': None})
+            condiciones.append('id IN (SELECT rowid FROM usuarios_fts WHERE usuarios_fts MATCH ?)')
+            params.append(expresion)
+
+        plan = (request.args.get('plan') or '').strip()
+        if plan:
+            plan = normalize_plan_value(plan)
+            if plan == 'free':
+                condiciones.append("COALESCE(plan, 'free') = 'free'")
+            else:
+                condiciones.append('plan = ?')
+                params.append(plan)
+
+        rol = (request.args.get('rol') or '').strip().lower()
+        if rol:
+            if rol == 'user':
+                condiciones.append("COALESCE(rol, 'user') = 'user'")
+            else:
+                condiciones.append('rol = ?')
+                params.append(rol)
+
+        activo = request.args.get('activo')
+        if activo not in (None, ''):
+            if activo not in ('0', '1'):
+                return jsonify({'success': False, 'error': 'activo debe ser 0 o 1'}), 400
+            condiciones.append('activo = 1' if activo == '1' else '(activo = 0 OR activo IS NULL)')
+
+        # fecha_expiracion se guarda como texto 'YYYY-MM-DD HH:MM:SS', así que
+        # se compara como texto contra un rango semiabierto
+        expira_desde = request.args.get('expira_desde')
+        if expira_desde:
+            desde = parse_fecha(expira_desde)
+            if desde is None:
+                return jsonify({'success': False, 'error': 'Fechas inválidas'}), 400
+            condiciones.append('fecha_expiracion >= ?')
+            params.append(desde.strftime('%Y-%m-%d %H:%M:%S'))
+        # vencidos se resuelve con el reloj del servidor: el cliente no conoce la
+        # hora exacta ni la zona con la que se guardó la expiración
+        vencidos = request.args.get('vencidos')
+        if vencidos not in (None, ''):
+            if vencidos not in ('0', '1'):
+                return jsonify({'success': False, 'error': 'vencidos debe ser 0 o 1'}), 400
+            condiciones.append('fecha_expiracion < ?' if vencidos == '1' else 'fecha_expiracion >= ?')
+            params.append(datetime.now().strftime('%Y-%m-%d %H:%M:%S'))
+        expira_hasta = request.args.get('expira_hasta')
+        if expira_hasta:
+            hasta = fin_exclusivo_texto(expira_hasta)
+            if hasta is None:
+                return jsonify({'success': False, 'error': 'Fechas inválidas'}), 400
+            condiciones.append('fecha_expiracion < ?')
+            params.append(hasta)
+
+        # Paginación por cursor sobre (fecha_registro, id), el orden de
+        # idx_usuarios_registro_orden; NULL cuenta como '' y queda al final
+        pagina_cursor = request.args.get('cursor')
+        if pagina_cursor:
+            posicion = decode_page_cursor(pagina_cursor, str, int)
+            if posicion is None:
+                return jsonify({'success': False, 'error': 'Cursor inválido'}), 400
+            condiciones.append("(COALESCE(fecha_registro, ''), id) < (?, ?)")
+            params.extend(posicion)
+
+        where = f"WHERE {' AND '.join(condiciones)}" if condiciones else ''
+        conn = db_pool.connect()
+        cursor = conn.cursor()
+        # Se pide una fila extra para saber si hay página siguiente
+        cursor.execute(f'''
+            SELECT id, email, nombre, plan, rol, telefono, fecha_registro, fecha_expiracion, activo,
+                   COALESCE(fecha_registro, '')
+            FROM usuarios
+            {where}
+            ORDER BY COALESCE(fecha_registro, '') DESC, id DESC
+            LIMIT ?
+        ''', params + [limite + 1])
+        rows = cursor.fetchall()
+
+        next_cursor = None
+        if len(rows) > limite:
+            rows = rows[:limite]
+            next_cursor = encode_page_cursor(rows[-1][9], rows[-1][0])
+
+        # Actividad de la página desde resumen_usuarios, sin otra petición del panel
+        estadisticas = leer_resumen_usuarios(cursor, get_permitir_deudas(cursor), [row[0] for row in rows])
+        conn.close()
 
         data = [{
             'id': row[0],
@@ -2348,10 +4685,11 @@ def admin_usuarios():
             'telefono': row[5],
             'fecha_registro': row[6],
             'fecha_expiracion': row[7],
-            'activo': bool(row[8])
+            'activo': bool(row[8]),
+            'estadisticas': estadisticas.get(row[0])
         } for row in rows]
 
-        return jsonify({'success': True, 'data': data})
+        return jsonify({'success': True, 'data': data, 'next_cursor': next_cursor})
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)}), 500
 
@@ -2374,8 +4712,8 @@ def admin_actualizar_usuario(user_id):
         activo = 1 if data.get('activo', True) else 0
         password = (data.get('password') or '').strip()
 
-        with db_lock:
-            conn = sqlite3.connect(DB_PATH)
+        with db_write_lock:
+            conn = db_pool.connect()
             cursor = conn.cursor()
 
             cursor.execute('SELECT id FROM usuarios WHERE email = ? AND id != ?', (email, user_id))
@@ -2398,6 +4736,7 @@ def admin_actualizar_usuario(user_id):
 
             conn.commit()
             conn.close()
+        user_cache.invalidate(user_id)
 
         return jsonify({'success': True})
     except Exception as e:
@@ -2409,12 +4748,13 @@ def admin_activar_usuario(user_id):
     if admin_check:
         return admin_check
     try:
-        with db_lock:
-            conn = sqlite3.connect(DB_PATH)
+        with db_write_lock:
+            conn = db_pool.connect()
             cursor = conn.cursor()
             cursor.execute('UPDATE usuarios SET activo = 1 WHERE id = ?', (user_id,))
             conn.commit()
             conn.close()
+        user_cache.invalidate(user_id)
         return jsonify({'success': True})
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)}), 500
@@ -2425,12 +4765,13 @@ def admin_desactivar_usuario(user_id):
     if admin_check:
         return admin_check
     try:
-        with db_lock:
-            conn = sqlite3.connect(DB_PATH)
+        with db_write_lock:
+            conn = db_pool.connect()
             cursor = conn.cursor()
             cursor.execute('UPDATE usuarios SET activo = 0 WHERE id = ?', (user_id,))
             conn.commit()
             conn.close()
+        user_cache.invalidate(user_id)
         return jsonify({'success': True})
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)}), 500
@@ -2440,15 +4781,34 @@ def admin_estadisticas_usuario(user_id):
     admin_check = require_admin()
     if admin_check:
         return admin_check
-    return jsonify({
-        'success': True,
-        'data': {
-            'cajeros_activos': 0,
-            'total_cargas': 0,
-            'total_pendiente': 0,
-            'ultima_actividad': '--'
-        }
-    })
+    try:
+        conn = db_pool.connect()
+        cursor = conn.cursor()
+        estadisticas = leer_resumen_usuarios(cursor, get_permitir_deudas(cursor), [user_id])
+        conn.close()
+        if user_id not in estadisticas:
+            return jsonify({'success': False, 'error': 'Usuario no encontrado'}), 404
+        return jsonify({'success': True, 'data': estadisticas[user_id]})
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+@app.route('/api/admin/usuarios/estadisticas', methods=['GET'])
+def admin_estadisticas_usuarios():
+    """Estadísticas de todos los usuarios en una sola consulta, por id."""
+    admin_check = require_admin()
+    if admin_check:
+        return admin_check
+    try:
+        conn = db_pool.connect()
+        cursor = conn.cursor()
+        estadisticas = leer_resumen_usuarios(cursor, get_permitir_deudas(cursor))
+        conn.close()
+        return jsonify({
+            'success': True,
+            'data': {str(usuario_id): datos for usuario_id, datos in estadisticas.items()}
+        })
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)}), 500
 
 @app.route('/api/admin/pagos/pendientes', methods=['GET'])
 def admin_pagos_pendientes():
@@ -2456,18 +4816,17 @@ def admin_pagos_pendientes():
     if admin_check:
         return admin_check
     try:
-        with db_lock:
-            conn = sqlite3.connect(DB_PATH)
-            cursor = conn.cursor()
-            cursor.execute('''
-                SELECT sp.codigo, sp.plan, sp.monto, sp.fecha_solicitud, u.nombre, u.email, u.telefono
-                FROM solicitudes_pago sp
-                LEFT JOIN usuarios u ON sp.usuario_id = u.id
-                WHERE sp.estado = 'pendiente'
-                ORDER BY sp.fecha_solicitud DESC
-            ''')
-            rows = cursor.fetchall()
-            conn.close()
+        conn = db_pool.connect()
+        cursor = conn.cursor()
+        cursor.execute('''
+            SELECT sp.codigo, sp.plan, sp.monto, sp.fecha_solicitud, u.nombre, u.email, u.telefono
+            FROM solicitudes_pago sp
+            LEFT JOIN usuarios u ON sp.usuario_id = u.id
+            WHERE sp.estado = 'pendiente'
+            ORDER BY sp.fecha_solicitud DESC
+        ''')
+        rows = cursor.fetchall()
+        conn.close()
 
         data = [{
             'codigo': row[0],
@@ -2490,8 +4849,8 @@ def admin_verificar_pago(codigo):
         return admin_check
     try:
         now = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-        with db_lock:
-            conn = sqlite3.connect(DB_PATH)
+        with db_write_lock:
+            conn = db_pool.connect()
             cursor = conn.cursor()
             cursor.execute('''
                 SELECT id, usuario_id, plan
@@ -2516,9 +4875,15 @@ def admin_verificar_pago(codigo):
                 SET plan = ?, fecha_expiracion = ?, activo = 1
                 WHERE id = ?
             ''', (plan, fecha_expiracion, usuario_id))
+            registrar_evento(cursor, usuario_id, 'plan_actualizado', {
+                'plan': plan,
+                'fecha_expiracion': fecha_expiracion
+            })
 
             conn.commit()
             conn.close()
+        user_cache.invalidate(usuario_id)
+        event_broker.notificar()
 
         return jsonify({'success': True, 'message': f'Pago {codigo} verificado correctamente'})
     except Exception as e:
@@ -2531,8 +4896,8 @@ def admin_rechazar_pago(codigo):
         return admin_check
     try:
         now = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-        with db_lock:
-            conn = sqlite3.connect(DB_PATH)
+        with db_write_lock:
+            conn = db_pool.connect()
             cursor = conn.cursor()
             cursor.execute('''
                 UPDATE solicitudes_pago
@@ -2554,12 +4919,11 @@ def admin_enviar_recordatorios():
     if admin_check:
         return admin_check
     try:
-        with db_lock:
-            conn = sqlite3.connect(DB_PATH)
-            cursor = conn.cursor()
-            cursor.execute("SELECT COUNT(*) FROM solicitudes_pago WHERE estado = 'pendiente'")
-            pendientes = cursor.fetchone()[0]
-            conn.close()
+        conn = db_pool.connect()
+        cursor = conn.cursor()
+        cursor.execute("SELECT COUNT(*) FROM solicitudes_pago WHERE estado = 'pendiente'")
+        pendientes = cursor.fetchone()[0]
+        conn.close()
         return jsonify({'success': True, 'message': f'Recordatorios enviados ({pendientes} pendientes)'})
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)}), 500
@@ -2575,12 +4939,11 @@ def admin_backup_crear():
         filename = f'backup_{timestamp}.db'
         backup_path = os.path.join(BACKUP_DIR, filename)
 
-        with db_lock:
-            source_conn = sqlite3.connect(DB_PATH)
-            backup_conn = sqlite3.connect(backup_path)
-            source_conn.backup(backup_conn)
-            backup_conn.close()
-            source_conn.close()
+        source_conn = db_pool.connect()
+        backup_conn = sqlite3.connect(backup_path)
+        source_conn.backup(backup_conn)
+        backup_conn.close()
+        source_conn.close()
 
         entry = register_backup(filename)
         download_url = f'/api/admin/backup/descargar/{quote(filename)}'
@@ -2635,12 +4998,24 @@ def admin_backup_restaurar():
         if not os.path.exists(backup_path):
             return jsonify({'success': False, 'error': 'Backup no encontrado'}), 404
 
-        with db_lock:
+        with db_write_lock:
             source_conn = sqlite3.connect(backup_path)
-            dest_conn = sqlite3.connect(DB_PATH)
-            source_conn.backup(dest_conn)
-            dest_conn.close()
-            source_conn.close()
+            dest_conn = db_pool.connect()
+            try:
+                cursor = dest_conn.cursor()
+                previos = leer_contadores_monotonos(cursor)
+                source_conn.backup(dest_conn.connection)
+                # Un backup viejo puede venir sin las últimas migraciones
+                aplicar_migraciones(cursor)
+                reanudar_contadores_monotonos(cursor, previos)
+                dest_conn.commit()
+            finally:
+                dest_conn.close()
+                source_conn.close()
+        export_cache.purgar()
+        user_cache.invalidate()
+        config_cache.invalidate()
+        admin_stats_cache.invalidate()
 
         return jsonify({'success': True, 'message': 'Backup restaurado correctamente'})
     except Exception as e:
@@ -2652,8 +5027,8 @@ def admin_db_optimizar():
     if admin_check:
         return admin_check
     try:
-        with db_lock:
-            conn = sqlite3.connect(DB_PATH)
+        with db_write_lock:
+            conn = db_pool.connect()
             cursor = conn.cursor()
             cursor.execute('VACUUM')
             conn.commit()
@@ -2662,6 +5037,76 @@ def admin_db_optimizar():
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)}), 500
 
+@app.route('/api/admin/saldos/verificar', methods=['GET'])
+def admin_saldos_verificar():
+    admin_check = require_admin()
+    if admin_check:
+        return admin_check
+    try:
+        conn = db_pool.connect()
+        cursor = conn.cursor()
+        diferencias = verificar_saldos_pendientes(cursor)
+        conn.close()
+        return jsonify({'success': True, 'data': {'consistente': not diferencias, 'diferencias': diferencias}})
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+@app.route('/api/admin/saldos/reconstruir', methods=['POST'])
+def admin_saldos_reconstruir():
+    admin_check = require_admin()
+    if admin_check:
+        return admin_check
+    try:
+        data = request.get_json(silent=True) or {}
+        usuario_id = data.get('usuario_id')
+        with db_write_lock:
+            conn = db_pool.connect()
+            cursor = conn.cursor()
+            reconstruir_saldos_pendientes(cursor, usuario_id)
+            conn.commit()
+            conn.close()
+        return jsonify({'success': True, 'message': 'Saldos pendientes reconstruidos'})
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+@app.route('/api/admin/resumen-diario/reconstruir', methods=['POST'])
+def admin_resumen_diario_reconstruir():
+    admin_check = require_admin()
+    if admin_check:
+        return admin_check
+    try:
+        data = request.get_json(silent=True) or {}
+        usuario_id = data.get('usuario_id')
+        with db_write_lock:
+            conn = db_pool.connect()
+            cursor = conn.cursor()
+            reconstruir_resumen_diario(cursor, usuario_id)
+            conn.commit()
+            conn.close()
+        return jsonify({'success': True, 'message': 'Resumen diario reconstruido'})
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+@app.cli.command('reconstruir-resumen-diario')
+def cli_reconstruir_resumen_diario():
+    """Recalcula resumen_diario desde cargas (flask --app app reconstruir-resumen-diario)."""
+    with db_write_lock:
+        conn = db_pool.connect()
+        cursor = conn.cursor()
+        reconstruir_resumen_diario(cursor)
+        conn.commit()
+        cursor.execute('SELECT COUNT(*) FROM resumen_diario')
+        filas = cursor.fetchone()[0]
+        conn.close()
+    print(f"✅ resumen_diario reconstruido ({filas} filas)")
+
+@app.route('/api/admin/db/pool', methods=['GET'])
+def admin_db_pool():
+    admin_check = require_admin()
+    if admin_check:
+        return admin_check
+    return jsonify({'success': True, 'data': db_pool.stats()})
+
 @app.route('/api/admin/cache/limpiar', methods=['POST'])
 def admin_cache_limpiar():
     admin_check = require_admin()
@@ -2669,16 +5114,22 @@ def admin_cache_limpiar():
         return admin_check
     try:
         ensure_dirs()
-        removed = 0
-        for name in os.listdir(CACHE_DIR):
-            path = os.path.join(CACHE_DIR, name)
-            if os.path.isfile(path):
-                os.remove(path)
-                removed += 1
+        removed = export_cache.purgar()
         return jsonify({'success': True, 'message': f'Cache limpiado ({removed} archivos)'})
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)}), 500
 
+@app.route('/api/admin/cache/estadisticas', methods=['GET'])
+def admin_cache_estadisticas():
+    admin_check = require_admin()
+    if admin_check:
+        return admin_check
+    try:
+        ensure_dirs()
+        return jsonify({'success': True, 'data': {'exportaciones': export_cache.stats()}})
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)}), 500
+
 @app.route('/api/admin/sistema/reiniciar', methods=['POST'])
 def admin_sistema_reiniciar():
     admin_check = require_admin()
@@ -2691,6 +5142,10 @@ def admin_sistema_reiniciar():
 def not_found(error):
     return jsonify({'success': False, 'error': 'Ruta no encontrada'}), 404
 
+@app.errorhandler(413)
+def request_too_large(error):
+    return jsonify({'success': False, 'error': 'El archivo es demasiado grande'}), 413
+
 @app.errorhandler(500)
 def server_error(error):
     return jsonify({'success': False, 'error': 'Error interno del servidor'}), 500
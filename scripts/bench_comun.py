@@ -0,0 +1,69 @@
+"""Utilidades compartidas por los scripts bench_*.py.
+
+Los benchmarks corren en proceso contra el cliente de pruebas de Flask, sin
+red ni gunicorn, sobre una base nueva en un directorio temporal (o en
+PAYBOOK_DATA_DIR si ya está definido). Nunca tocan database.db del proyecto.
+"""
+import itertools
+import os
+import resource
+import sys
+import tempfile
+import time
+
+# app.py crea y migra la base al importarse
+os.environ.setdefault('PAYBOOK_DATA_DIR', tempfile.mkdtemp(prefix='paybook-bench-'))
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import app as paybook  # noqa: E402
+
+PASSWORD = 'Abcdefgh1!x'
+_emails = itertools.count(1)
+
+
+def nuevo_usuario():
+    """Registra un usuario y devuelve (email, usuario_id)."""
+    email = f'bench{next(_emails)}-{os.getpid()}@paybook.test'
+    response = paybook.app.test_client().post('/api/auth/register', json={
+        'nombre': 'Bench', 'apellido': 'Usuario', 'email': email, 'password': PASSWORD
+    })
+    assert response.status_code in (200, 201), response.get_json()
+    with paybook.db_pool.connect() as conn:
+        usuario_id = conn.execute('SELECT id FROM usuarios WHERE email = ?', (email,)).fetchone()[0]
+    return email, usuario_id
+
+
+def cliente_logueado(email):
+    client = paybook.app.test_client()
+    response = client.post('/api/auth/login', json={'email': email, 'password': PASSWORD})
+    assert response.get_json().get('success'), response.get_json()
+    return client
+
+
+def crear_cajero(client, nombre='Cajero'):
+    response = client.post('/api/cajeros', json={'nombre': nombre})
+    assert response.status_code in (200, 201), response.get_json()
+    return response.get_json()['data']['id']
+
+
+def sembrar_cargas(usuario_id, cajero_id, cantidad, bloque=10000):
+    """Inserta `cantidad` cargas repartidas en los últimos días, en bloques."""
+    base = time.time() - cantidad * 60
+    with paybook.db_write_lock, paybook.db_pool.connect() as conn:
+        for inicio in range(0, cantidad, bloque):
+            filas = []
+            for i in range(inicio, min(cantidad, inicio + bloque)):
+                ts = int(base + i * 60)
+                fecha = time.strftime('%Y-%m-%d %H:%M:%S', time.gmtime(ts))
+                filas.append((usuario_id, cajero_id, 'Zeus' if i % 2 else 'Gana',
+                              100 + i % 50, fecha, ts, f'bench {i}', 0))
+            conn.executemany('''
+                INSERT INTO cargas (usuario_id, cajero_id, plataforma, monto, fecha, fecha_ts, nota, es_deuda)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+            ''', filas)
+            conn.commit()
+
+
+def memoria_pico_mb():
+    """Pico de memoria residente del proceso (ru_maxrss está en KB en Linux)."""
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
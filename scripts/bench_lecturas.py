@@ -0,0 +1,116 @@
+"""Benchmark de lecturas concurrentes (modo WAL sin lock global).
+
+Mide peticiones por segundo de las rutas de solo lectura con 1, 2, 4... hilos,
+cada uno con su propio cliente logueado. Con --db-lock el pool toma un lock
+global en cada connect() y lo suelta al devolver la conexión, como hacía el
+antiguo db_lock, para comparar contra el comportamiento anterior.
+
+El escalado depende de las CPUs disponibles: SQLite suelta el GIL mientras
+ejecuta la consulta, pero con una sola CPU los hilos no pueden correr a la vez.
+
+Uso:
+    python scripts/bench_lecturas.py [--hilos 1,2,4,8] [--segundos 5] [--cargas 5000] [--db-lock]
+"""
+import argparse
+import os
+import threading
+import time
+
+from bench_comun import cliente_logueado, crear_cajero, nuevo_usuario, paybook, sembrar_cargas
+
+RUTAS = [
+    '/api/cajeros',
+    '/api/cargas?limite=50',
+    '/api/resumen',
+    '/api/estadisticas',
+    '/api/planes',
+]
+
+
+class PoolConLockGlobal(paybook.ConnectionPool):
+    """Pool que serializa todo acceso a la base, como el db_lock anterior."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._global = threading.RLock()
+
+    def connect(self):
+        self._global.acquire()
+        try:
+            return super().connect()
+        except Exception:
+            self._global.release()
+            raise
+
+    def release(self, pooled):
+        if pooled.connection is None:
+            return
+        super().release(pooled)
+        self._global.release()
+
+
+def correr(email, hilos, segundos):
+    clientes = [cliente_logueado(email) for _ in range(hilos)]
+    contadores = [0] * hilos
+    errores = []
+    inicio = threading.Barrier(hilos + 1)
+    fin = [0.0]
+
+    def trabajar(indice):
+        client = clientes[indice]
+        inicio.wait()
+        i = indice
+        while time.monotonic() < fin[0]:
+            response = client.get(RUTAS[i % len(RUTAS)])
+            if response.status_code != 200:
+                errores.append((response.status_code, response.get_data(as_text=True)[:200]))
+            contadores[indice] += 1
+            i += 1
+
+    threads = [threading.Thread(target=trabajar, args=(i,)) for i in range(hilos)]
+    for thread in threads:
+        thread.start()
+    fin[0] = time.monotonic() + segundos
+    t0 = time.monotonic()
+    inicio.wait()
+    for thread in threads:
+        thread.join()
+    return sum(contadores) / (time.monotonic() - t0), errores
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--hilos', default='1,2,4,8')
+    parser.add_argument('--segundos', type=float, default=5)
+    parser.add_argument('--cargas', type=int, default=5000)
+    parser.add_argument('--db-lock', action='store_true', help='serializar la base como el db_lock anterior')
+    args = parser.parse_args()
+    hilos = [int(valor) for valor in args.hilos.split(',')]
+
+    if args.db_lock:
+        paybook.db_pool = PoolConLockGlobal(
+            paybook.DB_PATH, max(hilos), paybook.DB_POOL_TIMEOUT,
+            paybook.DB_STATEMENT_CACHE, paybook.DB_BUSY_TIMEOUT_MS
+        )
+    else:
+        # Una conexión por hilo, para que el pool no limite el paralelismo
+        paybook.db_pool.size = max(paybook.db_pool.size, max(hilos))
+
+    email, usuario_id = nuevo_usuario()
+    cajero_id = crear_cajero(cliente_logueado(email))
+    sembrar_cargas(usuario_id, cajero_id, args.cargas)
+
+    modo = 'lock global (anterior)' if args.db_lock else 'WAL sin lock de lectura'
+    print(f'{modo}: {args.cargas} cargas, {args.segundos:g} s por medición, CPUs: {os.cpu_count()}')
+    print(f'{"hilos":>5}  {"req/s":>9}  {"vs 1 hilo":>9}')
+    base = None
+    for cantidad in hilos:
+        throughput, errores = correr(email, cantidad, args.segundos)
+        base = base or throughput
+        print(f'{cantidad:>5}  {throughput:>9.1f}  {throughput / base:>8.2f}x')
+        if errores:
+            print(f'       {len(errores)} errores, p. ej. {errores[0]}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,63 @@
+"""Benchmark de POST /api/cargas/lote contra POST /api/cargas fila por fila.
+
+Carga las mismas N cargas de las dos formas con el cliente de pruebas de Flask,
+en proceso y sin red, así que la diferencia real en producción es mayor: cada
+POST individual paga además su viaje de red.
+
+Uso:
+    python scripts/bench_lote.py [--cargas 500] [--repeticiones 3]
+"""
+import argparse
+import time
+
+from bench_comun import cliente_logueado, crear_cajero, nuevo_usuario, paybook
+
+
+def cargas_de_prueba(cajero_id, cantidad):
+    return [
+        {'cajero_id': cajero_id, 'plataforma': 'Zeus' if i % 2 else 'Gana',
+         'monto': 100 + i % 50, 'nota': f'bench {i}'}
+        for i in range(cantidad)
+    ]
+
+
+def individuales(client, cargas):
+    for carga in cargas:
+        response = client.post('/api/cargas', json=carga)
+        assert response.status_code in (200, 201), response.get_json()
+
+
+def lote(client, cargas):
+    for inicio in range(0, len(cargas), paybook.CARGAS_LOTE_MAX):
+        response = client.post('/api/cargas/lote', json={'cargas': cargas[inicio:inicio + paybook.CARGAS_LOTE_MAX]})
+        data = response.get_json()
+        assert response.status_code in (200, 201) and not data['data']['errores'], data
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--cargas', type=int, default=500)
+    parser.add_argument('--repeticiones', type=int, default=3)
+    args = parser.parse_args()
+
+    email, _ = nuevo_usuario()
+    client = cliente_logueado(email)
+    cajero_id = crear_cajero(client)
+    cargas = cargas_de_prueba(cajero_id, args.cargas)
+
+    print(f'{args.cargas} cargas, {args.repeticiones} repeticiones')
+    print(f'{"modo":<12}  {"mejor s":>8}  {"ms/carga":>8}')
+    mejores = {}
+    for nombre, funcion in (('individual', individuales), ('lote', lote)):
+        tiempos = []
+        for _ in range(args.repeticiones):
+            inicio = time.perf_counter()
+            funcion(client, cargas)
+            tiempos.append(time.perf_counter() - inicio)
+        mejores[nombre] = min(tiempos)
+        print(f'{nombre:<12}  {mejores[nombre]:>8.3f}  {mejores[nombre] / args.cargas * 1000:>8.3f}')
+    print(f'lote es {mejores["individual"] / mejores["lote"]:.0f}x más rápido')
+
+
+if __name__ == '__main__':
+    main()
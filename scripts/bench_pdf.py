@@ -0,0 +1,98 @@
+"""Benchmark del render de PDF por cantidad de cargas.
+
+Cada tamaño corre en un proceso aparte, con su propia base temporal, para que
+el pico de memoria sea el del render y no el de la medición anterior. El tiempo
+no incluye la siembra de cargas.
+
+Con --anterior se mide el render previo a los bloques: todas las filas en una
+sola Table que ReportLab tiene que partir página por página. A partir de unas
+decenas de miles de cargas tarda varios minutos.
+
+Uso:
+    python scripts/bench_pdf.py [--cargas 10000,100000,500000] [--anterior]
+"""
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+
+def generar_pdf_tabla_unica(paybook, usuario_id, destino):
+    """Render anterior: una única Table con todas las cargas."""
+    cargas_data = []
+    for bloque in paybook.iterar_cargas_exportacion(usuario_id):
+        cargas_data.extend(bloque)
+
+    doc = paybook.SimpleDocTemplate(
+        destino,
+        pagesize=paybook.landscape(paybook.letter),
+        rightMargin=72,
+        leftMargin=72,
+        topMargin=72,
+        bottomMargin=72
+    )
+    elements = [
+        paybook.Paragraph('Reporte Paybook - Completo', paybook.PDF_TITLE_STYLE),
+        paybook.Spacer(1, 20),
+        paybook.Table([
+            ['Total Cargas:', str(len(cargas_data))],
+            ['Monto Total:', f"${sum(row[2] for row in cargas_data):.2f}"],
+        ], colWidths=[200, 200], style=paybook.PDF_TOTALES_STYLE),
+        paybook.Spacer(1, 20),
+    ]
+    data = [paybook.PDF_HEADERS]
+    data.extend(paybook.fila_pdf_carga(row) for row in cargas_data)
+    elements.append(paybook.Table(data, colWidths=paybook.PDF_COL_WIDTHS, style=paybook.PDF_CARGAS_STYLE))
+    doc.build(elements)
+
+
+def medir(cantidad, anterior):
+    from bench_comun import cliente_logueado, crear_cajero, memoria_pico_mb, nuevo_usuario, paybook, sembrar_cargas
+
+    email, usuario_id = nuevo_usuario()
+    cajero_id = crear_cajero(cliente_logueado(email))
+    sembrar_cargas(usuario_id, cajero_id, cantidad)
+    destino = os.path.join(paybook.JOBS_DIR, f'bench_{cantidad}.pdf')
+
+    memoria_inicial = memoria_pico_mb()
+    inicio = time.perf_counter()
+    if anterior:
+        generar_pdf_tabla_unica(paybook, usuario_id, destino)
+    else:
+        paybook.generar_pdf_reporte(usuario_id, None, None, 'completo', destino)
+    segundos = time.perf_counter() - inicio
+
+    print(f'{cantidad:>8}  {segundos:>9.1f}  {memoria_pico_mb():>9.0f}  {memoria_inicial:>9.0f}  '
+          f'{os.path.getsize(destino) / 1024 / 1024:>7.1f}', flush=True)
+    os.remove(destino)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--cargas', default='10000,100000,500000')
+    parser.add_argument('--anterior', action='store_true', help='medir el render de tabla única')
+    parser.add_argument('--una', type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.una is not None:
+        medir(args.una, args.anterior)
+        return
+
+    modo = 'tabla única (anterior)' if args.anterior else 'bloques con encabezado repetido'
+    print(f'Render PDF: {modo}')
+    print(f'{"cargas":>8}  {"segundos":>9}  {"pico MB":>9}  {"base MB":>9}  {"PDF MB":>7}')
+    for cantidad in args.cargas.split(','):
+        comando = [sys.executable, os.path.abspath(__file__), '--una', cantidad]
+        if args.anterior:
+            comando.append('--anterior')
+        entorno = dict(os.environ, PAYBOOK_DATA_DIR=tempfile.mkdtemp(prefix='paybook-bench-pdf-'))
+        resultado = subprocess.run(comando, env=entorno, stdout=subprocess.PIPE, text=True)
+        # Solo la fila de resultados; app.py imprime el avance de las migraciones
+        print(resultado.stdout.strip().splitlines()[-1] if resultado.returncode == 0
+              else f'{cantidad:>8}  falló (código {resultado.returncode})', flush=True)
+
+
+if __name__ == '__main__':
+    main()
@@ -4,6 +4,8 @@
 let adminStats = null;
 let pagosPendientes = [];
 let usuariosList = [];
+let usuariosNextCursor = null;
+let busquedaUsuariosTimer = null;
 let usuariosChartInstance = null;
 let ingresosChartInstance = null;
 
@@ -28,20 +30,19 @@ function getPlanLabel(plan) {
 
 // ========== FUNCIONES DEL DASHBOARD ==========
 
-async function cargarEstadisticasAdmin() {
+async function cargarEstadisticasAdmin(refrescar = false) {
     mostrarLoading(true);
     
     try {
-        // Cargar múltiples datos en paralelo
-        const [estadisticasRes, pagosRes, usuariosRes] = await Promise.all([
-            fetch('/api/estadisticas/admin'),
-            fetch('/api/admin/pagos/pendientes'),
-            fetch('/api/admin/usuarios')
+        // Las métricas vienen cacheadas; después de una acción se piden recalculadas.
+        // Los totales de usuarios vienen en las métricas, no hace falta el listado.
+        const [estadisticasRes, pagosRes] = await Promise.all([
+            fetch(`/api/estadisticas/admin${refrescar ? '?refrescar=1' : ''}`),
+            fetch('/api/admin/pagos/pendientes')
         ]);
         
         const estadisticasData = await estadisticasRes.json();
         const pagosData = await pagosRes.json();
-        const usuariosData = await usuariosRes.json();
         
         if (estadisticasData.success) {
             adminStats = estadisticasData.data;
@@ -56,12 +57,6 @@ async function cargarEstadisticasAdmin() {
             actualizarContadorPagos(pagosData.data.length);
         }
         
-        if (usuariosData.success) {
-            usuariosList = usuariosData.data;
-            actualizarContadorUsuarios(usuariosData.data.length);
-            actualizarEstadisticasUsuarios(usuariosData.data);
-        }
-        
     } catch (error) {
         console.error('Error cargando estadísticas admin:', error);
         mostrarAlertaAdmin('Error', 'No se pudieron cargar las estadísticas', 'error');
@@ -108,25 +103,6 @@ function actualizarContadorUsuarios(count) {
     }
 }
 
-function actualizarEstadisticasUsuarios(usuarios) {
-    if (!Array.isArray(usuarios)) return;
-
-    const total = usuarios.length;
-    const activos = usuarios.filter(usuario => usuario.activo).length;
-
-    const totalEl = document.getElementById('adminTotalUsuarios');
-    if (totalEl) {
-        totalEl.textContent = total;
-    }
-
-    const activosEl = document.getElementById('adminUsuariosActivos');
-    if (activosEl) {
-        activosEl.textContent = activos;
-    }
-
-    actualizarContadorUsuarios(total);
-}
-
 function actualizarTablaEstadisticas(stats) {
     const tbody = document.getElementById('estadisticasTable');
     if (!tbody) return;
@@ -286,7 +262,7 @@ async function verificarPagoAdmin(codigo) {
             // Recargar pagos pendientes
             await cargarPagosPendientes();
             // Recargar estadísticas
-            await cargarEstadisticasAdmin();
+            await cargarEstadisticasAdmin(true);
         } else {
             mostrarAlertaAdmin('Error', data.error || 'No se pudo verificar el pago', 'error');
         }
@@ -427,17 +403,46 @@ function verDetallesPago(codigo) {
 
 // ========== GESTIÓN DE USUARIOS ==========
 
-async function cargarUsuarios() {
+function parametrosFiltroUsuarios() {
+    const params = new URLSearchParams();
+    const termino = (document.getElementById('buscarUsuario')?.value || '').trim();
+    const plan = document.getElementById('filtroUsuarioPlan')?.value || '';
+    const estado = document.getElementById('filtroUsuarioEstado')?.value || '';
+    const expiracion = document.getElementById('filtroUsuarioExpiracion')?.value || '';
+    
+    if (termino) params.set('q', termino);
+    if (plan) params.set('plan', plan);
+    if (estado) params.set('activo', estado);
+    
+    // Vencidos se compara en el servidor contra la hora actual; por vencer en
+    // N días son los aún vigentes que expiran antes del límite
+    if (expiracion === 'vencidos') {
+        params.set('vencidos', '1');
+    } else if (expiracion) {
+        const limite = new Date();
+        limite.setDate(limite.getDate() + parseInt(expiracion, 10));
+        params.set('vencidos', '0');
+        params.set('expira_hasta', limite.toISOString().slice(0, 10));
+    }
+    return params;
+}
+
+async function cargarUsuarios(continuar = false) {
     mostrarLoading(true);
     
     try {
-        const response = await fetch('/api/admin/usuarios');
+        // El servidor filtra y pagina; "Cargar más" pide la página siguiente
+        const params = parametrosFiltroUsuarios();
+        if (continuar && usuariosNextCursor) {
+            params.set('cursor', usuariosNextCursor);
+        }
+        const response = await fetch(`/api/admin/usuarios?${params.toString()}`);
         const data = await response.json();
         
         if (data.success) {
-            usuariosList = data.data;
-            actualizarTablaUsuarios(data.data);
-            actualizarContadorUsuarios(data.data.length);
+            usuariosList = continuar ? usuariosList.concat(data.data) : data.data;
+            usuariosNextCursor = data.next_cursor;
+            actualizarTablaUsuarios(usuariosList);
         } else {
             mostrarAlertaAdmin('Error', data.error || 'No se pudieron cargar los usuarios', 'error');
         }
@@ -449,18 +454,29 @@ async function cargarUsuarios() {
     }
 }
 
+function cargarMasUsuarios() {
+    if (usuariosNextCursor) {
+        cargarUsuarios(true);
+    }
+}
+
 function actualizarTablaUsuarios(usuarios) {
     const tbody = document.getElementById('adminUsuariosTable');
     if (!tbody) return;
     
+    const cargarMasBtn = document.getElementById('cargarMasUsuarios');
+    if (cargarMasBtn) {
+        cargarMasBtn.style.display = usuariosNextCursor ? '' : 'none';
+    }
+    
     if (usuarios.length === 0) {
         tbody.innerHTML = `
             <tr>
-                <td colspan="8" class="text-center text-muted py-5">
+                <td colspan="9" class="text-center text-muted py-5">
                     <div class="mb-3">
                         <i class="fa-solid fa-users fa-2x text-muted"></i>
                     </div>
-                    <h6>No hay usuarios registrados</h6>
+                    <h6>No se encontraron usuarios</h6>
                 </td>
             </tr>
         `;
@@ -492,6 +508,8 @@ function actualizarTablaUsuarios(usuarios) {
         if (normalizePlanValue(usuario.plan) === 'pro') planClass = 'text-warning';
         if (usuario.plan === 'admin') planClass = 'text-danger';
         
+        const stats = usuario.estadisticas;
+        
         html += `
             <tr>
                 <td>${usuario.id}</td>
@@ -517,6 +535,13 @@ function actualizarTablaUsuarios(usuarios) {
                     <small>${fechaRegistro.toLocaleDateString()}</small>
                 </td>
                 <td>${estadoBadge}</td>
+                <td>
+                    ${stats ? `
+                        <div>${stats.total_cargas} cargas · ${stats.cajeros_activos} cajeros</div>
+                        <div class="text-muted smaller">Pendiente $${stats.total_pendiente}</div>
+                        <div class="text-muted smaller">${stats.ultima_actividad}</div>
+                    ` : '--'}
+                </td>
                 <td>
                     <div class="btn-group btn-group-sm">
                         <button class="btn btn-outline-primary" onclick="editarUsuario(${usuario.id})" title="Editar">
@@ -539,20 +564,10 @@ function actualizarTablaUsuarios(usuarios) {
     tbody.innerHTML = html;
 }
 
-function buscarUsuarios(termino) {
-    if (!termino.trim()) {
-        actualizarTablaUsuarios(usuariosList);
-        return;
-    }
-    
-    termino = termino.toLowerCase();
-    const usuariosFiltrados = usuariosList.filter(usuario => 
-        usuario.email.toLowerCase().includes(termino) ||
-        (usuario.nombre && usuario.nombre.toLowerCase().includes(termino)) ||
-        usuario.plan.toLowerCase().includes(termino)
-    );
-    
-    actualizarTablaUsuarios(usuariosFiltrados);
+function buscarUsuarios() {
+    // La búsqueda va al servidor; se espera a que el admin deje de escribir
+    clearTimeout(busquedaUsuariosTimer);
+    busquedaUsuariosTimer = setTimeout(() => cargarUsuarios(), 300);
 }
 
 async function verUsuario(id) {
@@ -1043,9 +1058,35 @@ function crearUsuarioAdmin() {
     alert('Función en desarrollo: Crear usuario desde admin');
 }
 
-function generarReporteAdmin() {
-    // Generar reporte administrativo
-    window.open('/api/exportar/pdf?tipo_reporte=admin', '_blank');
+async function generarReporteAdmin() {
+    // El PDF se genera en segundo plano; se consulta el estado hasta que esté listo
+    mostrarLoading(true);
+    
+    try {
+        const response = await fetch('/api/exportar/pdf', {
+            method: 'POST',
+            headers: { 'Content-Type': 'application/json' },
+            body: JSON.stringify({ tipo_reporte: 'admin' })
+        });
+        let data = await response.json();
+        
+        while (data.success && ['pendiente', 'procesando'].includes(data.data.estado)) {
+            await new Promise(resolve => setTimeout(resolve, 1000));
+            const estadoResponse = await fetch(data.data.status_url);
+            data = await estadoResponse.json();
+        }
+        
+        if (data.success && data.data.estado === 'listo') {
+            window.open(data.data.download_url, '_blank');
+        } else {
+            mostrarAlertaAdmin('Error', (data.data && data.data.error) || data.error || 'No se pudo generar el reporte', 'error');
+        }
+    } catch (error) {
+        console.error('Error generando reporte:', error);
+        mostrarAlertaAdmin('Error', 'No se pudo generar el reporte', 'error');
+    } finally {
+        mostrarLoading(false);
+    }
 }
 
 async function enviarRecordatorios() {
@@ -1094,7 +1135,7 @@ async function crearBackup() {
         if (data.success) {
             mostrarAlertaAdmin('¡Éxito!', 'Backup creado correctamente', 'success');
             await cargarHistorialBackups();
-            await cargarEstadisticasAdmin();
+            await cargarEstadisticasAdmin(true);
 
             // Ofrecer descarga si hay URL
             if (data.data && data.data.download_url) {
@@ -1268,7 +1309,7 @@ async function restaurarBackupPorNombre(filename) {
         if (data.success) {
             mostrarAlertaAdmin('¡Éxito!', data.message || 'Backup restaurado correctamente', 'success');
             await cargarHistorialBackups();
-            await cargarEstadisticasAdmin();
+            await cargarEstadisticasAdmin(true);
         } else {
             mostrarAlertaAdmin('Error', data.error || 'No se pudo restaurar el backup', 'error');
         }
@@ -1437,6 +1478,7 @@ window.verificarPagoAdmin = verificarPagoAdmin;
 window.rechazarPagoAdmin = rechazarPagoAdmin;
 window.verDetallesPago = verDetallesPago;
 window.buscarUsuarios = buscarUsuarios;
+window.cargarMasUsuarios = cargarMasUsuarios;
 window.verUsuario = verUsuario;
 window.editarUsuario = editarUsuario;
 window.activarUsuario = activarUsuario;
@@ -13,6 +13,14 @@ let configuracion = {};
 let planesConfig = null;
 let isLoading = false;
 
+// Identifica las escrituras de esta pestaña para ignorar su eco por SSE
+const PESTANA_ID = (window.crypto && crypto.randomUUID)
+    ? crypto.randomUUID()
+    : `${Date.now()}-${Math.random().toString(36).slice(2)}`;
+
+// Filtro o búsqueda aplicados a la tabla de cargas; los refrescos los repiten
+let filtroCargas = { texto: '', fechaInicio: null, fechaFin: null };
+
 function buildFallbackPlanesConfig() {
     return {
         lite: {
@@ -766,7 +774,7 @@ async function cargarDatosIniciales() {
     try {
         const [cajerosData, cargasData, resumenData, estadisticasData] = await Promise.allSettled([
             cargarCajeros(),
-            cargarCargas(),
+            cargarCargasVisibles(),
             cargarResumen(),
             cargarEstadisticas()
         ]);
@@ -801,6 +809,93 @@ function actualizarTodaLaUI() {
     actualizarContadores();
 }
 
+// ========== TIEMPO REAL (SSE) ==========
+const REFRESCO_SIN_TIEMPO_REAL_MS = 30000;
+const REINTENTO_TIEMPO_REAL_MS = 60000;
+let eventosTiempoReal = null;
+let refrescoTiempoRealTimer = null;
+let refrescoPeriodicoTimer = null;
+let reintentoTiempoRealTimer = null;
+
+function iniciarEventosTiempoReal() {
+    if (eventosTiempoReal) return;
+    if (!window.EventSource) {
+        activarRefrescoPeriodico();
+        return;
+    }
+
+    // EventSource reconecta solo y manda Last-Event-ID para no perder eventos
+    eventosTiempoReal = new EventSource(`${API_BASE}/api/eventos`);
+
+    eventosTiempoReal.onopen = () => {
+        if (refrescoPeriodicoTimer) {
+            // Volvió el tiempo real: lo que pasó mientras tanto se trae de una vez
+            clearInterval(refrescoPeriodicoTimer);
+            refrescoPeriodicoTimer = null;
+            programarRefrescoTiempoReal();
+        }
+    };
+
+    ['carga_creada', 'cargas_creadas', 'cargas_importadas', 'carga_eliminada', 'pago_registrado', 'pagos_registrados'].forEach(tipo => {
+        eventosTiempoReal.addEventListener(tipo, evento => {
+            // Esta pestaña ya recargó después de su propia escritura
+            if (esEventoPropio(evento)) return;
+            programarRefrescoTiempoReal();
+        });
+    });
+
+    eventosTiempoReal.addEventListener('plan_actualizado', async () => {
+        if (typeof verifyAuth === 'function') {
+            await verifyAuth();
+        }
+        if (typeof cargarDatosUsuario === 'function') cargarDatosUsuario();
+        if (typeof actualizarEstadoSuscripcion === 'function') actualizarEstadoSuscripcion();
+    });
+
+    eventosTiempoReal.onerror = () => {
+        // El navegador no reintenta si el servidor rechazó la conexión (p. ej. 503
+        // por cupo lleno): se pasa a refresco periódico y se reintenta más tarde
+        if (eventosTiempoReal.readyState === EventSource.CLOSED) {
+            eventosTiempoReal = null;
+            activarRefrescoPeriodico();
+            clearTimeout(reintentoTiempoRealTimer);
+            reintentoTiempoRealTimer = setTimeout(iniciarEventosTiempoReal, REINTENTO_TIEMPO_REAL_MS);
+        }
+    };
+}
+
+function esEventoPropio(evento) {
+    try {
+        return JSON.parse(evento.data || '{}').origen === PESTANA_ID;
+    } catch (error) {
+        return false;
+    }
+}
+
+function activarRefrescoPeriodico() {
+    if (refrescoPeriodicoTimer) return;
+    // Las rutas responden 304 si nada cambió, así que el sondeo es barato
+    refrescoPeriodicoTimer = setInterval(programarRefrescoTiempoReal, REFRESCO_SIN_TIEMPO_REAL_MS);
+}
+
+function programarRefrescoTiempoReal() {
+    // Agrupa ráfagas de eventos en un solo refresco; las rutas responden 304 si nada cambió
+    clearTimeout(refrescoTiempoRealTimer);
+    refrescoTiempoRealTimer = setTimeout(async () => {
+        const [cargasData, resumenData, estadisticasData] = await Promise.allSettled([
+            cargarCargasVisibles(),
+            cargarResumen(),
+            cargarEstadisticas()
+        ]);
+
+        if (cargasData.status === 'fulfilled') cargas = cargasData.value || [];
+        if (resumenData.status === 'fulfilled') resumen = resumenData.value || [];
+        if (estadisticasData.status === 'fulfilled') estadisticas = estadisticasData.value || {};
+
+        actualizarTodaLaUI();
+    }, 300);
+}
+
 // ========== CAJEROS MANAGEMENT ==========
 async function cargarCajeros() {
     try {
@@ -1167,6 +1262,35 @@ async function cargarCargas(fechaInicio = null, fechaFin = null) {
     }
 }
 
+// Vuelve a pedir lo que muestra la tabla: la búsqueda o el rango activos, o todo
+function cargarCargasVisibles(filtro = filtroCargas) {
+    const { texto, fechaInicio, fechaFin } = filtro;
+    if (texto) return buscarCargas(texto, fechaInicio, fechaFin);
+    return cargarCargas(fechaInicio, fechaFin);
+}
+
+async function buscarCargas(texto, fechaInicio = null, fechaFin = null) {
+    try {
+        const params = new URLSearchParams({ q: texto });
+        if (fechaInicio && fechaFin) {
+            params.set('fecha_inicio', fechaInicio);
+            params.set('fecha_fin', fechaFin);
+        }
+        
+        const response = await fetch(`${API_BASE}/api/cargas/buscar?${params.toString()}`);
+        const data = await response.json();
+        
+        if (data.success) {
+            return data.data || [];
+        } else {
+            throw new Error(data.error || 'Error desconocido');
+        }
+    } catch (error) {
+        console.error('❌ Error buscando cargas:', error);
+        throw error;
+    }
+}
+
 function actualizarTablaCargas() {
     const tbody = document.getElementById('tablaCargas');
     if (!tbody) return;
@@ -1351,7 +1475,8 @@ async function agregarCarga() {
             method: 'POST',
             headers: { 
                 'Content-Type': 'application/json',
-                'Accept': 'application/json'
+                'Accept': 'application/json',
+                'X-Pestana-Id': PESTANA_ID
             },
             body: JSON.stringify({
                 cajero_id: parseInt(cajeroId),
@@ -1374,7 +1499,7 @@ async function agregarCarga() {
             
             // Recargar datos en paralelo
             const [nuevasCargas, nuevoResumen, nuevasEstadisticas] = await Promise.all([
-                cargarCargas(),
+                cargarCargasVisibles(),
                 cargarResumen(),
                 cargarEstadisticas()
             ]);
@@ -1413,7 +1538,8 @@ async function eliminarCarga(id) {
     
     try {
         const response = await fetch(`${API_BASE}/api/cargas/${id}`, {
-            method: 'DELETE'
+            method: 'DELETE',
+            headers: { 'X-Pestana-Id': PESTANA_ID }
         });
         
         const data = await response.json();
@@ -1423,7 +1549,7 @@ async function eliminarCarga(id) {
             
             // Recargar datos
             const [nuevasCargas, nuevoResumen, nuevasEstadisticas] = await Promise.all([
-                cargarCargas(),
+                cargarCargasVisibles(),
                 cargarResumen(),
                 cargarEstadisticas()
             ]);
@@ -2074,7 +2200,8 @@ async function pagarCajero(cajeroId, cajeroNombre) {
             method: 'POST',
             headers: { 
                 'Content-Type': 'application/json',
-                'Accept': 'application/json'
+                'Accept': 'application/json',
+                'X-Pestana-Id': PESTANA_ID
             },
             body: JSON.stringify({
                 cajero_id: cajeroId,
@@ -2093,7 +2220,7 @@ async function pagarCajero(cajeroId, cajeroNombre) {
             // Recargar datos
             const [nuevoResumen, nuevasCargas, nuevasEstadisticas] = await Promise.all([
                 cargarResumen(),
-                cargarCargas(),
+                cargarCargasVisibles(),
                 cargarEstadisticas()
             ]);
             
@@ -2215,21 +2342,50 @@ async function verPendientes() {
     }
 }
 
+// Encola el PDF en el servidor y espera a que termine; devuelve la URL de descarga
+async function generarPdfEnServidor(params) {
+    const response = await fetch(`${API_BASE}/api/exportar/pdf`, {
+        method: 'POST',
+        headers: { 'Content-Type': 'application/json' },
+        body: JSON.stringify(params)
+    });
+    let data = await response.json();
+    if (!data.success) {
+        throw new Error(data.error || 'No se pudo exportar');
+    }
+    
+    let job = data.data;
+    while (job.estado === 'pendiente' || job.estado === 'procesando') {
+        await new Promise(resolve => setTimeout(resolve, 1000));
+        const estadoResponse = await fetch(`${API_BASE}${job.status_url}`);
+        data = await estadoResponse.json();
+        if (!data.success) {
+            throw new Error(data.error || 'No se pudo exportar');
+        }
+        job = data.data;
+    }
+    
+    if (job.estado !== 'listo') {
+        throw new Error(job.error || 'No se pudo generar el reporte');
+    }
+    return `${API_BASE}${job.download_url}`;
+}
+
 async function exportarReporte() {
     const fechaInicio = document.getElementById('fechaInicio').value;
     const fechaFin = document.getElementById('fechaFin').value;
     
-    let url = `${API_BASE}/api/exportar/pdf`;
+    const params = { tipo_reporte: 'general' };
     
     if (fechaInicio && fechaFin) {
-        url += `?fecha_inicio=${encodeURIComponent(fechaInicio)}&fecha_fin=${encodeURIComponent(fechaFin)}&tipo_reporte=general`;
-    } else {
-        url += '?tipo_reporte=general';
+        params.fecha_inicio = fechaInicio;
+        params.fecha_fin = fechaFin;
     }
     
     mostrarLoading(true);
     
     try {
+        const url = await generarPdfEnServidor(params);
         const response = await fetch(url);
         
         if (response.ok) {
@@ -2275,7 +2431,7 @@ async function agregarCargaDesdeModal() {
     try {
         const response = await fetch(`${API_BASE}/api/cargas`, {
             method: 'POST',
-            headers: { 'Content-Type': 'application/json' },
+            headers: { 'Content-Type': 'application/json', 'X-Pestana-Id': PESTANA_ID },
             body: JSON.stringify({
                 cajero_id: parseInt(cajeroId, 10),
                 plataforma,
@@ -2304,9 +2460,9 @@ async function agregarCargaDesdeModal() {
 }
 
 async function descargarReporte(tipo) {
-    const url = `${API_BASE}/api/exportar/pdf?tipo_reporte=${encodeURIComponent(tipo)}`;
     mostrarLoading(true);
     try {
+        const url = await generarPdfEnServidor({ tipo_reporte: tipo });
         const response = await fetch(url);
         if (response.ok) {
             const blob = await response.blob();
@@ -2351,10 +2507,11 @@ window.editarCajero = editarCajero;
 window.eliminarCajero = eliminarCajero;
 window.eliminarCarga = eliminarCarga;
 window.filtrarCargas = async function() {
+    const texto = document.getElementById('buscarCargasTexto').value.trim();
     const fechaInicio = document.getElementById('fechaInicio').value;
     const fechaFin = document.getElementById('fechaFin').value;
     
-    if (!fechaInicio || !fechaFin) {
+    if (!texto && (!fechaInicio || !fechaFin)) {
         mostrarAlerta('Fechas incompletas', 'Debe seleccionar ambas fechas', 'warning');
         return;
     }
@@ -2362,7 +2519,24 @@ window.filtrarCargas = async function() {
     mostrarLoading(true);
     
     try {
-        cargas = await cargarCargas(fechaInicio, fechaFin);
+        const rango = fechaInicio && fechaFin;
+        const filtro = {
+            texto,
+            fechaInicio: rango ? fechaInicio : null,
+            fechaFin: rango ? fechaFin : null
+        };
+        // La búsqueda por texto la resuelve el servidor (índice FTS)
+        cargas = await cargarCargasVisibles(filtro);
+        filtroCargas = filtro;
+        
+        if (texto) {
+            actualizarTablaCargas();
+            mostrarAlerta('Búsqueda aplicada', 
+                `${cargas.length} cargas coinciden con "${texto}"`, 
+                'info');
+            return;
+        }
+        
         actualizarTablaCargas();
         
         const inicio = new Date(fechaInicio).toLocaleDateString('es-ES');
@@ -2378,13 +2552,15 @@ window.filtrarCargas = async function() {
 };
 
 window.limpiarFiltro = async function() {
+    document.getElementById('buscarCargasTexto').value = '';
     document.getElementById('fechaInicio').value = '';
     document.getElementById('fechaFin').value = '';
+    filtroCargas = { texto: '', fechaInicio: null, fechaFin: null };
     
     mostrarLoading(true);
     
     try {
-        cargas = await cargarCargas();
+        cargas = await cargarCargasVisibles();
         actualizarTablaCargas();
         mostrarAlerta('Filtro limpiado', 'Mostrando todas las cargas', 'info');
     } catch (error) {
@@ -0,0 +1,48 @@
+import itertools
+import os
+import sys
+import tempfile
+
+import pytest
+
+# app.py crea y migra la base al importarse: se apunta a un directorio
+# temporal antes de importarlo para no tocar database.db del proyecto.
+os.environ.setdefault('PAYBOOK_DATA_DIR', tempfile.mkdtemp(prefix='paybook-tests-'))
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import app as paybook  # noqa: E402
+
+PASSWORD = 'Abcdefgh1!x'
+_emails = itertools.count(1)
+
+
+def nuevo_cliente():
+    """Cliente de pruebas con un usuario recién registrado y logueado."""
+    client = paybook.app.test_client()
+    email = f'test{next(_emails)}@paybook.test'
+    response = client.post('/api/auth/register', json={
+        'nombre': 'Test', 'apellido': 'Usuario', 'email': email, 'password': PASSWORD
+    })
+    assert response.status_code in (200, 201), response.get_json()
+    if not client.get('/api/auth/me').get_json().get('success'):
+        client.post('/api/auth/login', json={'email': email, 'password': PASSWORD})
+    client.email = email
+    return client
+
+
+@pytest.fixture
+def cliente():
+    return nuevo_cliente()
+
+
+def crear_cajero(client, nombre='Cajero'):
+    response = client.post('/api/cajeros', json={'nombre': nombre})
+    assert response.status_code in (200, 201), response.get_json()
+    return response.get_json()['data']['id']
+
+
+def hacer_admin(client):
+    with paybook.db_pool.connect() as conn:
+        conn.execute("UPDATE usuarios SET rol = 'admin' WHERE email = ?", (client.email,))
+        conn.commit()
+    paybook.user_cache.invalidate()
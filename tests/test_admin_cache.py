@@ -0,0 +1,23 @@
+"""Limpiar la cache solo borra exportaciones, nunca trabajos en curso."""
+import time
+
+from conftest import crear_cajero, hacer_admin, paybook
+
+
+def test_limpiar_cache_conserva_trabajos_en_curso(cliente):
+    hacer_admin(cliente)
+    cajero_id = crear_cajero(cliente)
+    cliente.post('/api/cargas', json={'cajero_id': cajero_id, 'plataforma': 'Zeus', 'monto': 10})
+    response = cliente.get('/api/exportar/excel')
+    response.get_data()
+    response.close()
+    assert paybook.export_cache.stats()['archivos'] > 0
+
+    job = {'id': 'trabajo-en-curso-0001', 'estado': 'procesando', 'tipo_reporte': 'completo',
+           'creado': '', 'creado_ts': time.time()}
+    paybook.guardar_pdf_job(job)
+
+    data = cliente.post('/api/admin/cache/limpiar').get_json()
+    assert data['success'], data
+    assert paybook.export_cache.stats()['archivos'] == 0
+    assert paybook.cargar_pdf_job(job['id'])['estado'] == 'procesando'
@@ -0,0 +1,62 @@
+"""Filtros y paginación de /api/admin/usuarios."""
+from datetime import datetime, timedelta
+
+from conftest import nuevo_cliente, paybook
+
+
+def test_vencidos_incluye_expiraciones_de_hoy_ya_pasadas(cliente):
+    ahora = datetime.now()
+    expiraciones = {
+        'hace_una_hora': ahora - timedelta(hours=1),
+        'en_una_hora': ahora + timedelta(hours=1),
+        'en_tres_dias': ahora + timedelta(days=3),
+    }
+    emails = {clave: nuevo_cliente().email for clave in expiraciones}
+    with paybook.db_pool.connect() as conn:
+        conn.execute("UPDATE usuarios SET rol = 'admin' WHERE email = ?", (cliente.email,))
+        for clave, fecha in expiraciones.items():
+            conn.execute('UPDATE usuarios SET fecha_expiracion = ? WHERE email = ?',
+                         (fecha.strftime('%Y-%m-%d %H:%M:%S'), emails[clave]))
+        conn.commit()
+    paybook.user_cache.invalidate()
+
+    def listar(**params):
+        data = cliente.get('/api/admin/usuarios', query_string=params).get_json()
+        assert data['success'], data
+        return {u['email'] for u in data['data']} & set(emails.values())
+
+    assert listar(vencidos=1) == {emails['hace_una_hora']}
+    assert listar(vencidos=0, expira_hasta=(ahora + timedelta(days=1)).strftime('%Y-%m-%d')) == {
+        emails['en_una_hora']
+    }
+    assert cliente.get('/api/admin/usuarios?vencidos=si').status_code == 400
+
+
+def test_paginacion_incluye_usuarios_sin_fecha_registro(cliente):
+    sin_fecha = [nuevo_cliente().email for _ in range(3)]
+    with paybook.db_pool.connect() as conn:
+        conn.execute("UPDATE usuarios SET rol = 'admin' WHERE email = ?", (cliente.email,))
+        conn.executemany('UPDATE usuarios SET fecha_registro = NULL WHERE email = ?',
+                         [(email,) for email in sin_fecha])
+        conn.commit()
+        total = conn.execute('SELECT COUNT(*) FROM usuarios').fetchone()[0]
+        plan = ' '.join(row[3] for row in conn.execute('''
+            EXPLAIN QUERY PLAN SELECT id FROM usuarios
+            WHERE (COALESCE(fecha_registro, ''), id) < ('9', 0)
+            ORDER BY COALESCE(fecha_registro, '') DESC, id DESC LIMIT 3
+        '''))
+    paybook.user_cache.invalidate()
+    assert 'idx_usuarios_registro_orden' in plan and 'TEMP B-TREE' not in plan
+
+    vistos, cursor = [], None
+    while True:
+        params = {'limite': 2}
+        if cursor:
+            params['cursor'] = cursor
+        data = cliente.get('/api/admin/usuarios', query_string=params).get_json()
+        vistos.extend(usuario['email'] for usuario in data['data'])
+        cursor = data['next_cursor']
+        if not cursor:
+            break
+    assert len(vistos) == len(set(vistos)) == total
+    assert set(sin_fecha) <= set(vistos)
@@ -0,0 +1,53 @@
+"""Restaurar un backup no puede hacer retroceder versiones ni dejar caches viejas."""
+from conftest import crear_cajero, hacer_admin, paybook
+
+
+def version_sistema(clave):
+    with paybook.db_pool.connect() as conn:
+        row = conn.execute('SELECT version FROM versiones_sistema WHERE clave = ?', (clave,)).fetchone()
+    return row[0] if row else 0
+
+
+def ultimo_evento():
+    with paybook.db_pool.connect() as conn:
+        return conn.execute('SELECT COALESCE(MAX(id), 0) FROM eventos_usuario').fetchone()[0]
+
+
+def test_restaurar_no_repite_etags_ni_versiones(cliente):
+    hacer_admin(cliente)
+    cajero_id = crear_cajero(cliente)
+    backup = cliente.post('/api/admin/backup/crear').get_json()['data']['backup']['filename']
+
+    nueva_carga = {'cajero_id': cajero_id, 'plataforma': 'Zeus', 'monto': 10}
+    cliente.post('/api/cargas', json=nueva_carga)
+    etag_previo = cliente.get('/api/cajeros').headers['ETag']
+    config_previa = version_sistema('configuraciones')
+    evento_previo = ultimo_evento()
+
+    response = cliente.post('/api/admin/backup/restaurar', json={'filename': backup})
+    assert response.get_json()['success'], response.get_json()
+
+    # Misma cantidad de escrituras que antes del restore: sin reanudar las
+    # versiones el ETag volvería a coincidir con datos distintos
+    cliente.post('/api/cargas', json=nueva_carga)
+    assert cliente.get('/api/cajeros').headers['ETag'] != etag_previo
+    assert version_sistema('configuraciones') > config_previa
+    # Los ids de eventos siguen creciendo: un Last-Event-ID viejo no tapa los nuevos
+    assert ultimo_evento() > evento_previo
+
+
+def test_restaurar_borra_exportaciones_cacheadas(cliente):
+    hacer_admin(cliente)
+    cajero_id = crear_cajero(cliente)
+    cliente.post('/api/cargas', json={'cajero_id': cajero_id, 'plataforma': 'Zeus', 'monto': 10})
+    backup = cliente.post('/api/admin/backup/crear').get_json()['data']['backup']['filename']
+
+    # El CSV se guarda en la cache cuando termina de enviarse
+    response = cliente.get('/api/exportar/excel')
+    assert response.status_code == 200
+    response.get_data()
+    response.close()
+    assert paybook.export_cache.stats()['archivos'] > 0
+
+    cliente.post('/api/admin/backup/restaurar', json={'filename': backup})
+    assert paybook.export_cache.stats()['archivos'] == 0
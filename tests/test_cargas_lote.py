@@ -0,0 +1,43 @@
+"""Validación de entrada de POST /api/cargas/lote."""
+import pytest
+
+from conftest import crear_cajero
+
+
+@pytest.mark.parametrize('kwargs', [
+    {},
+    {'data': 'no es json', 'content_type': 'text/plain'},
+    {'data': '{roto', 'content_type': 'application/json'},
+    {'json': {'cargas': 'x'}},
+    {'json': []},
+])
+def test_cuerpo_invalido_devuelve_400(cliente, kwargs):
+    response = cliente.post('/api/cargas/lote', **kwargs)
+    assert response.status_code == 400
+    assert response.get_json() == {'success': False, 'error': 'Se requiere una lista de cargas'}
+
+
+def test_lote_valido(cliente):
+    cajero_id = crear_cajero(cliente)
+    response = cliente.post('/api/cargas/lote', json={'cargas': [
+        {'cajero_id': cajero_id, 'plataforma': 'Zeus', 'monto': 5},
+        {'cajero_id': cajero_id, 'plataforma': 'Zeus', 'monto': 'x'},
+    ]})
+    data = response.get_json()
+    assert data['success']
+    assert [resultado['success'] for resultado in data['data']['resultados']] == [True, False]
+
+
+def test_nota_o_plataforma_no_texto_es_error_de_la_fila(cliente):
+    cajero_id = crear_cajero(cliente)
+    response = cliente.post('/api/cargas/lote', json={'cargas': [
+        {'cajero_id': cajero_id, 'plataforma': 'Zeus', 'monto': 5, 'nota': 123},
+        {'cajero_id': cajero_id, 'plataforma': 'Zeus', 'monto': 5, 'nota': ['x']},
+        {'cajero_id': cajero_id, 'plataforma': {'nombre': 'Zeus'}, 'monto': 5},
+        {'cajero_id': cajero_id, 'plataforma': 'Zeus', 'monto': 5, 'nota': 'ok'},
+    ]})
+    assert response.status_code == 200
+    resultados = response.get_json()['data']['resultados']
+    assert [resultado['success'] for resultado in resultados] == [False, False, False, True]
+    assert resultados[0]['error'] == 'La nota debe ser texto'
+    assert resultados[2]['error'] == 'La plataforma debe ser texto'
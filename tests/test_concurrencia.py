@@ -0,0 +1,102 @@
+"""Escrituras concurrentes a través de db_pool y db_write_lock.
+
+Varios hilos (como los threads de un worker de gunicorn) escriben por la API
+mientras otro pool independiente, que hace de segundo worker, escribe directo
+en la base. Nada debe fallar con "database is locked" y las tablas mantenidas
+por triggers tienen que coincidir con lo recalculado desde cargas.
+"""
+import threading
+import time
+
+from conftest import crear_cajero, nuevo_cliente, paybook
+
+HILOS = 6
+OPERACIONES = 30
+
+
+def test_escrituras_concurrentes_sin_bloqueos_y_consistentes():
+    clientes = [nuevo_cliente() for _ in range(HILOS)]
+    cajeros = [crear_cajero(client, f'Cajero {i}') for i, client in enumerate(clientes)]
+    errores = []
+    barrera = threading.Barrier(HILOS + 1)
+
+    def trabajar(client, cajero_id):
+        barrera.wait()
+        for i in range(OPERACIONES):
+            if i % 10 == 9:
+                response = client.post('/api/pagos', json={'cajero_id': cajero_id})
+            elif i % 7 == 6:
+                response = client.post('/api/cargas/lote', json={'cargas': [
+                    {'cajero_id': cajero_id, 'plataforma': 'Zeus', 'monto': 2, 'nota': 'lote'}
+                ] * 5})
+            else:
+                response = client.post('/api/cargas', json={
+                    'cajero_id': cajero_id, 'plataforma': 'Zeus' if i % 2 else 'Ganamos',
+                    'monto': -3 if i % 5 == 4 else 10
+                })
+            if response.status_code >= 300:
+                errores.append(response.get_json())
+
+    # Segundo "worker": su propio pool sobre el mismo archivo, sin db_write_lock
+    otro_pool = paybook.ConnectionPool(paybook.DB_PATH, size=1, busy_timeout_ms=paybook.DB_BUSY_TIMEOUT_MS)
+    usuario_externo = clientes[0].get('/api/auth/me').get_json()['user']['id']
+
+    def otro_worker():
+        barrera.wait()
+        for i in range(OPERACIONES):
+            try:
+                with otro_pool.connect() as conn:
+                    fecha = '2026-01-01 12:00:00'
+                    # Transacción de escritura que dura un poco, para que los
+                    # hilos de la API tengan que esperar por busy_timeout
+                    conn.execute('BEGIN IMMEDIATE')
+                    conn.execute('''
+                        INSERT INTO cargas (usuario_id, cajero_id, plataforma, monto, fecha, fecha_ts, pagado)
+                        VALUES (?, ?, 'Zeus', 1, ?, ?, 0)
+                    ''', (usuario_externo, cajeros[0], fecha, paybook.fecha_a_ts(fecha)))
+                    time.sleep(0.005)
+                    conn.commit()
+            except Exception as e:
+                errores.append(str(e))
+
+    hilos = [threading.Thread(target=trabajar, args=par) for par in zip(clientes, cajeros)]
+    hilos.append(threading.Thread(target=otro_worker))
+    for hilo in hilos:
+        hilo.start()
+    for hilo in hilos:
+        hilo.join(timeout=120)
+
+    # Cualquier "database is locked" habría llegado acá como error
+    assert errores == []
+
+    with paybook.db_pool.connect() as conn:
+        cursor = conn.cursor()
+        cursor.execute(
+            f'SELECT COUNT(*) FROM cargas WHERE cajero_id IN ({",".join("?" * len(cajeros))})',
+            cajeros
+        )
+        # Por hilo: 23 cargas sueltas, 4 lotes de 5 y la carga PAGO de cada uno
+        # de los 3 pagos; más las del otro worker
+        assert cursor.fetchone()[0] == HILOS * (23 + 4 * 5 + 3) + OPERACIONES
+
+        assert paybook.verificar_saldos_pendientes(cursor) == []
+
+        consulta = '''
+            SELECT usuario_id, dia, cajero_id, plataforma, cantidad, total, cantidad_pendiente, total_pendiente
+            FROM resumen_diario
+            WHERE cantidad != 0
+            ORDER BY usuario_id, dia, cajero_id, plataforma
+        '''
+        cursor.execute(consulta)
+        actual = cursor.fetchall()
+        paybook.reconstruir_resumen_diario(cursor)
+        cursor.execute(consulta)
+        esperado = cursor.fetchall()
+        conn.rollback()
+
+    assert len(actual) == len(esperado)
+    for fila_actual, fila_esperada in zip(actual, esperado):
+        assert fila_actual[:5] == fila_esperada[:5]
+        assert abs(fila_actual[5] - fila_esperada[5]) < 0.005
+        assert fila_actual[6] == fila_esperada[6]
+        assert abs(fila_actual[7] - fila_esperada[7]) < 0.005
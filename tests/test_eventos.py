@@ -0,0 +1,59 @@
+"""Conexiones y eventos SSE."""
+import json
+
+from conftest import crear_cajero, paybook
+
+
+def test_cupo_por_usuario_y_global():
+    broker = paybook.EventBroker(poll_interval=0.05, max_conexiones=3, max_por_usuario=2, ttl=3600)
+    abiertas = [(1, broker.suscribir(1)), (1, broker.suscribir(1))]
+    assert all(cola is not None for _, cola in abiertas)
+    assert broker.suscribir(1) is None
+
+    # Otro usuario no queda bloqueado por el primero, pero sí por el tope global
+    abiertas.append((2, broker.suscribir(2)))
+    assert abiertas[-1][1] is not None
+    assert broker.suscribir(3) is None
+
+    usuario_id, cola = abiertas.pop(0)
+    broker.desuscribir(usuario_id, cola)
+    abiertas.append((3, broker.suscribir(3)))
+    assert abiertas[-1][1] is not None
+
+    for usuario_id, cola in abiertas:
+        broker.desuscribir(usuario_id, cola)
+
+
+def test_evento_lleva_la_pestana_que_escribio(cliente):
+    cajero_id = crear_cajero(cliente)
+    cliente.post('/api/cargas', json={'cajero_id': cajero_id, 'plataforma': 'Zeus', 'monto': 5},
+                 headers={'X-Pestana-Id': 'pestana-1'})
+    usuario_id = cliente.get('/api/auth/me').get_json()['user']['id']
+    with paybook.db_pool.connect() as conn:
+        datos = conn.execute('''
+            SELECT datos FROM eventos_usuario WHERE usuario_id = ? ORDER BY id DESC LIMIT 1
+        ''', (usuario_id,)).fetchone()[0]
+    assert json.loads(datos)['origen'] == 'pestana-1'
+
+
+def test_limpieza_usa_el_reloj_utc_de_la_base(cliente, monkeypatch):
+    usuario_id = cliente.get('/api/auth/me').get_json()['user']['id']
+    with paybook.db_pool.connect() as conn:
+        conn.execute('''
+            INSERT INTO eventos_usuario (usuario_id, tipo, fecha)
+            VALUES (?, 'reciente', datetime('now', '-30 minutes')),
+                   (?, 'viejo', datetime('now', '-2 hours'))
+        ''', (usuario_id, usuario_id))
+        conn.commit()
+    # Un servidor en UTC-5 no debe purgar lo reciente ni conservar lo viejo
+    monkeypatch.setenv('TZ', 'America/Bogota')
+    paybook.time.tzset()
+    try:
+        paybook.EventBroker(1, 1, 1, ttl=3600)._limpiar(0)
+    finally:
+        monkeypatch.undo()
+        paybook.time.tzset()
+    with paybook.db_pool.connect() as conn:
+        tipos = {row[0] for row in conn.execute(
+            'SELECT tipo FROM eventos_usuario WHERE usuario_id = ?', (usuario_id,))}
+    assert tipos == {'reciente'}
@@ -0,0 +1,38 @@
+"""Límites de los filtros de fecha (rango semiabierto sobre fecha_ts)."""
+from conftest import crear_cajero, paybook
+
+
+def test_fin_de_rango_cubre_la_precision_recibida():
+    inicio = paybook.fecha_a_ts('2026-03-10')
+    assert paybook.rango_fechas('2026-03-10', '2026-03-10') == (inicio, inicio + 86400)
+    # datetime-local: minuto completo
+    assert paybook.rango_fechas('2026-03-10T10:00', '2026-03-10T10:30')[1] == \
+        paybook.fecha_a_ts('2026-03-10 10:31:00')
+    # Con segundos: solo ese segundo
+    assert paybook.rango_fechas('2026-03-10', '2026-03-10 10:30:15')[1] == \
+        paybook.fecha_a_ts('2026-03-10 10:30:16')
+    assert paybook.rango_fechas('2026-03-10', 'ayer') is None
+
+
+def test_fin_exclusivo_texto():
+    assert paybook.fin_exclusivo_texto('2030-01-05') == '2030-01-06'
+    assert paybook.fin_exclusivo_texto('2030-01-05T10:30') == '2030-01-05 10:31:00'
+    assert paybook.fin_exclusivo_texto('2030-01-05 10:30:15') == '2030-01-05 10:30:16'
+
+
+def test_filtro_de_cargas_en_el_limite_del_minuto(cliente):
+    cajero_id = crear_cajero(cliente)
+    usuario_id = cliente.get('/api/auth/me').get_json()['user']['id']
+    fechas = ['2026-03-10 10:29:59', '2026-03-10 10:30:00', '2026-03-10 10:30:59', '2026-03-10 10:31:00']
+    with paybook.db_pool.connect() as conn:
+        conn.executemany('''
+            INSERT INTO cargas (usuario_id, cajero_id, plataforma, monto, fecha, fecha_ts, nota, pagado)
+            VALUES (?, ?, 'Zeus', 1, ?, ?, ?, 0)
+        ''', [(usuario_id, cajero_id, fecha, paybook.fecha_a_ts(fecha), fecha) for fecha in fechas])
+        conn.commit()
+
+    response = cliente.get('/api/cargas?fecha_inicio=2026-03-10T10:30&fecha_fin=2026-03-10T10:30')
+    assert sorted(carga['fecha'] for carga in response.get_json()['data']) == fechas[1:3]
+
+    response = cliente.get('/api/cargas?fecha_inicio=2026-03-10T10:30&fecha_fin=2026-03-10 10:30:00')
+    assert [carga['fecha'] for carga in response.get_json()['data']] == fechas[1:2]
@@ -0,0 +1,45 @@
+"""Límites de tamaño y filas de POST /api/importar/cargas."""
+import io
+import time
+
+from conftest import crear_cajero, paybook
+
+ENCABEZADO = 'Cajero,Plataforma,Monto,Fecha\n'
+
+
+def subir(client, contenido):
+    return client.post('/api/importar/cargas', data={
+        'archivo': (io.BytesIO(contenido.encode('utf-8')), 'cargas.csv')
+    }, content_type='multipart/form-data')
+
+
+def esperar_job(client, job_id):
+    for _ in range(200):
+        job = client.get(f'/api/importar/cargas/{job_id}').get_json()['data']
+        if job['estado'] in ('listo', 'error'):
+            return job
+        time.sleep(0.02)
+    raise AssertionError('La importación no terminó')
+
+
+def test_importacion_dentro_de_los_limites(cliente):
+    crear_cajero(cliente, 'Ana')
+    response = subir(cliente, ENCABEZADO + 'Ana,Zeus,10,2026-01-01 10:00:00\n' * 3)
+    assert response.status_code == 202
+    job = esperar_job(cliente, response.get_json()['data']['id'])
+    assert job['estado'] == 'listo'
+    assert job['insertadas'] == 3
+
+
+def test_rechaza_archivo_con_demasiadas_filas(cliente, monkeypatch):
+    monkeypatch.setattr(paybook, 'IMPORT_MAX_FILAS', 5)
+    response = subir(cliente, ENCABEZADO + 'Ana,Zeus,10,2026-01-01 10:00:00\n' * 6)
+    assert response.status_code == 413
+    assert response.get_json()['success'] is False
+
+
+def test_rechaza_archivo_demasiado_grande(cliente, monkeypatch):
+    monkeypatch.setitem(paybook.app.config, 'MAX_CONTENT_LENGTH', 1024)
+    response = subir(cliente, ENCABEZADO + 'x' * 4096)
+    assert response.status_code == 413
+    assert response.get_json() == {'success': False, 'error': 'El archivo es demasiado grande'}
@@ -0,0 +1,38 @@
+"""Cursores de paginación armados a mano devuelven 400, nunca 500."""
+import pytest
+
+from conftest import hacer_admin, paybook
+
+CURSORES_INVALIDOS = [
+    paybook.encode_page_cursor([1], {}),
+    paybook.encode_page_cursor('x', 1),
+    paybook.encode_page_cursor(None, 1),
+    paybook.encode_page_cursor(True, 1),
+    paybook.encode_page_cursor(1.5, 2),
+    'no-es-base64!',
+]
+
+
+@pytest.mark.parametrize('token', CURSORES_INVALIDOS)
+def test_cursor_invalido_en_cargas(cliente, token):
+    response = cliente.get('/api/cargas', query_string={'cursor': token})
+    assert response.status_code == 400
+    assert response.get_json()['error'] == 'Cursor inválido'
+
+
+@pytest.mark.parametrize('token', CURSORES_INVALIDOS + [paybook.encode_page_cursor([1])])
+def test_cursor_invalido_en_busqueda(cliente, token):
+    response = cliente.get('/api/cargas/buscar', query_string={'q': 'zeus', 'cursor': token})
+    assert response.status_code == 400
+
+
+@pytest.mark.parametrize('token', [
+    paybook.encode_page_cursor([1], {}),
+    paybook.encode_page_cursor(1, 1),
+    paybook.encode_page_cursor('2026-01-01 00:00:00', '1'),
+    paybook.encode_page_cursor(None, 1),
+])
+def test_cursor_invalido_en_admin_usuarios(cliente, token):
+    hacer_admin(cliente)
+    response = cliente.get('/api/admin/usuarios', query_string={'cursor': token})
+    assert response.status_code == 400
@@ -0,0 +1,43 @@
+"""POST /api/pagos: los pagos parciales cierran en el límite de una carga."""
+from conftest import crear_cajero, paybook
+
+
+def preparar(cliente, montos):
+    cajero_id = crear_cajero(cliente)
+    for monto in montos:
+        cliente.post('/api/cargas', json={'cajero_id': cajero_id, 'plataforma': 'Zeus', 'monto': monto})
+    return cajero_id
+
+
+def pendientes(cajero_id):
+    with paybook.db_pool.connect() as conn:
+        return conn.execute(
+            'SELECT COUNT(*) FROM cargas WHERE cajero_id = ? AND pagado = 0', (cajero_id,)
+        ).fetchone()[0]
+
+
+def test_pago_con_resto_se_rechaza_sin_registrar_nada(cliente):
+    cajero_id = preparar(cliente, [10, 10, 10])
+    response = cliente.post('/api/pagos', json={'cajero_id': cajero_id, 'monto_pagado': 15})
+    assert response.status_code == 400
+    data = response.get_json()
+    assert data['monto_asignable'] == 10
+    assert data['total_comisiones'] == 30
+    assert pendientes(cajero_id) == 3
+    with paybook.db_pool.connect() as conn:
+        assert conn.execute('SELECT COUNT(*) FROM pagos WHERE cajero_id = ?', (cajero_id,)).fetchone()[0] == 0
+
+
+def test_pago_en_el_limite_de_una_carga(cliente):
+    cajero_id = preparar(cliente, [10, 10, 10])
+    data = cliente.post('/api/pagos', json={'cajero_id': cajero_id, 'monto_pagado': 20}).get_json()
+    assert data['success'], data
+    assert data['data']['monto_asignado'] == 20
+    assert pendientes(cajero_id) == 1
+
+
+def test_pago_total_redondeado_a_centavos_salda_todo(cliente):
+    cajero_id = preparar(cliente, [0.1, 0.2, 0.7])
+    data = cliente.post('/api/pagos', json={'cajero_id': cajero_id, 'monto_pagado': 1.0}).get_json()
+    assert data['success'], data
+    assert pendientes(cajero_id) == 0
@@ -0,0 +1,31 @@
+"""POST /api/pagos/lote: solo se pagan saldos pendientes positivos."""
+from conftest import crear_cajero, paybook
+
+
+def test_cajero_con_saldo_neto_no_positivo_no_recibe_pago(cliente):
+    positivo = crear_cajero(cliente, 'Positivo')
+    neto_cero = crear_cajero(cliente, 'Neto cero')
+    negativo = crear_cajero(cliente, 'Negativo')
+    vacio = crear_cajero(cliente, 'Vacío')
+    for cajero_id, montos in ((positivo, [10, 5]), (neto_cero, [10, -10]), (negativo, [5, -8])):
+        for monto in montos:
+            assert cliente.post('/api/cargas', json={
+                'cajero_id': cajero_id, 'plataforma': 'Zeus', 'monto': monto
+            }).status_code in (200, 201)
+
+    data = cliente.post('/api/pagos/lote', json={}).get_json()['data']
+
+    assert [pago['cajero_id'] for pago in data['pagos']] == [positivo]
+    assert data['pagos'][0]['monto_pagado'] == 15
+    assert sorted(item['cajero_id'] for item in data['saldo_no_positivo']) == sorted([neto_cero, negativo])
+    assert [item['cajero_id'] for item in data['sin_pendientes']] == [vacio]
+
+    with paybook.db_pool.connect() as conn:
+        pagos = conn.execute(
+            'SELECT cajero_id, monto_pagado FROM pagos WHERE cajero_id IN (?, ?)', (neto_cero, negativo)
+        ).fetchall()
+        pendientes = conn.execute(
+            'SELECT COUNT(*) FROM cargas WHERE cajero_id IN (?, ?) AND pagado = 0', (neto_cero, negativo)
+        ).fetchone()[0]
+    assert pagos == []
+    assert pendientes == 4
@@ -0,0 +1,145 @@
+"""Planes de ejecución de las consultas calientes.
+
+Se capturan las sentencias que ejecuta cada ruta (con set_trace_callback
+sobre las conexiones del pool) y se pasa cada una por EXPLAIN QUERY PLAN.
+Ninguna puede recorrer completas cargas ni las tablas de resumen que
+mantienen los triggers: si un cambio de consulta o de índices hace caer el
+plan a un SCAN, el test falla.
+"""
+import re
+import sqlite3
+
+import pytest
+
+from conftest import crear_cajero, nuevo_cliente, paybook
+
+TABLAS_CALIENTES = {'cargas', 'saldos_pendientes', 'resumen_diario', 'pago_cargas', 'resumen_usuarios'}
+PALABRAS_SQL = {'WHERE', 'ON', 'JOIN', 'LEFT', 'INNER', 'GROUP', 'ORDER', 'LIMIT', 'SET', 'USING', 'AS'}
+
+
+@pytest.fixture(scope='module')
+def cliente_con_datos():
+    client = nuevo_cliente()
+    cajeros = [crear_cajero(client, nombre) for nombre in ('Martín', 'Lucía')]
+    for i in range(40):
+        client.post('/api/cargas', json={
+            'cajero_id': cajeros[i % 2], 'plataforma': 'Zeus' if i % 3 else 'Ganamos',
+            'monto': 10, 'nota': f'transferencia banco {i}'
+        })
+    client.cajeros = cajeros
+    return client
+
+
+def ejecutar_con_traza(client, metodo, url, **kwargs):
+    """Ejecuta la ruta y devuelve (response, sentencias SQL que corrió)."""
+    sentencias = []
+    connect_original = paybook.db_pool.connect
+
+    def connect():
+        pooled = connect_original()
+        pooled.connection.set_trace_callback(sentencias.append)
+        return pooled
+
+    paybook.db_pool.connect = connect
+    try:
+        response = getattr(client, metodo)(url, **kwargs)
+    finally:
+        paybook.db_pool.connect = connect_original
+        for connection in list(paybook.db_pool._idle.queue):
+            connection.set_trace_callback(None)
+    # Las sentencias de los triggers llegan como comentarios "-- TRIGGER ..." y
+    # la sentencia que los dispara se repite por fila: se deduplica
+    unicas = dict.fromkeys(sql.strip() for sql in sentencias)
+    return response, [sql for sql in unicas
+                      if sql.upper().startswith(('SELECT', 'WITH', 'INSERT', 'UPDATE', 'DELETE'))]
+
+
+def alias_de_tablas(sql):
+    alias = {}
+    for tabla, nombre in re.findall(r'\b(?:FROM|JOIN|UPDATE)\s+(\w+)(?:\s+(?:AS\s+)?(\w+))?', sql, re.I):
+        alias[tabla] = tabla
+        if nombre and nombre.upper() not in PALABRAS_SQL:
+            alias[nombre] = tabla
+    return alias
+
+
+def planes(sentencias):
+    """[(sql, [detalle del plan, ...])] usando una conexión aparte."""
+    conn = sqlite3.connect(paybook.DB_PATH)
+    try:
+        return [(sql, [row[3] for row in conn.execute('EXPLAIN QUERY PLAN ' + sql)])
+                for sql in sentencias]
+    finally:
+        conn.close()
+
+
+def verificar_sin_scan(sentencias):
+    resultado = planes(sentencias)
+    for sql, detalles in resultado:
+        alias = alias_de_tablas(sql)
+        for detalle in detalles:
+            scan = re.match(r'SCAN (\w+)', detalle)
+            if scan and alias.get(scan.group(1)) in TABLAS_CALIENTES:
+                pytest.fail(f'{detalle} en: {sql}')
+    return resultado
+
+
+def usa(resultado, fragmento_sql, fragmento_plan):
+    coincidencias = [detalles for sql, detalles in resultado if fragmento_sql in sql]
+    assert coincidencias, f'No se ejecutó ninguna consulta con {fragmento_sql!r}'
+    assert any(fragmento_plan in detalle for detalles in coincidencias for detalle in detalles), coincidencias
+
+
+def test_get_cargas_pagina_por_cursor(cliente_con_datos):
+    response, sentencias = ejecutar_con_traza(cliente_con_datos, 'get', '/api/cargas?limite=10')
+    usa(verificar_sin_scan(sentencias), 'FROM cargas cg', 'idx_cargas_usuario_fecha_ts (usuario_id=?)')
+
+    cursor = response.get_json()['next_cursor']
+    _, sentencias = ejecutar_con_traza(cliente_con_datos, 'get', f'/api/cargas?limite=10&cursor={cursor}')
+    usa(verificar_sin_scan(sentencias), 'FROM cargas cg', 'idx_cargas_usuario_fecha_ts (usuario_id=? AND fecha_ts<?)')
+
+
+def test_get_cargas_rango_fecha_ts(cliente_con_datos):
+    _, sentencias = ejecutar_con_traza(
+        cliente_con_datos, 'get', '/api/cargas?fecha_inicio=2020-01-01&fecha_fin=2100-12-31'
+    )
+    usa(verificar_sin_scan(sentencias), 'FROM cargas cg',
+        'idx_cargas_usuario_fecha_ts (usuario_id=? AND fecha_ts>? AND fecha_ts<?)')
+
+
+def test_estadisticas_de_hoy_por_fecha_ts(cliente_con_datos):
+    _, sentencias = ejecutar_con_traza(cliente_con_datos, 'get', '/api/estadisticas')
+    usa(verificar_sin_scan(sentencias), 'fecha_ts >=', 'idx_cargas_usuario_fecha_ts')
+
+
+def test_resumen_desde_saldos_pendientes(cliente_con_datos):
+    _, sentencias = ejecutar_con_traza(cliente_con_datos, 'get', '/api/resumen')
+    usa(verificar_sin_scan(sentencias), 'saldos_pendientes', 'SEARCH s USING INDEX')
+
+
+def test_reporte_desde_resumen_diario(cliente_con_datos):
+    _, sentencias = ejecutar_con_traza(cliente_con_datos, 'get', '/api/reportes/semanal')
+    resultado = verificar_sin_scan(sentencias)
+    usa(resultado, 'FROM resumen_diario', '(usuario_id=? AND dia>? AND dia<?)')
+    usa(resultado, 'LEFT JOIN cajeros', 'idx_cargas_usuario_fecha (usuario_id=? AND fecha>? AND fecha<?)')
+
+
+def test_busqueda_fts(cliente_con_datos):
+    response, sentencias = ejecutar_con_traza(cliente_con_datos, 'get', '/api/cargas/buscar?q=banco')
+    assert response.get_json()['data']
+    resultado = verificar_sin_scan(sentencias)
+    # "INDEX 0:M..." indica que FTS5 resuelve el MATCH con su índice
+    usa(resultado, 'cargas_fts MATCH', 'VIRTUAL TABLE INDEX 0:M')
+    usa(resultado, 'cargas_fts MATCH', 'SEARCH cg USING INTEGER PRIMARY KEY')
+
+
+def test_pago_parcial_y_total(cliente_con_datos):
+    cajero_id = cliente_con_datos.cajeros[0]
+    response, sentencias = ejecutar_con_traza(
+        cliente_con_datos, 'post', '/api/pagos', json={'cajero_id': cajero_id, 'monto_pagado': 20}
+    )
+    assert response.get_json()['success']
+    usa(verificar_sin_scan(sentencias), 'WITH pendientes',
+        'idx_cargas_pendientes_cajero_fecha (usuario_id=? AND cajero_id=?)')
+    _, sentencias = ejecutar_con_traza(cliente_con_datos, 'post', '/api/pagos', json={'cajero_id': cajero_id})
+    verificar_sin_scan(sentencias)
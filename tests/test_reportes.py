@@ -0,0 +1,42 @@
+"""Forma de la respuesta de /api/reportes/{diario,semanal,mensual}."""
+import pytest
+
+from conftest import crear_cajero, paybook
+
+CAMPOS_CARGA = {'cajero', 'plataforma', 'monto', 'fecha', 'nota', 'estado', 'tipo'}
+
+
+@pytest.mark.parametrize('periodo', ['diario', 'semanal', 'mensual'])
+def test_reporte_incluye_cargas_por_defecto(cliente, periodo):
+    cajero_id = crear_cajero(cliente)
+    for monto in (10, 5.5):
+        cliente.post('/api/cargas', json={'cajero_id': cajero_id, 'plataforma': 'Zeus', 'monto': monto})
+
+    data = cliente.get(f'/api/reportes/{periodo}').get_json()['data']
+    assert data['total_cargas'] == 2
+    assert data['monto_total'] == 15.5
+    assert len(data['cargas']) == 2
+    assert set(data['cargas'][0]) == CAMPOS_CARGA
+
+    resumido = cliente.get(f'/api/reportes/{periodo}?detalle=0').get_json()['data']
+    assert 'cargas' not in resumido
+    assert resumido['total_cargas'] == 2
+
+
+def test_totales_y_detalle_cuentan_las_mismas_cargas(cliente):
+    cajero_id = crear_cajero(cliente)
+    cliente.post('/api/cargas', json={'cajero_id': cajero_id, 'plataforma': 'Zeus', 'monto': 10})
+    usuario_id = cliente.get('/api/auth/me').get_json()['user']['id']
+    hoy = paybook.datetime.now().strftime('%Y-%m-%d')
+    with paybook.db_pool.connect() as conn:
+        # Carga cuyo cajero ya no existe y otra con una hora que no es válida
+        for cajero, fecha in ((987654, f'{hoy} 08:00:00'), (cajero_id, f'{hoy} 25:00:00')):
+            conn.execute('''
+                INSERT INTO cargas (usuario_id, cajero_id, plataforma, monto, fecha, fecha_ts, pagado)
+                VALUES (?, ?, 'Zeus', 7, ?, ?, 0)
+            ''', (usuario_id, cajero, fecha, paybook.fecha_a_ts(fecha)))
+        conn.commit()
+
+    data = cliente.get('/api/reportes/diario').get_json()['data']
+    assert data['total_cargas'] == len(data['cargas']) == 3
+    assert data['monto_total'] == round(sum(carga['monto'] for carga in data['cargas']), 2) == 24
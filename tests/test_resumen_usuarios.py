@@ -0,0 +1,84 @@
+"""resumen_usuarios mantenido por triggers contra su reconstrucción desde cargas."""
+from conftest import crear_cajero, paybook
+
+COLUMNAS = ('cajeros_activos', 'total_cargas', 'total_pendiente', 'total_pendiente_positivo',
+            'ultima_actividad', 'cargas_pendientes', 'cargas_pendientes_positivas')
+
+
+def leer(cursor, usuario_id):
+    cursor.execute(f'SELECT {", ".join(COLUMNAS)} FROM resumen_usuarios WHERE usuario_id = ?', (usuario_id,))
+    return dict(zip(COLUMNAS, cursor.fetchone()))
+
+
+def reconstruido(cursor, usuario_id):
+    paybook.reconstruir_pendientes_resumen_usuarios(cursor, usuario_id)
+    return leer(cursor, usuario_id)
+
+
+def insertar(conn, usuario_id, cajero_id, monto, fecha):
+    return conn.execute('''
+        INSERT INTO cargas (usuario_id, cajero_id, plataforma, monto, fecha, fecha_ts, pagado)
+        VALUES (?, ?, 'Zeus', ?, ?, ?, 0)
+    ''', (usuario_id, cajero_id, monto, fecha, paybook.fecha_a_ts(fecha))).lastrowid
+
+
+def test_borrar_o_atrasar_la_carga_mas_reciente_recalcula_ultima_actividad(cliente):
+    cajero_id = crear_cajero(cliente)
+    usuario_id = cliente.get('/api/auth/me').get_json()['user']['id']
+    with paybook.db_pool.connect() as conn:
+        cursor = conn.cursor()
+        insertar(conn, usuario_id, cajero_id, 10, '2026-01-01 10:00:00')
+        intermedia = insertar(conn, usuario_id, cajero_id, 10, '2026-01-05 10:00:00')
+        ultima = insertar(conn, usuario_id, cajero_id, 10, '2026-01-09 10:00:00')
+        assert leer(cursor, usuario_id)['ultima_actividad'] == '2026-01-09 10:00:00'
+
+        conn.execute('DELETE FROM cargas WHERE id = ?', (ultima,))
+        assert leer(cursor, usuario_id)['ultima_actividad'] == '2026-01-05 10:00:00'
+
+        conn.execute("UPDATE cargas SET fecha = '2025-12-31 10:00:00' WHERE id = ?", (intermedia,))
+        actual = leer(cursor, usuario_id)
+        assert actual['ultima_actividad'] == '2026-01-01 10:00:00'
+        assert actual == reconstruido(cursor, usuario_id)
+        conn.rollback()
+
+
+def test_totales_sin_residuo_de_coma_flotante(cliente):
+    cajero_id = crear_cajero(cliente)
+    usuario_id = cliente.get('/api/auth/me').get_json()['user']['id']
+    with paybook.db_pool.connect() as conn:
+        cursor = conn.cursor()
+        ids = [insertar(conn, usuario_id, cajero_id, monto, '2026-02-01 10:00:00')
+               for monto in (0.1, 0.2, 0.7, -0.3)]
+        conn.execute(f'UPDATE cargas SET pagado = 1 WHERE id IN ({",".join("?" * 3)})', ids[:3])
+        conn.execute('DELETE FROM cargas WHERE id = ?', (ids[3],))
+        actual = leer(cursor, usuario_id)
+        assert actual['total_pendiente'] == 0
+        assert actual['total_pendiente_positivo'] == 0
+        assert actual['cargas_pendientes'] == 0
+        assert actual == reconstruido(cursor, usuario_id)
+        conn.rollback()
+
+
+def test_operaciones_por_la_api_coinciden_con_la_reconstruccion(cliente):
+    cajeros = [crear_cajero(cliente, nombre) for nombre in ('Caja A', 'Caja B')]
+    usuario_id = cliente.get('/api/auth/me').get_json()['user']['id']
+    for i in range(20):
+        cliente.post('/api/cargas', json={
+            'cajero_id': cajeros[i % 2], 'plataforma': 'Zeus', 'monto': [5, -2, 7.35][i % 3]
+        })
+    cargas = cliente.get('/api/cargas').get_json()['data']
+    cliente.delete(f'/api/cargas/{cargas[0]["id"]}')
+    cliente.post('/api/pagos', json={'cajero_id': cajeros[0], 'monto_pagado': 12})
+    cliente.post('/api/pagos', json={'cajero_id': cajeros[1]})
+    cliente.delete(f'/api/cajeros/{cajeros[1]}')
+
+    with paybook.db_pool.connect() as conn:
+        cursor = conn.cursor()
+        actual = leer(cursor, usuario_id)
+        esperado = reconstruido(cursor, usuario_id)
+        conn.rollback()
+    for columna in COLUMNAS:
+        if columna.startswith('total_pendiente'):
+            assert abs(actual[columna] - esperado[columna]) < 0.005
+        else:
+            assert actual[columna] == esperado[columna], columna
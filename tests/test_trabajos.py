@@ -0,0 +1,65 @@
+"""Trabajos PDF e importaciones que quedaron a medias por un reinicio."""
+import os
+import time
+
+from conftest import paybook
+
+HACE_DOS_TTL = time.time() - 2 * paybook.EXPORT_JOB_TTL
+
+
+def envejecer(*rutas):
+    for ruta in rutas:
+        os.utime(ruta, (HACE_DOS_TTL, HACE_DOS_TTL))
+
+
+def job_pdf(usuario_id, job_id, estado):
+    job = {'id': job_id, 'usuario_id': usuario_id, 'estado': estado, 'tipo_reporte': 'completo',
+           'creado': '', 'creado_ts': HACE_DOS_TTL}
+    paybook.guardar_pdf_job(job)
+    temporal = os.path.join(paybook.JOBS_DIR, f'pdf_{job_id}.pdf.tmp')
+    open(temporal, 'wb').close()
+    envejecer(paybook.pdf_job_path(job_id), temporal)
+    return temporal
+
+
+def test_pdf_en_proceso_sin_avance_se_cierra_como_error(cliente):
+    usuario_id = cliente.get('/api/auth/me').get_json()['user']['id']
+    temporal = job_pdf(usuario_id, 'pdf-colgado-000000001', 'procesando')
+
+    data = cliente.get('/api/exportar/pdf/pdf-colgado-000000001').get_json()['data']
+    assert data['estado'] == 'error'
+    assert data['finalizado']
+    assert not os.path.exists(temporal)
+
+
+def test_barrido_cierra_importaciones_y_pdf_colgados(cliente):
+    usuario_id = cliente.get('/api/auth/me').get_json()['user']['id']
+    job_pdf(usuario_id, 'pdf-pendiente-00000001', 'pendiente')
+    job = {'id': 'import-colgado-0000001', 'usuario_id': usuario_id, 'estado': 'procesando',
+           'nombre_original': 'cargas.csv', 'bytes_total': 10, 'bytes_procesados': 0, 'procesadas': 0,
+           'insertadas': 0, 'errores': 0, 'detalle_errores': [], 'creado': '', 'creado_ts': HACE_DOS_TTL}
+    paybook.guardar_import_job(job)
+    csv_path = os.path.join(paybook.JOBS_DIR, f"import_{job['id']}.csv")
+    open(csv_path, 'w').close()
+    envejecer(paybook.import_job_path(job['id']), csv_path)
+
+    paybook.limpiar_pdf_jobs_vencidos()
+    paybook.limpiar_import_jobs_vencidos()
+
+    assert paybook.cargar_pdf_job('pdf-pendiente-00000001')['estado'] == 'error'
+    assert paybook.cargar_import_job(job['id'])['estado'] == 'error'
+    assert not os.path.exists(csv_path)
+
+    # Ya cerrados y vencidos, el barrido siguiente los borra
+    envejecer(paybook.pdf_job_path('pdf-pendiente-00000001'))
+    paybook.limpiar_pdf_jobs_vencidos()
+    assert paybook.cargar_pdf_job('pdf-pendiente-00000001') is None
+
+
+def test_trabajo_en_curso_con_avance_reciente_no_se_toca(cliente):
+    usuario_id = cliente.get('/api/auth/me').get_json()['user']['id']
+    job = {'id': 'pdf-reciente-000000001', 'usuario_id': usuario_id, 'estado': 'procesando',
+           'tipo_reporte': 'completo', 'creado': '', 'creado_ts': HACE_DOS_TTL}
+    paybook.guardar_pdf_job(job)
+    paybook.limpiar_pdf_jobs_vencidos()
+    assert paybook.cargar_pdf_job(job['id'])['estado'] == 'procesando'